@@ -1,13 +1,41 @@
-from flask import Flask
+import importlib
+import time
+from datetime import datetime
+from flask import Flask, g, request
 from flask_bootstrap import Bootstrap5
 from app.config import Config
 
 bootstrap = Bootstrap5()
 
+# Heavy modules the routes import on first use. A prefork server that
+# loads the app in its master (gunicorn --preload) can import them there
+# once with PRELOAD_MODULES, so workers share them instead of each paying
+# the import on its first PDF or comic download.
+HEAVY_MODULES = (
+    'requests',
+    'httpx',
+    'PIL.Image',
+    'reportlab.pdfgen.canvas',
+    'PyPDF2',
+    'app.processors.email_dedup',
+    'app.processors.summarizer'
+)
+
+def preload_heavy_modules():
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Queue-based logging with request ids, configured before anything logs
+    from app.utils.logging_setup import configure_logging, new_request_id, request_id_var
+    configure_logging(app)
+    
+    if app.config.get('PRELOAD_MODULES'):
+        preload_heavy_modules()
+    
     # Initialize extensions
     bootstrap.init_app(app)
     
@@ -21,8 +49,35 @@ def create_app(config_class=Config):
     from app.comics import routes as comics_routes
     app.register_blueprint(comics_routes.bp, url_prefix='/comics')
     
-    @app.route('/test')
-    def test_page():
-        return 'The app is working!'
+    # Request duration histogram for the /metrics endpoint
+    from app.utils.metrics import registry
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.request_id = request.headers.get('X-Request-ID') or new_request_id()
+        g.request_id_token = request_id_var.set(g.request_id)
+    
+    @app.after_request
+    def record_request_duration(response):
+        if 'request_start' in g:
+            registry.observe('aisensum_http_request_duration_seconds',
+                             time.perf_counter() - g.request_start,
+                             endpoint=request.endpoint or 'unknown',
+                             method=request.method,
+                             status=response.status_code)
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+    
+    @app.teardown_request
+    def clear_request_id(exc):
+        if 'request_id_token' in g:
+            request_id_var.reset(g.pop('request_id_token'))
+    
+    # Make 'now' available in templates, for every entry point (run.py, wsgi.py)
+    @app.context_processor
+    def inject_now():
+        return {'now': datetime.utcnow()}
     
     return app 
\ No newline at end of file
@@ -1,15 +1,33 @@
-from flask import render_template, request, redirect, url_for, flash, current_app, jsonify, session, send_file
+from flask import render_template, request, redirect, url_for, flash, current_app, jsonify, session, send_file, copy_current_request_context
 from app.comics import bp
 from werkzeug.utils import secure_filename
 import os
 import json
-import requests
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from PIL import Image
-from io import BytesIO
-import zipfile
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
+from app.utils.comic_generator import request_ideogram_image, request_ideogram_image_async, submit_render
+from app.utils.image_ingest import fetch_panel, fetch_panel_async
+from app.utils import panel_renderer
+from app.utils.comic_store import (create_comic, load_comic, update_comic, cache_download, cached_download,
+                                   swap_panel_image, set_panel_images, panel_quality, panel_versions)
+from app.utils.comic_prompts import compile_panel_prompts, draft_request
+from app.utils.script_parser import parse_comic_script
+from app.utils.metrics import timed, record_cache
+
+RENDER_MODES = ('final', 'progressive')
+
+# Background final renders for progressive comics, created on first use
+_final_executor = None
+_final_executor_lock = threading.Lock()
+
+def render_mode(requested=None):
+    """The requested panel render mode if valid, otherwise COMIC_RENDER_MODE"""
+    if requested in RENDER_MODES:
+        return requested
+    default = current_app.config.get('COMIC_RENDER_MODE', 'final')
+    return default if default in RENDER_MODES else 'final'
 
 @bp.route('/')
 def index():
@@ -18,103 +36,347 @@ def index():
     return render_template('comics/index.html', title='Comic Generator', 
                           settings=comic_settings)
 
+def _comic_form():
+    """(title, script, panels, prompts, render mode) from the create form, or None if no script was posted"""
+    if not request.form.get('script'):
+        flash('No script provided', 'danger')
+        return None
+    
+    script = request.form.get('script')
+    title = request.form.get('title', 'New Comic')
+    
+    # Parse script into panels and compile every panel prompt once
+    panels = parse_comic_script(script)
+    prompts = compile_panel_prompts(panels)
+    return title, script, panels, prompts, render_mode(request.form.get('render_mode'))
+
+def _render_requests(prompts, mode):
+    """The image requests to render before showing the comic: drafts in progressive mode"""
+    if mode != 'progressive':
+        return prompts
+    settings = current_app.config.get('COMIC_PROGRESSIVE', {})
+    return [draft_request(r, settings.get('draft_model', 'V_2_TURBO'), settings.get('draft_magic_prompt', 'OFF'))
+            for r in prompts]
+
+def _fallback_budget():
+    """Seconds to wait for Ideogram before drawing local placeholders, None when the fallback is off"""
+    return panel_renderer.latency_budget() if panel_renderer.enabled() else None
+
+def _fallback_panel_image(panel, index):
+    """URL of a locally drawn placeholder for a panel"""
+    filename = panel_renderer.render(panel.get('description', ''), panel.get('dialogue'),
+                                     f"Panel {index + 1}", _panel_folder())
+    return url_for('static', filename=f'placeholders/{filename}')
+
+def _store_created_comic(title, script, panels, panel_images, prompts, mode='final', placeholders=()):
+    # Save comic server-side, the session only carries its id
+    quality = ['draft' if mode == 'progressive' else 'final'] * len(panel_images)
+    # Real images replace placeholders in the background, unless there is no key to get them with
+    can_render = bool(current_app.config['COMIC_SETTINGS'].get('api_key'))
+    for index in placeholders:
+        quality[index] = 'placeholder' if can_render else 'fallback'
+    comic_id = create_comic(title, script, panels, panel_images, prompts=prompts, panel_quality=quality)
+    session['comic_id'] = comic_id
+    
+    if can_render and (mode == 'progressive' or placeholders):
+        # Background renders only swap in over the panel versions stored now
+        versions = panel_versions(load_comic(comic_id))
+        _queue_final_renders(comic_id, prompts, versions, indexes=None if mode == 'progressive' else placeholders)
+    
+    if placeholders:
+        flash(f'{len(placeholders)} panel(s) drawn as placeholders because image generation was slow or failed'
+              + (', real images replace them as they finish' if can_render else ''), 'warning')
+    elif mode == 'progressive':
+        flash('Draft panels ready, final panels replace them as they finish', 'success')
+    else:
+        flash('Comic generated successfully', 'success')
+    return redirect(url_for('comics.preview'))
+
+def _render_within_budget(panels, render_requests, budget):
+    """
+    Render all panels concurrently on the shared render pool, waiting at
+    most `budget` seconds.
+    
+    Panels that failed or are not done by then get a local placeholder.
+    Renders still running are left to finish; their images are picked up
+    by the background re-render (identical requests share one call).
+    
+    Returns:
+        (panel image URLs, indexes of placeholder panels)
+    """
+    futures = [submit_render(generate_panel_image, r) for r in render_requests]
+    wait(futures, timeout=budget)
+    
+    panel_images, placeholders = [], []
+    for index, future in enumerate(futures):
+        if future.done() and future.exception() is None and future.result():
+            panel_images.append(future.result())
+            continue
+        reason = 'timed out' if not future.done() else f'failed: {future.exception()}'
+        current_app.logger.warning("Panel %d %s, drawing a placeholder", index + 1, reason)
+        panel_images.append(_fallback_panel_image(panels[index], index))
+        placeholders.append(index)
+    return panel_images, placeholders
+
+def _final_pool():
+    global _final_executor
+    with _final_executor_lock:
+        if _final_executor is None:
+            workers = current_app.config.get('COMIC_PROGRESSIVE', {}).get('final_workers', 4)
+            _final_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='comic-final')
+        return _final_executor
+
+def _queue_final_renders(comic_id, prompts, versions, indexes=None):
+    """
+    Render panels (all, or those in indexes) at final quality in the
+    background and swap each one in over its draft or placeholder.
+    versions are the panels' panel_versions when queued: a panel
+    regenerated in the meantime has a new version and keeps its newer
+    image. A failed final render keeps the current one. Replaced files
+    stay on disk: panel files are named by content and may be shared.
+    """
+    for index, (image_request, version) in enumerate(zip(prompts, versions)):
+        if indexes is not None and index not in indexes:
+            continue
+        
+        @copy_current_request_context
+        def render(index=index, image_request=image_request, version=version):
+            try:
+                image_url = generate_panel_image(image_request)
+            except Exception as e:
+                current_app.logger.warning("Final render of panel %d failed, keeping the draft: %s", index + 1, e)
+                swap_panel_image(comic_id, index, version, None, 'failed')
+                return
+            swap_panel_image(comic_id, index, version, image_url, 'final')
+        
+        _final_pool().submit(render)
+
 @bp.route('/create', methods=['GET', 'POST'])
 def create():
     """Create a new comic"""
     if request.method == 'POST':
-        # Check if the post request has data
-        if not request.form.get('script'):
-            flash('No script provided', 'danger')
+        form = _comic_form()
+        if form is None:
             return redirect(request.url)
+        title, script, panels, prompts, mode = form
         
-        script = request.form.get('script')
-        title = request.form.get('title', 'New Comic')
-        
-        # Parse script into panels
-        panels = parse_comic_script(script)
+        budget = _fallback_budget()
+        if budget is not None:
+            try:
+                panel_images, placeholders = _render_within_budget(panels, _render_requests(prompts, mode), budget)
+            except Exception as e:
+                flash(f'Error generating panel image: {str(e)}', 'danger')
+                return redirect(url_for('comics.create'))
+            return _store_created_comic(title, script, panels, panel_images, prompts, mode, placeholders)
         
-        # Generate images for each panel with sequential context
+        # Generate images for each panel, sequence context is in the prompts
         panel_images = []
-        previous_description = None
         
-        for i, panel in enumerate(panels):
+        for image_request in _render_requests(prompts, mode):
             try:
-                # Pass panel index, total panels, and previous description for context
-                image_path = generate_panel_image(
-                    panel['description'],
-                    panel_index=i,
-                    total_panels=len(panels),
-                    previous_panel_description=previous_description
-                )
-                
+                image_path = generate_panel_image(image_request)
                 if image_path:
                     panel_images.append(image_path)
-                    # Store current description for next panel
-                    previous_description = panel['description']
             except Exception as e:
                 flash(f'Error generating panel image: {str(e)}', 'danger')
                 return redirect(url_for('comics.create'))
         
-        # Save data to session
-        session['comic_script'] = script
-        session['comic_title'] = title
-        session['comic_panels'] = panels
-        session['panel_images'] = panel_images
+        return _store_created_comic(title, script, panels, panel_images, prompts, mode)
+    
+    return render_template('comics/create.html', title='Create Comic')
+
+async def _render_within_budget_async(panels, render_requests, budget):
+    """
+    _render_within_budget on the pooled async client. Renders not done
+    within the budget are cancelled (the view's event loop ends with the
+    request); the background re-render takes over.
+    """
+    tasks = [asyncio.ensure_future(generate_panel_image_async(r)) for r in render_requests]
+    if tasks:
+        await asyncio.wait(tasks, timeout=budget)
+    
+    panel_images, placeholders = [], []
+    for index, task in enumerate(tasks):
+        if task.done() and not task.cancelled() and task.exception() is None and task.result():
+            panel_images.append(task.result())
+            continue
+        if not task.done():
+            task.cancel()
+            reason = 'timed out'
+        else:
+            reason = f'failed: {task.exception()}'
+        current_app.logger.warning("Panel %d %s, drawing a placeholder", index + 1, reason)
+        filename = await panel_renderer.render_async(panels[index].get('description', ''), panels[index].get('dialogue'),
+                                                     f"Panel {index + 1}", _panel_folder())
+        panel_images.append(url_for('static', filename=f'placeholders/{filename}'))
+        placeholders.append(index)
+    return panel_images, placeholders
+
+@bp.route('/async/create', methods=['GET', 'POST'])
+async def create_async():
+    """create() with every panel requested concurrently on the pooled async client"""
+    if request.method == 'POST':
+        form = _comic_form()
+        if form is None:
+            return redirect(request.url)
+        title, script, panels, prompts, mode = form
         
-        flash('Comic generated successfully', 'success')
-        return redirect(url_for('comics.preview'))
+        budget = _fallback_budget()
+        if budget is not None:
+            try:
+                panel_images, placeholders = await _render_within_budget_async(panels, _render_requests(prompts, mode),
+                                                                               budget)
+            except Exception as e:
+                flash(f'Error generating panel image: {str(e)}', 'danger')
+                return redirect(url_for('comics.create_async'))
+            return _store_created_comic(title, script, panels, panel_images, prompts, mode, placeholders)
+        
+        results = await asyncio.gather(*(generate_panel_image_async(r) for r in _render_requests(prompts, mode)),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                flash(f'Error generating panel image: {str(result)}', 'danger')
+                return redirect(url_for('comics.create_async'))
+        panel_images = [image_path for image_path in results if image_path]
+        
+        return _store_created_comic(title, script, panels, panel_images, prompts, mode)
     
     return render_template('comics/create.html', title='Create Comic')
 
 @bp.route('/preview')
 def preview():
     """Preview the generated comic"""
-    if not session.get('comic_script'):
+    comic = load_comic(session.get('comic_id'), panels=True)
+    if not comic:
         flash('No comic script found. Please create a comic first.', 'warning')
         return redirect(url_for('comics.create'))
     
-    title = session.get('comic_title', 'New Comic')
-    panels = session.get('comic_panels', [])
-    panel_images = session.get('panel_images', [])
+    title = comic.get('title', 'New Comic')
+    panels = comic.get('panels', [])
+    panel_images = comic.get('panel_images', [])
+    quality = panel_quality(comic)
     
-    # Debug logging
-    current_app.logger.info(f"Preview - Title: {title}")
-    current_app.logger.info(f"Preview - Number of panels: {len(panels)}")
-    current_app.logger.info(f"Preview - Panel images: {panel_images}")
+    current_app.logger.debug("Preview - Title: %s, %d panels, images: %s", title, len(panels), panel_images)
     
     # Verify image files exist
     for img_path in panel_images:
         # Convert URL to filesystem path
         rel_path = img_path.replace('/static/', '')
         abs_path = os.path.join(current_app.root_path, 'static', rel_path)
-        current_app.logger.info(f"Checking image file: {abs_path}")
         if not os.path.exists(abs_path):
-            current_app.logger.error(f"Image file not found: {abs_path}")
+            current_app.logger.error("Image file not found: %s", abs_path)
     
     return render_template('comics/preview.html', 
                           title=f'Preview: {title}',
                           comic_title=title,
                           panels=panels,
-                          panel_images=panel_images)
+                          panel_images=panel_images,
+                          panel_quality=quality,
+                          poll_interval=current_app.config.get('COMIC_PROGRESSIVE', {}).get('poll_interval', 2))
+
+@bp.route('/status')
+def status():
+    """Current panel images of a comic, polled by the preview while final renders are pending"""
+    comic_id = request.args.get('comic_id') or session.get('comic_id')
+    comic = load_comic(comic_id)
+    if not comic:
+        return jsonify({'error': 'Comic not found'}), 404
+    
+    quality = panel_quality(comic)
+    return jsonify({
+        'comic_id': comic_id,
+        'panel_images': comic.get('panel_images', []),
+        'panel_quality': quality,
+        'pending': quality.count('draft') + quality.count('placeholder'),
+        'updated': comic.get('updated')
+    })
 
 @bp.route('/generate_panel', methods=['POST'])
 def generate_panel():
-    """API endpoint to generate a single panel image"""
-    data = request.json
-    if not data or not data.get('description'):
-        return jsonify({'error': 'No panel description provided'}), 400
-    
-    panel_description = data.get('description')
-    
-    # In a real app, this would call the image generation API
-    # For this example, we'll simulate a successful response
-    response = {
-        'success': True,
-        'image_url': '/static/placeholders/generated_panel.jpg',
-        'panel_description': panel_description
-    }
-    
-    return jsonify(response)
+    """
+    API endpoint to regenerate panels of the current comic.
+    
+    Accepts JSON with 'panel' (index) or 'panels' (list of indexes) to force
+    specific panels, and/or 'script' with an edited script. Only panels whose
+    compiled prompt changed (their own description or neighbouring context)
+    plus the requested ones are re-rendered; all other images are reused.
+    A bare 'description' without a stored comic renders a standalone panel.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No panel data provided'}), 400
+    
+    comic_id = data.get('comic_id') or session.get('comic_id')
+    comic = load_comic(comic_id, panels=True, script=True, prompts=True)
+    
+    if not comic:
+        # Standalone panel from a single description
+        if not data.get('description'):
+            return jsonify({'error': 'No panel description provided'}), 400
+        try:
+            image_request = compile_panel_prompts([{'description': data['description'], 'dialogue': []}])[0]
+            image_url = generate_panel_image(image_request)
+        except Exception as e:
+            return jsonify({'error': f'Error generating panel image: {str(e)}'}), 502
+        return jsonify({
+            'success': True,
+            'image_url': image_url,
+            'panel_description': data['description']
+        })
+    
+    # Work out the new panel list and which prompts changed
+    old_prompts = comic.get('prompts') or []
+    script = data.get('script')
+    if script:
+        # An edit of the stored script only re-parses the panels it touched
+        panels = parse_comic_script(script, comic.get('characters'), previous=comic.get('script'))
+        if not panels:
+            return jsonify({'error': 'Script contains no panels'}), 400
+    else:
+        panels = comic['panels']
+    prompts = compile_panel_prompts(panels)
+    
+    indexes = data.get('panels')
+    if indexes is None:
+        indexes = [data['panel']] if data.get('panel') is not None else []
+    try:
+        requested = {int(i) for i in indexes}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Panel indexes must be integers'}), 400
+    if any(i < 0 or i >= len(panels) for i in requested):
+        return jsonify({'error': f'Panel index out of range (0-{len(panels) - 1})'}), 400
+    
+    changed = {i for i, prompt in enumerate(prompts)
+               if i >= len(old_prompts) or prompt != old_prompts[i]}
+    targets = sorted(requested | changed)
+    
+    # Reuse unchanged images, render only the targets. Requested panels
+    # are explicit regenerations and always get a new image
+    rendered = {}
+    errors = []
+    for i in targets:
+        try:
+            rendered[i] = generate_panel_image(prompts[i], fresh=i in requested)
+        except Exception as e:
+            errors.append({'panel': i, 'error': str(e)})
+    
+    # Only the rendered panels are written, over the current record: final
+    # renders swapped in while these were drawn are kept
+    if script:
+        comic = set_panel_images(comic_id, rendered, panels=panels, script=script, prompts=prompts)
+    else:
+        comic = set_panel_images(comic_id, rendered, prompts=prompts)
+    if comic is None:
+        return jsonify({'error': 'Comic not found'}), 404
+    
+    return jsonify({
+        'success': not errors,
+        'comic_id': comic_id,
+        'regenerated': [i for i in targets if i not in {e['panel'] for e in errors}],
+        'reused': [i for i in range(len(panels)) if i not in targets],
+        'errors': errors,
+        'panel_images': comic.get('panel_images', [])
+    }), (200 if not errors else 207)
 
 @bp.route('/download/<comic_id>')
 def download(comic_id):
@@ -127,10 +389,23 @@ def download(comic_id):
 @bp.route('/download/pdf')
 def download_pdf():
     """Download the comic as PDF with side-by-side panels"""
-    if not session.get('comic_panels') or not session.get('panel_images'):
+    # PIL and reportlab are imported on first use, not at worker start
+    from PIL import Image
+    from reportlab.pdfgen import canvas
+    
+    comic_id = session.get('comic_id')
+    comic = load_comic(comic_id)
+    if not comic or not comic.get('panel_images'):
         flash('No comic data found. Please create a comic first.', 'warning')
         return redirect(url_for('comics.create'))
     
+    # Reuse the PDF built for the current images if there is one
+    cached_path = cached_download(comic, 'pdf')
+    record_cache('comic_download', bool(cached_path))
+    if cached_path:
+        return send_file(cached_path, as_attachment=True,
+                         download_name=os.path.basename(cached_path), mimetype='application/pdf')
+    
     try:
         # Create a temporary PDF file
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -143,11 +418,11 @@ def download_pdf():
         total_width = 0
         max_height = 0
         
-        for img_url in session['panel_images']:
+        for img_url in comic['panel_images']:
             img_path = os.path.join(current_app.root_path, img_url.lstrip('/'))
-            if os.path.exists(img_path):
+            if img_url and os.path.exists(img_path):
                 img = Image.open(img_path)
-                panel_images.append(img)
+                panel_images.append((img_path, img))
                 total_width += img.width
                 max_height = max(max_height, img.height)
         
@@ -156,7 +431,7 @@ def download_pdf():
         c = canvas.Canvas(pdf_path, pagesize=pagesize)
         
         # Add title at the top
-        title = session.get('comic_title', 'Comic')
+        title = comic.get('title', 'Comic')
         c.setFont("Helvetica-Bold", 24)
         c.drawString(50, pagesize[1] - 50, title)
         
@@ -164,13 +439,14 @@ def download_pdf():
         x_offset = 50  # Start with left margin
         y_position = pagesize[1] - max_height - 100  # Position below title
         
-        for i, img in enumerate(panel_images):
+        for img_path, img in panel_images:
             # Add image
-            img_path = os.path.join(current_app.root_path, session['panel_images'][i].lstrip('/'))
             c.drawImage(img_path, x_offset, y_position, width=img.width, height=img.height)
             x_offset += img.width
         
-        c.save()
+        with timed('image_process', operation='compose_pdf'):
+            c.save()
+        cache_download(comic_id, 'pdf', pdf_path)
         
         return send_file(
             pdf_path,
@@ -180,17 +456,28 @@ def download_pdf():
         )
         
     except Exception as e:
-        current_app.logger.error(f"Error generating PDF: {str(e)}")
+        current_app.logger.error("Error generating PDF: %s", e)
         flash('Error generating PDF file', 'danger')
         return redirect(url_for('comics.preview'))
 
 @bp.route('/download/images')
 def download_images():
     """Download the comic panels as a single PNG image"""
-    if not session.get('panel_images'):
+    from PIL import Image
+    
+    comic_id = session.get('comic_id')
+    comic = load_comic(comic_id)
+    if not comic or not comic.get('panel_images'):
         flash('No comic images found. Please create a comic first.', 'warning')
         return redirect(url_for('comics.create'))
     
+    # Reuse the combined image built for the current panels if there is one
+    cached_path = cached_download(comic, 'images')
+    record_cache('comic_download', bool(cached_path))
+    if cached_path:
+        return send_file(cached_path, as_attachment=True,
+                         download_name=os.path.basename(cached_path), mimetype='image/png')
+    
     try:
         # Create a temporary combined image
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -203,26 +490,28 @@ def download_images():
         total_width = 0
         max_height = 0
         
-        for img_url in session['panel_images']:
+        for img_url in comic['panel_images']:
             # Convert URL to filesystem path
             img_path = os.path.join(current_app.root_path, img_url.lstrip('/'))
-            if os.path.exists(img_path):
+            if img_url and os.path.exists(img_path):
                 img = Image.open(img_path)
                 panel_images.append(img)
                 total_width += img.width
                 max_height = max(max_height, img.height)
         
-        # Create new image with combined width
-        combined_image = Image.new('RGB', (total_width, max_height), (255, 255, 255))
-        
-        # Paste all images horizontally
-        x_offset = 0
-        for img in panel_images:
-            combined_image.paste(img, (x_offset, 0))
-            x_offset += img.width
-        
-        # Save combined image
-        combined_image.save(image_path, quality=95)
+        with timed('image_process', operation='compose_png'):
+            # Create new image with combined width
+            combined_image = Image.new('RGB', (total_width, max_height), (255, 255, 255))
+            
+            # Paste all images horizontally
+            x_offset = 0
+            for img in panel_images:
+                combined_image.paste(img, (x_offset, 0))
+                x_offset += img.width
+            
+            # Save combined image
+            combined_image.save(image_path, quality=95)
+        cache_download(comic_id, 'images', image_path)
         
         return send_file(
             image_path,
@@ -232,17 +521,27 @@ def download_images():
         )
         
     except Exception as e:
-        current_app.logger.error(f"Error creating combined image: {str(e)}")
+        current_app.logger.error("Error creating combined image: %s", e)
         flash('Error creating combined image', 'danger')
         return redirect(url_for('comics.preview'))
 
 @bp.route('/download/script')
 def download_script():
     """Download the comic script"""
-    if not session.get('comic_script'):
+    comic_id = session.get('comic_id')
+    comic = load_comic(comic_id)
+    if not comic:
         flash('No comic script found. Please create a comic first.', 'warning')
         return redirect(url_for('comics.create'))
     
+    # Image-only regenerations keep the formatted script valid
+    cached_path = cached_download(comic, 'script')
+    record_cache('comic_download', bool(cached_path))
+    if cached_path:
+        return send_file(cached_path, as_attachment=True,
+                         download_name=os.path.basename(cached_path), mimetype='text/plain')
+    comic = load_comic(comic_id, panels=True)
+    
     try:
         # Create a temporary script file
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -252,12 +551,12 @@ def download_script():
         
         # Format script with proper structure
         with open(script_path, 'w', encoding='utf-8') as f:
-            f.write(f"### **Comic Script Title: \"{session.get('comic_title', 'Untitled Comic')}\"**\n\n")
+            f.write(f"### **Comic Script Title: \"{comic.get('title', 'Untitled Comic')}\"**\n\n")
             f.write("**Setting:** A modern setting with technology and innovation.\n\n")
             f.write("---\n\n")
             
             # Write each panel with proper formatting
-            for i, panel in enumerate(session.get('comic_panels', []), 1):
+            for i, panel in enumerate(comic.get('panels', []), 1):
                 f.write(f"**Panel {i}:**\n")
                 f.write(f"*Scene: {panel['description']}*\n\n")
                 
@@ -272,6 +571,7 @@ def download_script():
             # Add end marker
             f.write("**End**\n\n")
             f.write("This comic script illustrates the story through detailed panel descriptions and character dialogue.")
+        cache_download(comic_id, 'script', script_path)
         
         return send_file(
             script_path,
@@ -281,206 +581,115 @@ def download_script():
         )
         
     except Exception as e:
-        current_app.logger.error(f"Error saving script file: {str(e)}")
+        current_app.logger.error("Error saving script file: %s", e)
         flash('Error saving script file', 'danger')
         return redirect(url_for('comics.preview'))
 
 @bp.route('/regenerate_panels', methods=['POST'])
 def regenerate_panels():
     """Regenerate all panels for the current comic"""
-    if not session.get('comic_panels'):
+    comic_id = session.get('comic_id')
+    comic = load_comic(comic_id, prompts=True)
+    if not comic or not comic.get('panel_count'):
         flash('No comic data found. Please create a comic first.', 'warning')
         return redirect(url_for('comics.create'))
     
     try:
-        # Get existing panels data
-        panels = session.get('comic_panels', [])
-        new_panel_images = []
-        previous_description = None
-        
-        # Regenerate each panel with sequential context
-        for i, panel in enumerate(panels):
+        # Re-submit the stored prompts, compiling them only for comics saved without
+        prompts = comic.get('prompts')
+        record_cache('comic_prompts', bool(prompts))
+        if not prompts:
+            panels = load_comic(comic_id, panels=True)['panels']
+            prompts = compile_panel_prompts(panels, comic.get('characters'))
+            update_comic(comic_id, prompts=prompts)
+        new_panel_images = {}
+        
+        for index, image_request in enumerate(prompts):
             try:
-                # Pass panel index, total panels, and previous description for context
-                image_path = generate_panel_image(
-                    panel['description'],
-                    panel_index=i,
-                    total_panels=len(panels),
-                    previous_panel_description=previous_description
-                )
-                
+                image_path = generate_panel_image(image_request, fresh=True)
                 if image_path:
-                    new_panel_images.append(image_path)
-                    # Store current description for next panel
-                    previous_description = panel['description']
+                    new_panel_images[index] = image_path
             except Exception as e:
                 flash(f'Error regenerating panel image: {str(e)}', 'danger')
                 return redirect(url_for('comics.preview'))
         
-        # Update session with new images
-        session['panel_images'] = new_panel_images
+        # Update stored comic with new images, over the current record
+        set_panel_images(comic_id, new_panel_images)
         
         flash('Panels regenerated successfully', 'success')
         return redirect(url_for('comics.preview'))
         
     except Exception as e:
-        current_app.logger.error(f"Error regenerating panels: {str(e)}")
+        current_app.logger.error("Error regenerating panels: %s", e)
         flash('Error regenerating panels', 'danger')
         return redirect(url_for('comics.preview'))
 
-def generate_panel_image(description, panel_index=0, total_panels=1, previous_panel_description=None):
-    """Generate an image for a comic panel using Ideogram API with enhanced consistency"""
-    try:
-        # Get API configuration
-        config = current_app.config
-        api_key = config['COMIC_SETTINGS'].get('api_key')
-        if not api_key:
-            raise ValueError("Ideogram API key not configured")
+def _ideogram_api_key():
+    api_key = current_app.config['COMIC_SETTINGS'].get('api_key')
+    if not api_key:
+        raise ValueError("Ideogram API key not configured")
+    return api_key
 
-        # Prepare API request
-        headers = {
-            'Api-Key': api_key,
-            'Content-Type': 'application/json'
-        }
-        
-        # Extract character names from dialogue
-        character_names = []
-        if 'comic_panels' in session and len(session['comic_panels']) > 0:
-            # Get all unique character names across panels
-            all_panels = session.get('comic_panels', [])
-            for panel in all_panels:
-                for dialogue in panel.get('dialogue', []):
-                    character = dialogue.get('character', '').strip()
-                    if character and character not in character_names:
-                        character_names.append(character)
-        
-        # Build character consistency string
-        character_string = ""
-        if character_names:
-            character_string = f"Characters: {', '.join(character_names)}. "
-            character_string += "Maintain consistent character appearances throughout all panels. "
-        
-        # Add style consistency
-        style_string = "Comic book style, clear lines, vibrant colors, dynamic composition. "
-        
-        # Add panel context for better sequence
-        context_string = ""
-        if panel_index > 0 and previous_panel_description:
-            context_string = f"This follows the previous panel where: {previous_panel_description}. "
-        
-        sequence_string = f"This is panel {panel_index+1} of {total_panels}. "
-        
-        # Combine into enhanced prompt
-        enhanced_prompt = (
-            f"{style_string} {character_string} {context_string} {sequence_string} "
-            f"Panel content: {description}"
-        )
-        
-        # Add negative prompt to avoid inconsistency
-        negative_prompt = "inconsistent characters, blurry, low quality, deformed faces, multiple styles"
-        
-        # Updated request payload structure according to Ideogram API docs
-        data = {
-            'image_request': {
-                'prompt': enhanced_prompt,
-                'negative_prompt': negative_prompt,
-                'aspect_ratio': 'ASPECT_1_1',
-                'model': 'V_2',
-                'magic_prompt_option': 'AUTO',
-                'style': 'ANIME'
-            }
-        }
+def _result_image_url(result):
+    if 'data' in result and len(result['data']) > 0:
+        image_url = result['data'][0].get('url')
+        if not image_url:
+            raise ValueError("No image URL in response")
+        return image_url
+    raise ValueError("Invalid API response format")
+
+def _panel_folder():
+    """Absolute path of static/placeholders, where panel images are stored"""
+    return os.path.join(current_app.root_path, 'static', 'placeholders')
+
+def generate_panel_image(image_request, fresh=False):
+    """
+    Generate an image for a comic panel from a compiled Ideogram image request.
+    
+    fresh (explicit regenerations) always requests a new image instead of
+    sharing an identical request that is in flight.
+    """
+    try:
+        api_key = _ideogram_api_key()
         
         # Log the prompt for debugging
-        current_app.logger.info(f"Enhanced prompt: {enhanced_prompt}")
-        
-        # Make API request
-        response = requests.post(
-            'https://api.ideogram.ai/generate',
-            headers=headers,
-            json=data
-        )
+        current_app.logger.debug("Enhanced prompt: %s", image_request['prompt'])
         
-        if response.status_code != 200:
-            raise Exception(f"API Error: {response.status_code} - {response.text}")
+        # Make API request (rate limited across all workers)
+        import requests
+        try:
+            result = request_ideogram_image(api_key, image_request, fresh=fresh)
+        except requests.exceptions.HTTPError as e:
+            raise Exception(f"API Error: {e.response.status_code} - {e.response.text}")
         
-        # Process the response
-        result = response.json()
-        if 'data' in result and len(result['data']) > 0:
-            image_url = result['data'][0].get('url')
-            if not image_url:
-                raise ValueError("No image URL in response")
-                
-            # Download the image
-            image_response = requests.get(image_url)
-            image_response.raise_for_status()
-            
-            # Save the image
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"panel_{timestamp}.png"
-            
-            # Use absolute path for saving the file
-            static_folder = os.path.join(current_app.root_path, 'static', 'placeholders')
-            os.makedirs(static_folder, exist_ok=True)
-            
-            filepath = os.path.join(static_folder, filename)
+        image_url = _result_image_url(result)
             
-            # Save and process image
-            image = Image.open(BytesIO(image_response.content))
-            image = image.resize((1024, 1024), Image.Resampling.LANCZOS)
-            image.save(filepath, quality=95)
-            
-            # Log the file path for debugging
-            current_app.logger.info(f"Saved image to: {filepath}")
-            
-            # Return URL for the image using url_for
-            return url_for('static', filename=f'placeholders/{filename}')
-            
-        raise ValueError("Invalid API response format")
+        # Stream the image to disk and store it under its content hash
+        filename = fetch_panel(image_url, _panel_folder())
+        
+        # Return URL for the image using url_for
+        return url_for('static', filename=f'placeholders/{filename}')
         
     except Exception as e:
-        current_app.logger.error(f"Error generating panel image: {str(e)}")
+        current_app.logger.error("Error generating panel image: %s", e)
         raise
 
-def parse_comic_script(script_text):
-    """Parse a comic script into panels and dialogue"""
-    panels = []
-    
-    # Split by panel indicators
-    lines = script_text.strip().split('\n')
-    current_panel = {"description": "", "dialogue": []}
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.lower().startswith(("panel", "scene", "frame")) and ":" in line:
-            # Save previous panel if it exists
-            if current_panel["description"]:
-                panels.append(current_panel)
-                current_panel = {"description": "", "dialogue": []}
-            
-            # Get new panel description
-            parts = line.split(":", 1)
-            if len(parts) > 1:
-                current_panel["description"] = parts[1].strip()
-        elif ":" in line and not line.startswith(("#", "//")):
-            # This is likely dialogue
-            parts = line.split(":", 1)
-            if len(parts) > 1:
-                character = parts[0].strip()
-                dialogue = parts[1].strip()
-                current_panel["dialogue"].append({"character": character, "text": dialogue})
-        else:
-            # Add to description
-            if current_panel["description"]:
-                current_panel["description"] += " " + line
-            else:
-                current_panel["description"] = line
-    
-    # Add the last panel
-    if current_panel["description"]:
-        panels.append(current_panel)
-    
-    return panels 
\ No newline at end of file
+async def generate_panel_image_async(image_request, fresh=False):
+    """generate_panel_image on the pooled async client; image decoding runs in a worker thread"""
+    try:
+        api_key = _ideogram_api_key()
+        current_app.logger.debug("Enhanced prompt: %s", image_request['prompt'])
+        
+        import httpx
+        try:
+            result = await request_ideogram_image_async(api_key, image_request, fresh=fresh)
+        except httpx.HTTPStatusError as e:
+            raise Exception(f"API Error: {e.response.status_code} - {e.response.text}")
+        
+        image_url = _result_image_url(result)
+        filename = await fetch_panel_async(image_url, _panel_folder())
+        return url_for('static', filename=f'placeholders/{filename}')
+        
+    except Exception as e:
+        current_app.logger.error("Error generating panel image: %s", e)
+        raise
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,6 +15,7 @@ class Config:
     # API Keys
     AISENSUM_API_KEY = os.environ.get('AISENSUM_API_KEY')
     IDEOGRAM_API_KEY = os.environ.get('IDEOGRAM_API_KEY')
+    IDEOGRAM_BASE_URL = os.environ.get('IDEOGRAM_BASE_URL', 'https://api.ideogram.ai')
     
     # Model Configuration
     MODEL_NAME = os.environ.get('MODEL_NAME', 'grok-beta')
@@ -22,6 +24,104 @@ class Config:
     MODEL_TEMPERATURE = float(os.environ.get('MODEL_TEMPERATURE', 0.7))
     MODEL_TOP_P = float(os.environ.get('MODEL_TOP_P', 1.0))
     
+    # Extra model endpoints for per-task routing. Unset base_url/api_key fall
+    # back to MODEL_BASE_URL/AISENSUM_API_KEY; an endpoint without a model name
+    # is not configured, and routes to it use the MODEL_* settings instead.
+    MODEL_ENDPOINTS = {
+        "fast": {
+            "base_url": os.environ.get('MODEL_FAST_BASE_URL'),
+            "model": os.environ.get('MODEL_FAST_NAME'),
+            "api_key": os.environ.get('MODEL_FAST_API_KEY')
+        },
+        "strong": {
+            "base_url": os.environ.get('MODEL_STRONG_BASE_URL'),
+            "model": os.environ.get('MODEL_STRONG_NAME'),
+            "api_key": os.environ.get('MODEL_STRONG_API_KEY')
+        },
+        "fallback": {
+            "base_url": os.environ.get('MODEL_FALLBACK_BASE_URL'),
+            "model": os.environ.get('MODEL_FALLBACK_NAME'),
+            "api_key": os.environ.get('MODEL_FALLBACK_API_KEY')
+        }
+    }
+    # Per task: 'endpoint' serves the request; 'hedge' gets the same request
+    # when the endpoint is slower than its recent p95 or fails
+    MODEL_ROUTES = {
+        "topics": {"endpoint": "fast", "hedge": "fallback"},
+        "carousel": {"endpoint": "fast", "hedge": "fallback"},
+        "comic_script": {"endpoint": "strong", "hedge": "fallback"},
+        # Nobody waits on a batch, so it is not hedged
+        "batch": {"endpoint": "strong"}
+    }
+    # Hedge delay: 'percentile' of the endpoint's recent latencies per task,
+    # clamped to [min_delay, max_delay]; initial_delay until min_samples exist.
+    # With hedging disabled the hedge endpoint is only a fallback on failure.
+    MODEL_HEDGING = {
+        "enabled": os.environ.get('MODEL_HEDGING_ENABLED', 'True').lower() in ('true', '1', 't'),
+        "percentile": 95,
+        "min_samples": 20,
+        "initial_delay": float(os.environ.get('MODEL_HEDGE_INITIAL_DELAY', 15.0)),
+        "min_delay": 1.0,
+        "max_delay": 60.0,
+        "max_workers": 32
+    }
+    # Skip an endpoint after this many consecutive failures; retry one request
+    # every reset_timeout seconds until it succeeds
+    MODEL_CIRCUIT_BREAKER = {
+        "failure_threshold": int(os.environ.get('MODEL_BREAKER_THRESHOLD', 5)),
+        "reset_timeout": float(os.environ.get('MODEL_BREAKER_RESET', 30))
+    }
+    
+    # Outbound rate limits, one token bucket per provider and API key.
+    # 'rate' is requests per second, 'burst' is the bucket size.
+    RATE_LIMITS = {
+        "llm": {
+            "rate": float(os.environ.get('LLM_RATE_LIMIT', 1.0)),
+            "burst": int(os.environ.get('LLM_RATE_BURST', 5))
+        },
+        "ideogram": {
+            "rate": float(os.environ.get('IDEOGRAM_RATE_LIMIT', 0.5)),
+            "burst": int(os.environ.get('IDEOGRAM_RATE_BURST', 3))
+        }
+    }
+    # Shared by all worker processes on the host
+    RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB', os.path.join(tempfile.gettempdir(), 'aisensum_rate_limits.db'))
+    RATE_LIMIT_TIMEOUT = int(os.environ.get('RATE_LIMIT_TIMEOUT', 300))
+    
+    # Identical outbound model/image calls in flight at the same time are sent
+    # once and share the response, across all workers on the host. A finished
+    # response stays shareable for SINGLE_FLIGHT_SHARE_SECONDS.
+    SINGLE_FLIGHT_ENABLED = os.environ.get('SINGLE_FLIGHT_ENABLED', 'True').lower() in ('true', '1', 't')
+    SINGLE_FLIGHT_DIR = os.environ.get('SINGLE_FLIGHT_DIR', os.path.join(tempfile.gettempdir(), 'aisensum_flights'))
+    SINGLE_FLIGHT_WAIT = int(os.environ.get('SINGLE_FLIGHT_WAIT', 300))
+    SINGLE_FLIGHT_SHARE_SECONDS = int(os.environ.get('SINGLE_FLIGHT_SHARE_SECONDS', 30))
+    
+    # Reduce long inputs to their key sentences (local extractive summary)
+    # rather than truncating them to the prompt budget
+    SUMMARIZE_INPUT = os.environ.get('SUMMARIZE_INPUT', 'True').lower() in ('true', '1', 't')
+    
+    # Connection pool of the async routes' shared HTTP client (one per worker process)
+    ASYNC_HTTP_LIMITS = {
+        "max_connections": int(os.environ.get('ASYNC_HTTP_MAX_CONNECTIONS', 100)),
+        "max_keepalive_connections": int(os.environ.get('ASYNC_HTTP_MAX_KEEPALIVE', 20)),
+        "keepalive_expiry": float(os.environ.get('ASYNC_HTTP_KEEPALIVE_EXPIRY', 30))
+    }
+    
+    # Logging: LOG_FORMAT is 'text' or 'json'; LOG_LEVELS overrides single
+    # loggers (e.g. {'app.processors.email_processor': 'DEBUG'}).
+    # LOG_DEBUG_SAMPLE_EVERY keeps 1 in N debug lines per call site.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+    LOG_LEVELS = {
+        'urllib3': 'WARNING'
+    }
+    LOG_DEBUG_SAMPLE_EVERY = int(os.environ.get('LOG_DEBUG_SAMPLE_EVERY', 1))
+    LOG_QUEUE = os.environ.get('LOG_QUEUE', 'True').lower() in ('true', '1', 't')
+    
+    # Import PIL, reportlab, PyPDF2 and numpy at app creation instead of on
+    # first use; worthwhile when a prefork server loads the app before forking
+    PRELOAD_MODULES = os.environ.get('PRELOAD_MODULES', 'False').lower() in ('true', '1', 't')
+    
     # Company information
     COMPANY_INFO = {
         "name": "AiSensum",
@@ -71,6 +171,22 @@ class Config:
         }
     }
     
+    # Multi-file batches (POST /content/batch, `flask content batch`), one
+    # per CONTENT_LIMITS kind: emails (.msg/.eml) and documents (.pdf/.txt).
+    # Files are extracted extract_workers at a time in separate processes;
+    # documents are packed into as few model requests as fit in
+    # max_prompt_tokens (estimated at chars_per_token characters per token),
+    # and up to `concurrency` of those run at once at 'batch' priority.
+    # max_length in CONTENT_LIMITS is in words.
+    BATCH_PROCESSING = {
+        "extract_workers": int(os.environ.get('BATCH_EXTRACT_WORKERS', 4)),
+        "max_prompt_tokens": int(os.environ.get('BATCH_MAX_PROMPT_TOKENS', 6000)),
+        "chars_per_token": 4,
+        "concurrency": int(os.environ.get('BATCH_CONCURRENCY', 2)),
+        # Files accepted per upload request
+        "max_files": 50
+    }
+    
     # Content toggles
     CONTENT_TOGGLES = {
         "linkedin": True,
@@ -79,6 +195,66 @@ class Config:
         "comic_images": True
     }
     
+    # Server-side comic store (defaults to <instance path>/comics)
+    COMIC_STORE_DIR = os.environ.get('COMIC_STORE_DIR')
+    
+    # Finished pipeline results by upload content hash, route, parameters and
+    # model settings (defaults to <instance path>/result_cache). Refreshing a
+    # results page serves the stored result; an identical request arriving
+    # while the job runs waits for it (up to RESULT_CACHE_WAIT seconds).
+    RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+    RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR')
+    RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', 86400))
+    RESULT_CACHE_WAIT = int(os.environ.get('RESULT_CACHE_WAIT', 600))
+    
+    # Start an upload's pipeline in the background as soon as the file is
+    # saved, so extraction and model calls overlap the redirect and the
+    # results page request, which picks up the running job. Finished jobs
+    # nobody collected are dropped after ttl seconds (their result stays in
+    # the result cache).
+    SPECULATIVE_PROCESSING = {
+        "enabled": os.environ.get('SPECULATIVE_PROCESSING_ENABLED', 'True').lower() in ('true', '1', 't'),
+        # Background pipelines per worker process
+        "workers": int(os.environ.get('SPECULATIVE_WORKERS', 4)),
+        "ttl": int(os.environ.get('SPECULATIVE_TTL', 300))
+    }
+    
+    # How comic scripts are written when a request does not choose:
+    # 'llm' asks the model, 'fast' builds one locally from the key sentences
+    COMIC_SCRIPT_MODE = os.environ.get('COMIC_SCRIPT_MODE', 'llm')
+    
+    # How comic panels are rendered when a request does not choose: 'final'
+    # renders every panel at full quality before showing the comic;
+    # 'progressive' shows quick drafts first and swaps in final renders
+    # from background threads as they finish
+    COMIC_RENDER_MODE = os.environ.get('COMIC_RENDER_MODE', 'final')
+    COMIC_PROGRESSIVE = {
+        "draft_model": os.environ.get('COMIC_DRAFT_MODEL', 'V_2_TURBO'),
+        "draft_magic_prompt": "OFF",
+        # Background final renders per worker process
+        "final_workers": int(os.environ.get('COMIC_FINAL_WORKERS', 4)),
+        # Seconds between preview status polls
+        "poll_interval": 2
+    }
+    
+    # Local placeholder panels, drawn with Pillow (layout, fonts and bubbles
+    # from COMIC_SETTINGS) for panels Ideogram has not delivered within
+    # latency_budget seconds, failed on or cannot render (no API key).
+    # Real images replace them in the background when a key is configured.
+    COMIC_FALLBACK = {
+        "enabled": os.environ.get('COMIC_FALLBACK_ENABLED', 'True').lower() in ('true', '1', 't'),
+        "latency_budget": float(os.environ.get('COMIC_LATENCY_BUDGET', 45)),
+        # Renderer processes per worker
+        "workers": int(os.environ.get('COMIC_FALLBACK_WORKERS', 2)),
+        # Threads per worker rendering panels with Ideogram under the budget
+        "render_workers": int(os.environ.get('COMIC_RENDER_WORKERS', 8)),
+        # Placeholders have no artwork, so their text is set larger
+        "text_scale": 2.0,
+        "max_caption_lines": 6,
+        "max_bubbles": 3,
+        "caption_background": "#fdf6e3"
+    }
+    
     # Comic settings
     COMIC_SETTINGS = {
         "panel_width": 1024,
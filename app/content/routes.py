@@ -2,11 +2,19 @@ from flask import render_template, request, redirect, url_for, flash, current_ap
 from werkzeug.utils import secure_filename
 import os
 import json
+import uuid
+import asyncio
+import threading
+import click
 from datetime import datetime
-import requests
-from ..utils.text_processor import process_text_content, process_text_for_carousel, generate_comic_script
+from ..utils.text_processor import (process_text_content, process_text_for_carousel, generate_comic_script,
+                                    process_text_for_carousel_async, generate_comic_script_async)
 from ..utils.file_processor import process_file, extract_text_from_pdf, extract_text_from_txt
-from ..utils.comic_generator import generate_comic_panels
+from ..utils.comic_generator import generate_comic_panels, generate_comic_panels_async, generate_fast_comic_script
+from ..utils import async_http, single_flight, speculative
+from ..utils.metrics import timed, request_timings
+from ..utils.result_cache import pipeline_key, save_upload
+from ..utils.batch_processor import BATCH_EXTENSIONS, run_batches
 
 # Define the blueprint WITHOUT url_prefix here
 bp = Blueprint('content', __name__)
@@ -17,9 +25,22 @@ ALLOWED_EXTENSIONS = {'pdf', 'msg', 'eml', 'txt'}
 # Directory for storing results (within static folder)
 RESULTS_DIR_NAME = 'results' 
 
+PLACEHOLDER_PANELS_ERROR = "Some comic images were drawn as local placeholders (image generation was slow or failed)."
+
+# Comic script modes: 'llm' asks the model, 'fast' builds the script locally
+# from the key sentences in milliseconds (previews and drafts)
+SCRIPT_MODES = ('llm', 'fast')
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def script_mode(requested=None):
+    """The requested comic script mode if valid, otherwise COMIC_SCRIPT_MODE"""
+    if requested in SCRIPT_MODES:
+        return requested
+    default = current_app.config.get('COMIC_SCRIPT_MODE', 'llm')
+    return default if default in SCRIPT_MODES else 'llm'
+
 def get_file_size_mb(file):
     file.seek(0, os.SEEK_END)
     size_bytes = file.tell()
@@ -69,7 +90,9 @@ def upload():
             file_path = os.path.join(upload_dir, filename)
             
             try:
-                file.save(file_path)
+                save_upload(file, file_path)
+                # Start processing now; the process route picks up the running job
+                speculative.start(*_process_job(file_path))
                 # Redirect to the process route to handle processing and display results
                 return redirect(url_for('content.process', filename=filename))
             except Exception as e:
@@ -82,6 +105,13 @@ def upload():
     
     return render_template('content/upload.html', title='Upload Files')
 
+def _topics_complete(results_data):
+    return not any(str(topic).startswith('Error:') for topic in results_data.get('topics', []))
+
+def _process_job(file_path):
+    """Key, route, pipeline and cacheable check of the standard pipeline for an upload"""
+    return pipeline_key('process', file_path), 'process', lambda: process_file(file_path), _topics_complete
+
 @bp.route('/process/<filename>')
 def process(filename):
     """Process the uploaded file and display generated content results"""
@@ -92,8 +122,9 @@ def process(filename):
         return redirect(url_for('content.upload'))
         
     try:
-        # Process the file using the utility function
-        results_data = process_file(file_path)
+        # Process the file using the utility function (once per upload content and
+        # settings), or collect the job the upload started
+        results_data = speculative.collect(*_process_job(file_path))
         
         # Render the results template with the generated data
         return render_template('content/results.html', 
@@ -115,67 +146,119 @@ def status():
     # Mock status or real status logic
     return jsonify({'progress': 100, 'status': 'Complete'}) 
 
+def _article_request():
+    """
+    Keyword arguments for the article API call, or an error response.
+
+    Returns:
+        (request_kwargs, None) or (None, (response, status)).
+    """
+    data = request.get_json()
+    topic = data.get('topic')
+    
+    if not topic:
+        return None, (jsonify({'error': 'Topic is required'}), 400)
+
+    # Check if AISENSUM_API_KEY is configured
+    aisensum_key = current_app.config.get("AISENSUM_API_KEY")
+    if not aisensum_key:
+         return None, (jsonify({'error': 'AiSensum API Key not configured.'}), 500)
+
+    # Generate article using AiSensum API
+    headers = {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {aisensum_key}'
+    }
+    
+    # Placeholder URL - replace with actual API endpoint if different
+    aisensum_url = current_app.config.get("MODEL_BASE_URL", "https://api.aisensum.com/v1") + '/generate/article'
+    return {
+        'url': aisensum_url,
+        'headers': headers,
+        'json': {
+            'topic': topic,
+            'style': 'informative', # Example parameters
+            'length': 'medium'
+        }
+    }, None
+
+def _article_key(article_request):
+    return single_flight.flight_key('article', article_request['url'],
+                                    article_request['headers']['Authorization'], article_request['json'])
+
+def _send_article(article_request):
+    """(status code, body) of the article call; plain values so concurrent duplicates can share them"""
+    import requests
+    with timed('llm_request', task='article'):
+        response = requests.post(**article_request)
+    return response.status_code, response.text
+
+async def _send_article_async(article_request):
+    with timed('llm_request', task='article'):
+        response = await async_http.post(article_request['url'], headers=article_request['headers'],
+                                         json=article_request['json'])
+    return response.status_code, response.text
+
+def _article_ok(result):
+    return 200 <= result[0] < 300
+
+def _article_failed(response_text, status_code):
+    error_message = response_text or f"Failed with status {status_code}"
+    current_app.logger.error(f"AiSensum API Error: {error_message}")
+    return jsonify({'error': f'Failed to generate article: {error_message}'}), 500
+
+def _article_script(script_data):
+    """Panels of a comic script result, [] if the script could not be written"""
+    script = script_data.get('comic_script') or []
+    if not script or script[0].get('description', '').startswith('Error:'):
+        detail = script[0].get('description', '') if script else 'empty script'
+        current_app.logger.warning(f"No comic script for the article, skipping comic generation: {detail}")
+        return []
+    return script
+
+def _article_response(article_data, comic_panels):
+    return jsonify({
+        'title': article_data.get('title', 'Untitled Article'),
+        'content': article_data.get('content', 'No content generated.'),
+        'comic_panels': comic_panels
+    })
+
 @bp.route('/generate-article', methods=['POST'])
 def generate_article():
+    import requests
     try:
-        data = request.get_json()
-        topic = data.get('topic')
-        
-        if not topic:
-            return jsonify({'error': 'Topic is required'}), 400
-
-        # Check if AISENSUM_API_KEY is configured
-        aisensum_key = current_app.config.get("AISENSUM_API_KEY")
-        if not aisensum_key:
-             return jsonify({'error': 'AiSensum API Key not configured.'}), 500
-
-        # Generate article using AiSensum API
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {aisensum_key}'
-        }
-        
-        # Placeholder URL - replace with actual API endpoint if different
-        aisensum_url = current_app.config.get("MODEL_BASE_URL", "https://api.aisensum.com/v1") + '/generate/article'
-
-        article_response = requests.post(
-            aisensum_url,
-            headers=headers,
-            json={
-                'topic': topic,
-                'style': 'informative', # Example parameters
-                'length': 'medium'
-            }
-        )
+        article_request, error = _article_request()
+        if error:
+            return error
+
+        # Identical article requests in flight (double clicks, other workers) share one call
+        status_code, response_text = single_flight.do('article', _article_key(article_request),
+                                                      lambda: _send_article(article_request),
+                                                      shareable=_article_ok)
         
-        if not article_response.ok:
-             error_message = article_response.text or f"Failed with status {article_response.status_code}"
-             current_app.logger.error(f"AiSensum API Error: {error_message}")
-             return jsonify({'error': f'Failed to generate article: {error_message}'}), 500
+        if not _article_ok((status_code, response_text)):
+             return _article_failed(response_text, status_code)
             
-        article_data = article_response.json()
+        article_data = json.loads(response_text)
 
         # Check if IDEOGRAM_API_KEY is configured
         ideogram_key = current_app.config.get("IDEOGRAM_API_KEY")
         comic_panels = []
         if ideogram_key:
-            # Generate comic panels using the article content
-            comic_panels = generate_comic_panels(
-                article_data.get('title', 'Untitled'),
-                article_data.get('content', ''),
-                api_key=ideogram_key
-            )
+            # Write a comic script for the article, then draw its panels
+            title = article_data.get('title', 'Untitled')
+            content = article_data.get('content', '')
+            if script_mode(request.get_json().get('script_mode')) == 'fast':
+                script_data = generate_fast_comic_script(content, num_comic_panels=4, title=title)
+            else:
+                script_data = generate_comic_script(content, num_comic_panels=4)
+            script = _article_script(script_data)
+            if script:
+                comic_panels = generate_comic_panels(script, ideogram_key)
         else:
             current_app.logger.warning("IDEOGRAM_API_KEY not configured. Skipping comic generation.")
         
-        # Prepare response
-        response_data = {
-            'title': article_data.get('title', 'Untitled Article'),
-            'content': article_data.get('content', 'No content generated.'),
-            'comic_panels': comic_panels
-        }
-        
-        return jsonify(response_data)
+        return _article_response(article_data, comic_panels)
         
     except requests.exceptions.RequestException as e:
         current_app.logger.error(f'API request error: {str(e)}')
@@ -184,6 +267,48 @@ def generate_article():
         current_app.logger.error(f'Error generating article: {str(e)}')
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500 
 
+@bp.route('/async/generate-article', methods=['POST'])
+async def generate_article_async():
+    """generate_article with the API waits on the pooled async client"""
+    import httpx
+    try:
+        article_request, error = _article_request()
+        if error:
+            return error
+
+        status_code, response_text = await single_flight.do_async('article', _article_key(article_request),
+                                                                  lambda: _send_article_async(article_request),
+                                                                  shareable=_article_ok)
+        
+        if not _article_ok((status_code, response_text)):
+             return _article_failed(response_text, status_code)
+            
+        article_data = json.loads(response_text)
+
+        ideogram_key = current_app.config.get("IDEOGRAM_API_KEY")
+        comic_panels = []
+        if ideogram_key:
+            title = article_data.get('title', 'Untitled')
+            content = article_data.get('content', '')
+            if script_mode(request.get_json().get('script_mode')) == 'fast':
+                script_data = generate_fast_comic_script(content, num_comic_panels=4, title=title)
+            else:
+                script_data = await generate_comic_script_async(content, num_comic_panels=4)
+            script = _article_script(script_data)
+            if script:
+                comic_panels = await generate_comic_panels_async(script, ideogram_key)
+        else:
+            current_app.logger.warning("IDEOGRAM_API_KEY not configured. Skipping comic generation.")
+        
+        return _article_response(article_data, comic_panels)
+        
+    except httpx.HTTPError as e:
+        current_app.logger.error(f'API request error: {str(e)}')
+        return jsonify({'error': f'API communication error: {str(e)}'}), 503 # Service Unavailable
+    except Exception as e:
+        current_app.logger.error(f'Error generating article: {str(e)}')
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500 
+
 @bp.route('/history')
 def history():
     """Display list of generated results history."""
@@ -260,6 +385,10 @@ def history_item(result_filename):
         elif result_type == 'carousel':
             template_name = 'content/results_carousel.html'
             title = 'View Carousel Result'
+        elif result_type == 'batch':
+            # Same topics / posts layout as a single-file result
+            template_name = 'content/results.html'
+            title = 'View Batch Result'
         else:
             flash(f'Unknown result type in {safe_filename}.', 'warning')
             # Display raw JSON or a generic error template?
@@ -328,7 +457,8 @@ def upload_carousel():
             file_path = os.path.join(upload_dir, secure_filename_val)
             
             try:
-                file.save(file_path)
+                save_upload(file, file_path)
+                speculative.start(*_carousel_job(file_path, secure_filename_val, extension, num_panels))
                 # Redirect to process_carousel, passing num_panels as query parameter
                 return redirect(url_for('content.process_carousel', filename=secure_filename_val, num_panels=num_panels))
             except Exception as e:
@@ -341,6 +471,46 @@ def upload_carousel():
     
     return render_template('content/upload_carousel.html', title='Upload Text or PDF for Carousel')
 
+def _carousel_pipeline(file_path, filename, ext, num_panels):
+    """Extract, generate and save a carousel; None if the file has no text"""
+    text_content = extract_text_from_txt(file_path) if ext == 'txt' else extract_text_from_pdf(file_path)
+    if text_content is None or not text_content.strip():
+         current_app.logger.warning(f"Text extraction failed or empty for {filename} (type: {ext})")
+         return None
+
+    # Process the extracted text using the carousel function, passing num_panels
+    results_data = process_text_for_carousel(text_content, num_panels=num_panels)
+    
+    # Add metadata (including num_panels requested) and save results
+    results_data['result_type'] = 'carousel'
+    results_data['original_filename'] = filename
+    results_data['num_panels_requested'] = num_panels # Store requested number
+    results_data['timestamp'] = datetime.utcnow().isoformat()
+    results_data['timings'] = request_timings()
+    
+    results_dir = os.path.join(current_app.static_folder, RESULTS_DIR_NAME)
+    os.makedirs(results_dir, exist_ok=True)
+    timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    result_filename = f"{os.path.splitext(filename)[0]}_{timestamp_str}_carousel.json"
+    result_file_path = os.path.join(results_dir, result_filename)
+    
+    with timed('persist_results'), open(result_file_path, 'w') as f_json:
+        json.dump(results_data, f_json, indent=4)
+    current_app.logger.info(f"Carousel results saved to {result_filename}")
+    return results_data
+
+def _carousel_complete(results_data):
+    """Empty files and model errors are not stored, so the next request retries"""
+    if results_data is None:
+        return False
+    panels = results_data.get('carousel_panels') or []
+    return bool(panels) and panels[0].get('title') != 'Error'
+
+def _carousel_job(file_path, filename, ext, num_panels):
+    """Key, route, pipeline and cacheable check of the carousel pipeline for an upload"""
+    return (pipeline_key('carousel', file_path, num_panels=num_panels), 'carousel',
+            lambda: _carousel_pipeline(file_path, filename, ext, num_panels), _carousel_complete)
+
 @bp.route('/process_carousel/<filename>')
 def process_carousel(filename):
     """Process the uploaded text/pdf file for carousel and display results."""
@@ -362,41 +532,19 @@ def process_carousel(filename):
         # Determine file type and extract text directly
         _, ext = os.path.splitext(filename)
         ext = ext.lower().lstrip('.')
-        text_content = None
-
-        if ext == 'txt':
-            text_content = extract_text_from_txt(file_path)
-        elif ext == 'pdf':
-            text_content = extract_text_from_pdf(file_path)
-        else:
+        if ext not in ('txt', 'pdf'):
             # Should not happen due to checks in upload_carousel, but good practice
             flash(f'Unsupported file type for carousel: {ext}', 'danger')
             return redirect(url_for('content.upload_carousel'))
-            
-        if text_content is None or not text_content.strip():
+
+        # Extraction, generation and the saved JSON happen once per upload
+        # content, panel count and settings (usually already started by the
+        # upload); refreshes get the stored result
+        results_data = speculative.collect(*_carousel_job(file_path, filename, ext, num_panels))
+        if results_data is None:
              flash(f'Could not extract text content from {filename} or the file is empty.', 'warning')
-             current_app.logger.warning(f"Text extraction failed or empty for {filename} (type: {ext})")
              return redirect(url_for('content.upload_carousel'))
 
-        # Process the extracted text using the carousel function, passing num_panels
-        results_data = process_text_for_carousel(text_content, num_panels=num_panels)
-        
-        # Add metadata (including num_panels requested) and save results
-        results_data['result_type'] = 'carousel'
-        results_data['original_filename'] = filename
-        results_data['num_panels_requested'] = num_panels # Store requested number
-        results_data['timestamp'] = datetime.utcnow().isoformat()
-        
-        results_dir = os.path.join(current_app.static_folder, RESULTS_DIR_NAME)
-        os.makedirs(results_dir, exist_ok=True)
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        result_filename = f"{os.path.splitext(filename)[0]}_{timestamp_str}_carousel.json"
-        result_file_path = os.path.join(results_dir, result_filename)
-        
-        with open(result_file_path, 'w') as f_json:
-            json.dump(results_data, f_json, indent=4)
-        current_app.logger.info(f"Carousel results saved to {result_filename}")
-
         # Render the carousel results template
         return render_template('content/results_carousel.html', 
                               title='Generated Carousel Content', 
@@ -439,9 +587,12 @@ def upload_combined():
             os.makedirs(upload_dir, exist_ok=True)
             file_path = os.path.join(upload_dir, filename)
             try:
-                file.save(file_path)
+                save_upload(file, file_path)
+                mode = script_mode(request.form.get('script_mode'))
+                speculative.start(_combined_key(file_path, mode), 'combined',
+                                  lambda: _combined_pipeline(file_path, filename, mode), _combined_complete)
                 # Redirect to the new combined process route
-                return redirect(url_for('content.process_combined', filename=filename))
+                return redirect(url_for('content.process_combined', filename=filename, script_mode=mode))
             except Exception as e: 
                 current_app.logger.error(f"Error saving file for combined generation: {e}")
                 flash('Error saving file.', 'danger'); return redirect(request.url)
@@ -451,117 +602,340 @@ def upload_combined():
             
     return render_template('content/upload_combined.html', title='Upload for Content + Comic')
 
-@bp.route('/process_combined/<filename>')
-def process_combined(filename):
-    """Process uploaded file for both carousel content and comic strip."""
-    file_path = os.path.join(current_app.static_folder, 'uploads', filename)
-    if not os.path.exists(file_path): flash(f'File {filename} not found.', 'danger'); return redirect(url_for('content.upload_combined'))
+def _outcome(fn, *args, **kwargs):
+    """fn's result, or the exception it raised (the shape asyncio.gather(return_exceptions=True) gives)"""
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        return e
 
-    text_content = None
-    carousel_results = None
-    comic_script_data = None
-    comic_panels = None
-    final_results = { # Initialize results structure
+def _new_combined_results(filename, mode):
+    return { # Initialize results structure
         'result_type': 'combined',
         'original_filename': filename,
         'timestamp': datetime.utcnow().isoformat(),
+        'script_mode': mode,
         'carousel_panels': None,
         'comic_script': None,
         'comic_panels': None,
         'errors': []
     }
 
-    try:
-        # 1. Extract Text
-        _, ext = os.path.splitext(filename)
-        ext = ext.lower().lstrip('.')
-        if ext == 'txt': text_content = extract_text_from_txt(file_path)
-        elif ext == 'pdf': text_content = extract_text_from_pdf(file_path)
-        
-        if text_content is None or not text_content.strip():
-            final_results['errors'].append('Could not extract text content or file is empty.')
-            raise ValueError("Text extraction failed or empty.")
-
-        # 2. Generate Carousel Content (Using Groq)
-        try:
-            carousel_results = process_text_for_carousel(text_content, num_panels=8) # Fixed 8 panels for combined
-            if not carousel_results or 'carousel_panels' not in carousel_results or not carousel_results['carousel_panels'] or carousel_results['carousel_panels'][0].get('title') == 'Error':
-                 final_results['errors'].append(f"Failed to generate carousel content. Details: {carousel_results.get('carousel_panels', [{}])[0].get('text', 'Unknown Groq Error')}")
-                 final_results['carousel_panels'] = [] # Ensure it's a list even on error
-            else:
-                 final_results['carousel_panels'] = carousel_results['carousel_panels']
-        except Exception as e:
-             current_app.logger.error(f"Error calling process_text_for_carousel: {e}", exc_info=True)
-             final_results['errors'].append(f"Error generating carousel content: {e}")
-             final_results['carousel_panels'] = []
-
-        # 3. Generate Comic Script (Using Groq)
-        try:
-            # Using fixed 4 panels for comic script for simplicity
-            comic_script_data = generate_comic_script(text_content, num_comic_panels=4) 
-            if not comic_script_data or 'comic_script' not in comic_script_data or not comic_script_data['comic_script'] or comic_script_data['comic_script'][0].get('description', '').startswith('Error:'):
-                error_detail = comic_script_data.get('comic_script', [{}])[0].get('description', 'Unknown Groq Error')
-                final_results['errors'].append(f"Failed to generate comic script. Details: {error_detail}")
-                final_results['comic_script'] = []
-            else:
-                 final_results['comic_script'] = comic_script_data['comic_script']
-        except Exception as e:
-             current_app.logger.error(f"Error calling generate_comic_script: {e}", exc_info=True)
-             final_results['errors'].append(f"Error generating comic script: {e}")
-             final_results['comic_script'] = []
-
-        # 4. Generate Comic Images (Using Ideogram, only if script exists)
-        ideogram_key = current_app.config.get("IDEOGRAM_API_KEY")
-        if final_results['comic_script'] and ideogram_key:
+def _combined_text(file_path, filename, final_results):
+    """Extract the upload's text; raises ValueError if there is none"""
+    text_content = None
+    _, ext = os.path.splitext(filename)
+    ext = ext.lower().lstrip('.')
+    if ext == 'txt': text_content = extract_text_from_txt(file_path)
+    elif ext == 'pdf': text_content = extract_text_from_pdf(file_path)
+    
+    if text_content is None or not text_content.strip():
+        final_results['errors'].append('Could not extract text content or file is empty.')
+        raise ValueError("Text extraction failed or empty.")
+    return text_content
+
+def _record_carousel(final_results, carousel_results):
+    if isinstance(carousel_results, Exception):
+        current_app.logger.error(f"Error calling process_text_for_carousel: {carousel_results}", exc_info=carousel_results)
+        final_results['errors'].append(f"Error generating carousel content: {carousel_results}")
+        final_results['carousel_panels'] = []
+    elif not carousel_results or 'carousel_panels' not in carousel_results or not carousel_results['carousel_panels'] or carousel_results['carousel_panels'][0].get('title') == 'Error':
+        final_results['errors'].append(f"Failed to generate carousel content. Details: {carousel_results.get('carousel_panels', [{}])[0].get('text', 'Unknown Groq Error')}")
+        final_results['carousel_panels'] = [] # Ensure it's a list even on error
+    else:
+        final_results['carousel_panels'] = carousel_results['carousel_panels']
+
+def _record_comic_script(final_results, comic_script_data):
+    if isinstance(comic_script_data, Exception):
+        current_app.logger.error(f"Error calling generate_comic_script: {comic_script_data}", exc_info=comic_script_data)
+        final_results['errors'].append(f"Error generating comic script: {comic_script_data}")
+        final_results['comic_script'] = []
+    elif not comic_script_data or 'comic_script' not in comic_script_data or not comic_script_data['comic_script'] or comic_script_data['comic_script'][0].get('description', '').startswith('Error:'):
+        error_detail = comic_script_data.get('comic_script', [{}])[0].get('description', 'Unknown Groq Error')
+        final_results['errors'].append(f"Failed to generate comic script. Details: {error_detail}")
+        final_results['comic_script'] = []
+    else:
+        final_results['comic_script'] = comic_script_data['comic_script']
+
+def _comic_images_key(final_results):
+    """Ideogram key when comic images should be generated, otherwise records why they are skipped"""
+    ideogram_key = current_app.config.get("IDEOGRAM_API_KEY")
+    if final_results['comic_script'] and ideogram_key:
+        return ideogram_key
+    if not ideogram_key:
+        final_results['errors'].append("Ideogram API Key not configured. Skipping comic image generation.")
+    else:
+        final_results['errors'].append("Comic script generation failed. Skipping comic image generation.")
+    final_results['comic_panels'] = []
+    return None
+
+def _record_comic_panels(final_results, comic_panels):
+    if isinstance(comic_panels, Exception):
+        current_app.logger.error(f"Error calling generate_comic_panels: {comic_panels}", exc_info=comic_panels)
+        final_results['errors'].append(f"Error generating comic images: {comic_panels}")
+        final_results['comic_panels'] = [] # Ensure list on error
+    elif not comic_panels:
+        final_results['errors'].append("Comic image generation returned empty results.")
+        final_results['comic_panels'] = []
+    else:
+        final_results['comic_panels'] = comic_panels
+        # Check for individual panel errors from generator
+        if any(p.get('description','').find('(Error:') != -1 for p in comic_panels):
+            final_results['errors'].append("Some comic images failed to generate (check panel descriptions).")
+        if any(p.get('fallback') for p in comic_panels):
+            final_results['errors'].append(PLACEHOLDER_PANELS_ERROR)
+
+def _saved_results():
+    """Where a combined run's results were saved; replacement renders may finish before or after"""
+    return {'lock': threading.Lock(), 'path': None}
+
+def _replace_comic_panels(final_results, saved, comic_panels):
+    """on_replaced callback: real images of placeholder panels go into the results and their saved JSON"""
+    with saved['lock']:
+        final_results['comic_panels'] = comic_panels
+        if not any(p.get('fallback') for p in comic_panels):
+            final_results['errors'] = [e for e in final_results['errors'] if e != PLACEHOLDER_PANELS_ERROR]
+        if saved['path']:
             try:
-                comic_panels = generate_comic_panels(script=final_results['comic_script'], api_key=ideogram_key)
-                if not comic_panels:
-                     final_results['errors'].append("Comic image generation returned empty results.")
-                     final_results['comic_panels'] = []
-                else:
-                     final_results['comic_panels'] = comic_panels
-                     # Check for individual panel errors from generator
-                     if any(p.get('description','').find('(Error:') != -1 for p in comic_panels):
-                          final_results['errors'].append("Some comic images failed to generate (check panel descriptions).")
-            except Exception as e:
-                current_app.logger.error(f"Error calling generate_comic_panels: {e}", exc_info=True)
-                final_results['errors'].append(f"Error generating comic images: {e}")
-                final_results['comic_panels'] = [] # Ensure list on error
-        elif not ideogram_key:
-             final_results['errors'].append("Ideogram API Key not configured. Skipping comic image generation.")
-             final_results['comic_panels'] = []
-        elif not final_results['comic_script']:
-             final_results['errors'].append("Comic script generation failed. Skipping comic image generation.")
-             final_results['comic_panels'] = []
-             
-    except ValueError as e:
-         # Error from text extraction
-         flash(str(e), 'danger')
-         current_app.logger.error(f"Value error during combined processing for {filename}: {e}")
-         return redirect(url_for('content.upload_combined'))
-    except Exception as e:
-         # Catch any other unexpected errors during the sequence
-         flash('An unexpected error occurred during combined processing.', 'danger')
-         current_app.logger.error(f"Unexpected error in process_combined for {filename}: {e}", exc_info=True)
-         final_results['errors'].append(f"Unexpected processing error: {e}")
-         # Attempt to render results even with errors
-         
-    # 5. Save Combined Results to JSON
+                with open(saved['path'], 'w') as f_json: json.dump(final_results, f_json, indent=4)
+            except OSError as e:
+                current_app.logger.error("Failed to save replaced comic panels to %s: %s", saved['path'], e)
+                return
+        current_app.logger.info("Placeholder panels replaced for %s", final_results['original_filename'])
+
+def _combined_failed(filename, e):
+    """Redirect back to the upload form after a text extraction error"""
+    flash(str(e), 'danger')
+    current_app.logger.error(f"Value error during combined processing for {filename}: {e}")
+    return redirect(url_for('content.upload_combined'))
+
+def _record_combined_error(filename, final_results, e):
+    """
+    Record an unexpected error that stopped the combined pipeline.
+
+    The pipeline may run as a speculative job after the upload response
+    was sent, so the message is kept in the results and flashed by the
+    request that collects them.
+    """
+    current_app.logger.error(f"Unexpected error in process_combined for {filename}: {e}", exc_info=e)
+    final_results['errors'].append(f"Unexpected processing error: {e}")
+    final_results.setdefault('flash_messages', []).append(
+        ['An unexpected error occurred during combined processing.', 'danger'])
+
+def _save_combined(filename, final_results):
+    """Save the combined results to JSON; returns the file's path, None if it could not be saved"""
     try:
         results_dir = os.path.join(current_app.static_folder, RESULTS_DIR_NAME)
         os.makedirs(results_dir, exist_ok=True)
         timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
         result_filename = f"{os.path.splitext(filename)[0]}_{timestamp_str}_combined.json"
         result_file_path = os.path.join(results_dir, result_filename)
-        with open(result_file_path, 'w') as f_json: json.dump(final_results, f_json, indent=4)
+        final_results['timings'] = request_timings()
+        with timed('persist_results'), open(result_file_path, 'w') as f_json: json.dump(final_results, f_json, indent=4)
         current_app.logger.info(f"Combined results saved to {result_filename}")
+        return result_file_path
     except Exception as e:
          current_app.logger.error(f"Failed to save combined results JSON for {filename}: {e}")
          final_results['errors'].append("Failed to save results file.")
          # Continue to render anyway
+         return None
 
-    # 6. Render the Combined Results Template
-    # Need to create this template
+def _render_combined(final_results):
+    for message, category in final_results.get('flash_messages', []):
+        flash(message, category)
     return render_template('content/results_combined.html', 
                           title='Generated Content + Comic', 
-                          results=final_results)
\ No newline at end of file
+                          results=final_results)
+
+def _combined_key(file_path, mode):
+    return pipeline_key('combined', file_path, script_mode=mode,
+                        comic_images=bool(current_app.config.get("IDEOGRAM_API_KEY")))
+
+def _combined_complete(final_results):
+    """Only fully generated results are stored, so the next request retries failed steps"""
+    if not final_results['carousel_panels'] or not final_results['comic_script']:
+        return False
+    comic_panels = final_results['comic_panels'] or []
+    if current_app.config.get("IDEOGRAM_API_KEY") and not comic_panels:
+        return False
+    return all(panel.get('image_url') and not panel.get('fallback') for panel in comic_panels)
+
+def _combined_pipeline(file_path, filename, mode):
+    """Run the combined pipeline and save its JSON; raises ValueError if the file has no text"""
+    final_results = _new_combined_results(filename, mode)
+    saved = _saved_results()
+    try:
+        # 1. Extract Text
+        text_content = _combined_text(file_path, filename, final_results)
+
+        # 2. Generate Carousel Content (Using Groq), fixed 8 panels for combined
+        _record_carousel(final_results, _outcome(process_text_for_carousel, text_content, num_panels=8))
+
+        # 3. Generate Comic Script (Using Groq, or locally in fast mode), fixed 4 panels for simplicity
+        write_script = generate_fast_comic_script if mode == 'fast' else generate_comic_script
+        _record_comic_script(final_results, _outcome(write_script, text_content, num_comic_panels=4))
+
+        # 4. Generate Comic Images (Using Ideogram, only if script exists);
+        # placeholder panels are rendered again in the background
+        ideogram_key = _comic_images_key(final_results)
+        if ideogram_key:
+            _record_comic_panels(final_results, _outcome(generate_comic_panels, script=final_results['comic_script'], api_key=ideogram_key,
+                                                         on_replaced=lambda panels: _replace_comic_panels(final_results, saved, panels)))
+    except ValueError:
+        raise
+    except Exception as e:
+        # Attempt to render results even with errors
+        _record_combined_error(filename, final_results, e)
+
+    # 5. Save the combined results
+    with saved['lock']:
+        saved['path'] = _save_combined(filename, final_results)
+    return final_results
+
+async def _combined_pipeline_async(file_path, filename, mode):
+    """
+    _combined_pipeline with the API waits on the pooled async client.
+
+    The carousel and comic script calls are independent and run
+    concurrently, then all comic panels are requested at once.
+    """
+    final_results = _new_combined_results(filename, mode)
+    saved = _saved_results()
+    try:
+        text_content = _combined_text(file_path, filename, final_results)
+
+        if mode == 'fast':
+            # The local script takes milliseconds; only the carousel waits on the model
+            comic_script_data = _outcome(generate_fast_comic_script, text_content, num_comic_panels=4)
+            carousel_results, = await asyncio.gather(
+                process_text_for_carousel_async(text_content, num_panels=8),
+                return_exceptions=True
+            )
+        else:
+            carousel_results, comic_script_data = await asyncio.gather(
+                process_text_for_carousel_async(text_content, num_panels=8),
+                generate_comic_script_async(text_content, num_comic_panels=4),
+                return_exceptions=True
+            )
+        _record_carousel(final_results, carousel_results)
+        _record_comic_script(final_results, comic_script_data)
+
+        ideogram_key = _comic_images_key(final_results)
+        if ideogram_key:
+            comic_panels, = await asyncio.gather(
+                generate_comic_panels_async(final_results['comic_script'], ideogram_key,
+                                            on_replaced=lambda panels: _replace_comic_panels(final_results, saved, panels)),
+                return_exceptions=True
+            )
+            _record_comic_panels(final_results, comic_panels)
+    except ValueError:
+        raise
+    except Exception as e:
+        # Attempt to render results even with errors
+        _record_combined_error(filename, final_results, e)
+
+    with saved['lock']:
+        saved['path'] = _save_combined(filename, final_results)
+    return final_results
+
+@bp.route('/process_combined/<filename>')
+def process_combined(filename):
+    """Process uploaded file for both carousel content and comic strip."""
+    file_path = os.path.join(current_app.static_folder, 'uploads', filename)
+    if not os.path.exists(file_path): flash(f'File {filename} not found.', 'danger'); return redirect(url_for('content.upload_combined'))
+
+    mode = script_mode(request.args.get('script_mode'))
+    try:
+        # Runs once per upload content and settings, usually started by the
+        # upload; refreshes get the stored result
+        final_results = speculative.collect(_combined_key(file_path, mode), 'combined',
+                                            lambda: _combined_pipeline(file_path, filename, mode),
+                                            _combined_complete)
+    except ValueError as e:
+        return _combined_failed(filename, e)
+
+    return _render_combined(final_results)
+
+@bp.route('/async/process_combined/<filename>')
+async def process_combined_async(filename):
+    """process_combined with the API waits on the pooled async client"""
+    file_path = os.path.join(current_app.static_folder, 'uploads', filename)
+    if not os.path.exists(file_path): flash(f'File {filename} not found.', 'danger'); return redirect(url_for('content.upload_combined'))
+
+    mode = script_mode(request.args.get('script_mode'))
+    try:
+        final_results = await speculative.collect_async(_combined_key(file_path, mode), 'combined',
+                                                        lambda: _combined_pipeline_async(file_path, filename, mode),
+                                                        _combined_complete)
+    except ValueError as e:
+        return _combined_failed(filename, e)
+
+    return _render_combined(final_results)
+
+# --- Batch Routes ---
+
+# Per-file size limits in MB, as for single uploads
+BATCH_MAX_FILE_MB = {'pdf': 10, 'msg': 15, 'eml': 15, 'txt': 5}
+
+def _batch_name(requested):
+    return secure_filename(requested or '') or 'batch'
+
+@bp.route('/batch', methods=['POST'])
+def batch():
+    """
+    Generate content for many files at once (multipart field 'files').
+    
+    Emails and documents are processed as separate batches under their
+    CONTENT_LIMITS quotas; each result is saved to the history and returned
+    with its throughput.
+    """
+    files = [f for f in request.files.getlist('files') if f and f.filename]
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+    max_files = current_app.config.get('BATCH_PROCESSING', {}).get('max_files', 50)
+    if len(files) > max_files:
+        return jsonify({'error': f'At most {max_files} files per batch'}), 400
+    
+    rejected = []
+    extensions = []
+    for file in files:
+        extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
+        extensions.append(extension)
+        if extension not in BATCH_EXTENSIONS:
+            rejected.append(f'{file.filename}: file type not allowed')
+        elif get_file_size_mb(file) > BATCH_MAX_FILE_MB[extension]:
+            rejected.append(f'{file.filename}: {extension.upper()} file size must be less than {BATCH_MAX_FILE_MB[extension]}MB')
+    if rejected:
+        return jsonify({'error': 'Invalid files', 'details': rejected}), 400
+    
+    # Each batch gets its own upload directory, and each file an index
+    # prefix: uploads from different folders may share a name (report.pdf)
+    name = _batch_name(request.form.get('name'))
+    batch_dir = os.path.join(current_app.static_folder, 'uploads', f"{name}_{uuid.uuid4().hex[:12]}")
+    os.makedirs(batch_dir, exist_ok=True)
+    try:
+        for index, (file, extension) in enumerate(zip(files, extensions)):
+            stem = secure_filename(file.filename.rsplit('.', 1)[0]) or 'file'
+            file.save(os.path.join(batch_dir, f"{index:03d}_{stem}.{extension}"))
+        results = run_batches([batch_dir], name)
+    except Exception as e:
+        current_app.logger.error(f"Error processing batch {name}: {e}", exc_info=True)
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    return jsonify({'batches': results})
+
+@bp.cli.command('batch')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--name', default='batch', help='Prefix of the saved result files.')
+def batch_command(paths, name):
+    """Generate content for files and directories of .pdf/.txt/.msg/.eml files."""
+    results = run_batches(paths, _batch_name(name))
+    if not results:
+        raise click.ClickException('No .pdf, .txt, .msg or .eml files found.')
+    for result in results:
+        throughput = result['throughput']
+        click.echo(f"{result['result_file']}: {throughput['documents']} texts from {throughput['files']} files "
+                   f"({len(result['failed_files'])} failed), {throughput['model_requests']} model requests; "
+                   f"extract {throughput['extract_seconds']}s, generate {throughput['generate_seconds']}s, "
+                   f"{throughput['files_per_second']} files/s, {throughput['input_tokens_per_second']} tokens/s")
+        for error in result['errors']:
+            click.echo(f"  {error}", err=True)
@@ -1,6 +1,11 @@
-from flask import render_template, request, redirect, url_for, flash, current_app
+import os
+import sqlite3
+from flask import render_template, request, redirect, url_for, flash, current_app, jsonify, Response
 from app.main import bp
 from app.config import Config
+from app.utils.rate_limiter import get_scheduler
+from app.utils.comic_store import store_root
+from app.utils.metrics import registry
 
 @bp.route('/')
 @bp.route('/index')
@@ -13,4 +18,66 @@ def about():
     """About page with company information"""
     company_info = current_app.config['COMPANY_INFO']
     return render_template('main/about.html', title='About AiSensum', 
-                          company_info=company_info) 
\ No newline at end of file
+                          company_info=company_info)
+
+@bp.route('/status/rate_limits')
+def rate_limits():
+    """Queue depth and wait times of the outbound API scheduler"""
+    return jsonify(get_scheduler().stats())
+
+@bp.route('/metrics')
+def metrics():
+    """Pipeline timings, token usage and cache counters in Prometheus text format"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/healthz')
+def healthz():
+    """Liveness: the worker is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+def _writable_dir(path):
+    os.makedirs(path, exist_ok=True)
+    if not os.access(path, os.W_OK):
+        raise OSError(f"{path} is not writable")
+
+@bp.route('/readyz')
+def readyz():
+    """
+    Readiness: the LLM API key is configured and the storage the pipelines
+    need (uploads, comic store, rate-limit database) is usable.
+
+    Returns 503 with the failing checks so a load balancer or orchestrator
+    keeps traffic away from a misconfigured worker. A missing Ideogram key
+    is reported under 'degraded' without failing readiness: comics are
+    drawn locally without it and the text pipelines never use it.
+    """
+    config = current_app.config
+    checks = {}
+
+    checks['llm_api_key'] = 'ok' if config.get('AISENSUM_API_KEY') else 'missing'
+
+    for name, path in (('uploads_dir', lambda: os.path.join(current_app.static_folder, 'uploads')),
+                       ('comic_store', store_root)):
+        try:
+            _writable_dir(path())
+            checks[name] = 'ok'
+        except OSError as e:
+            checks[name] = str(e)
+
+    try:
+        get_scheduler().ping()
+        checks['rate_limit_db'] = 'ok'
+    except (sqlite3.Error, OSError) as e:
+        checks['rate_limit_db'] = str(e)
+
+    degraded = {}
+    if not config['COMIC_SETTINGS'].get('api_key'):
+        degraded['ideogram_api_key'] = 'missing'
+
+    ready = all(value == 'ok' for value in checks.values())
+    if not ready:
+        current_app.logger.warning("Readiness check failed: %s", checks)
+        status = 'not ready'
+    else:
+        status = 'degraded' if degraded else 'ready'
+    return jsonify({'status': status, 'checks': checks, 'degraded': degraded}), 200 if ready else 503
@@ -0,0 +1,214 @@
+import hashlib
+import logging
+import math
+import re
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Word n-grams used as shingles for near-duplicate detection
+SHINGLE_SIZE = 5
+# MinHash signature length, split into LSH bands of NUM_PERM // LSH_BANDS rows
+NUM_PERM = 64
+LSH_BANDS = 16
+# Estimated Jaccard similarity above which two bodies count as duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# A line is boilerplate if it appears in at least this many emails and in
+# this fraction of the batch (footers, disclaimers, unsubscribe links)
+BOILERPLATE_MIN_DOCS = 3
+BOILERPLATE_FRACTION = 0.3
+# Shorter lines ("Thanks,", "Hi all") are too generic to learn from
+BOILERPLATE_MIN_LENGTH = 20
+
+# Multiply-shift hash family: odd 64-bit multipliers, keep the high 32 bits
+_rng = np.random.default_rng(1)
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _normalize_line(line):
+    return ' '.join(line.lower().split())
+
+
+def learn_boilerplate(bodies, min_docs=BOILERPLATE_MIN_DOCS, min_fraction=BOILERPLATE_FRACTION):
+    """
+    Learn the lines repeated across a batch of email bodies.
+
+    Returns:
+        Set of normalized lines to drop.
+    """
+    required = max(min_docs, math.ceil(min_fraction * len(bodies)))
+    if len(bodies) < required:
+        return set()
+
+    document_frequency = {}
+    for body in bodies:
+        seen = {_normalize_line(line) for line in body.split('\n')}
+        for line in seen:
+            if len(line) >= BOILERPLATE_MIN_LENGTH:
+                document_frequency[line] = document_frequency.get(line, 0) + 1
+    return {line for line, count in document_frequency.items() if count >= required}
+
+
+def strip_boilerplate(body, boilerplate):
+    """Remove learned boilerplate lines from a body"""
+    if not boilerplate:
+        return body
+    lines = [line for line in body.split('\n') if _normalize_line(line) not in boilerplate]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def _shingles(text, size=SHINGLE_SIZE):
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text, size=SHINGLE_SIZE):
+    """MinHash signature (NUM_PERM values) of a text's word shingles"""
+    shingles = _shingles(text, size)
+    if not shingles:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+         for shingle in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    # uint64 arithmetic wraps, which is the "mod 2^64" of multiply-shift hashing
+    permuted = (hashes[None, :] * _MULTIPLIERS[:, None] + _OFFSETS[:, None]) >> np.uint64(32)
+    return tuple(permuted.min(axis=1).tolist())
+
+
+def near_duplicates(texts, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Find near-duplicate texts with MinHash and LSH banding.
+
+    Only pairs sharing at least one band bucket are compared, so the cost
+    grows with the batch size rather than with the number of pairs.
+
+    Returns:
+        Dict mapping the index of each duplicate to the index it duplicates
+        (always an earlier text).
+    """
+    rows = NUM_PERM // LSH_BANDS
+    signatures = [minhash(text) for text in texts]
+    buckets = {}
+    duplicates = {}
+
+    for index, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        candidates = set()
+        for band in range(LSH_BANDS):
+            key = (band, signature[band * rows:(band + 1) * rows])
+            candidates.update(buckets.get(key, ()))
+            buckets.setdefault(key, []).append(index)
+
+        for other in sorted(candidates):
+            if other in duplicates:
+                continue
+            matches = sum(1 for x, y in zip(signature, signatures[other]) if x == y)
+            if matches / NUM_PERM >= threshold:
+                duplicates[index] = other
+                break
+    return duplicates
+
+
+def group_threads(records):
+    """
+    Group emails into threads by Message-ID, In-Reply-To and References.
+
+    Returns:
+        Lists of record indexes, one per thread, with parents before
+        replies; threads are in batch order.
+    """
+    parent = list(range(len(records)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = {}
+    for index, record in enumerate(records):
+        ids = ([record['message_id']] if record.get('message_id') else []) \
+            + record.get('in_reply_to', []) + record.get('references', [])
+        for message_id in ids:
+            if message_id in owner:
+                parent[find(index)] = find(owner[message_id])
+            else:
+                owner[message_id] = index
+
+    # Order each thread by reply depth so parents come before replies
+    by_id = {record['message_id']: index for index, record in enumerate(records) if record.get('message_id')}
+    depths = {}
+
+    def depth(index, visiting=()):
+        if index not in depths:
+            record = records[index]
+            parents = record.get('in_reply_to', [])[:1] or record.get('references', [])[-1:]
+            parent = by_id.get(parents[0]) if parents else None
+            if parent is None or parent == index or parent in visiting:
+                depths[index] = 0
+            else:
+                depths[index] = depth(parent, visiting + (index,)) + 1
+        return depths[index]
+
+    threads = {}
+    for index in range(len(records)):
+        threads.setdefault(find(index), []).append(index)
+    ordered = [sorted(members, key=lambda i: (depth(i), i)) for members in threads.values()]
+    return sorted(ordered, key=lambda members: min(members))
+
+
+def dedupe_emails(records):
+    """
+    Drop repeated content from a batch of email records.
+
+    Steps: collapse copies of the same Message-ID, strip boilerplate lines
+    learned from the batch, drop near-duplicate bodies (e.g. the same
+    forward saved twice), then group what is left by thread.
+
+    Args:
+        records: Dicts from read_msg/read_eml with an added 'name'.
+
+    Returns:
+        (threads, stats): threads is a list of record lists; stats counts
+        what was removed.
+    """
+    stats = {'emails': len(records), 'duplicate_ids': 0, 'near_duplicates': 0,
+             'boilerplate_lines': 0, 'chars_before': sum(len(r['body']) for r in records)}
+
+    unique = []
+    seen_ids = set()
+    for record in records:
+        message_id = record.get('message_id')
+        if message_id and message_id in seen_ids:
+            stats['duplicate_ids'] += 1
+            continue
+        if message_id:
+            seen_ids.add(message_id)
+        unique.append(dict(record))
+
+    boilerplate = learn_boilerplate([record['body'] for record in unique])
+    stats['boilerplate_lines'] = len(boilerplate)
+    for record in unique:
+        record['body'] = strip_boilerplate(record['body'], boilerplate)
+
+    duplicates = near_duplicates([record['body'] for record in unique])
+    stats['near_duplicates'] = len(duplicates)
+    kept = [record for index, record in enumerate(unique) if index not in duplicates and record['body']]
+
+    threads = [[kept[index] for index in members] for members in group_threads(kept)]
+    stats['threads'] = len(threads)
+    stats['chars_after'] = sum(len(record['body']) for record in kept)
+    logger.info("Email dedup: %d emails -> %d kept in %d threads (%d duplicate ids, %d near duplicates, "
+                "%d boilerplate lines, %d -> %d chars)",
+                stats['emails'], len(kept), stats['threads'], stats['duplicate_ids'], stats['near_duplicates'],
+                stats['boilerplate_lines'], stats['chars_before'], stats['chars_after'])
+    return threads, stats
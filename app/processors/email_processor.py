@@ -1,145 +1,537 @@
 import os
+import re
+import codecs
 import logging
-import email
-import extract_msg
+import struct
+import olefile
+from concurrent.futures import ProcessPoolExecutor
+from email import policy
+from email.parser import BytesFeedParser, BytesHeaderParser
+from html.parser import HTMLParser
 from pathlib import Path
 
-# Configure logging for this module
+# Level comes from the app's LOG_LEVEL / LOG_LEVELS config
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)  # Set to DEBUG for more detailed logging
+
+# MAPI property streams in an Outlook .msg compound file. The 001F suffix
+# is UTF-16LE, 001E is 8-bit text in the message code page, 0102 is binary.
+MSG_SUBJECT_STREAMS = ('__substg1.0_0037001F', '__substg1.0_0037001E')
+MSG_BODY_STREAMS = ('__substg1.0_1000001F', '__substg1.0_1000001E')
+MSG_HTML_STREAMS = ('__substg1.0_10130102', '__substg1.0_1013001F', '__substg1.0_1013001E')
+MSG_MESSAGE_ID_STREAMS = ('__substg1.0_1035001F', '__substg1.0_1035001E')
+MSG_IN_REPLY_TO_STREAMS = ('__substg1.0_1042001F', '__substg1.0_1042001E')
+MSG_REFERENCES_STREAMS = ('__substg1.0_1039001F', '__substg1.0_1039001E')
+
+# Top-level property table: a 32-byte header, then 16-byte entries of
+# (tag, flags, 8-byte value). The code page comes from PR_MESSAGE_CODEPAGE,
+# else PR_INTERNET_CPID, both PT_LONG; cp1252 when neither is set.
+MSG_PROPERTIES_STREAM = '__properties_version1.0'
+MSG_PROPERTIES_HEADER_SIZE = 32
+MSG_CODEPAGE_TAGS = (0x3FFD0003, 0x3FDE0003)
+MSG_DEFAULT_ENCODING = 'cp1252'
+
+# Windows code pages whose Python codec is not simply "cp<number>"
+CODEPAGE_ENCODINGS = {
+    1200: 'utf-16-le', 1201: 'utf-16-be', 20127: 'ascii', 20866: 'koi8-r', 21866: 'koi8-u',
+    28591: 'latin-1', 28592: 'iso8859-2', 28593: 'iso8859-3', 28594: 'iso8859-4',
+    28595: 'iso8859-5', 28596: 'iso8859-6', 28597: 'iso8859-7', 28598: 'iso8859-8',
+    28599: 'iso8859-9', 28603: 'iso8859-13', 28605: 'iso8859-15', 50220: 'iso2022-jp',
+    50221: 'iso2022-jp', 50222: 'iso2022-jp', 51932: 'euc-jp', 51949: 'euc-kr',
+    52936: 'hz', 54936: 'gb18030', 65000: 'utf-7', 65001: 'utf-8'
+}
+
+# One "<...>" id inside Message-ID / In-Reply-To / References headers
+MESSAGE_ID_RE = re.compile(r'<[^<>\s]+>')
+
+# Where the quoted part of a reply or forward starts. Patterns are anchored
+# on a literal newline and scanned over '\n' + body, which lets the regex
+# engine skip straight between line starts on multi-megabyte bodies.
+REPLY_MARKER_RE = re.compile(
+    r'\n(?:-{2,}[ \t]*(?:Original Message|Forwarded message)[ \t]*-{2,}[^\n]*'
+    r'|_{10,}[ \t]*'
+    r'|On [^\n]{1,200}wrote:[ \t]*'
+    r'|From: [^\n]+\n(?:[^\n]*\n){0,3}?(?:Sent|Date): [^\n]+)(?=\n|$)',
+    re.IGNORECASE
+)
+
+# Where a signature starts: the "-- " delimiter or a mobile client footer
+SIGNATURE_RE = re.compile(r'\n(?:-- ?|Sent from my [^\n]+|Get Outlook for [^\n]+)(?=\n|$)')
+
+# .eml files are streamed through the MIME parser in chunks of this size
+EML_CHUNK_SIZE = 64 * 1024
+
+BLOCK_TAGS = {'p', 'div', 'br', 'tr', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'table'}
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collect visible text, with line breaks at block elements"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style', 'head'):
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+    
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style', 'head'):
+            self._skip = max(0, self._skip - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+    
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    """Convert an HTML body to plain text"""
+    parser = _HTMLTextExtractor()
+    parser.feed(html)
+    parser.close()
+    lines = (' '.join(line.split()) for line in ''.join(parser.parts).splitlines())
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def clean_email_body(text):
+    """
+    Strip quoted replies, '>' quoted lines and signatures from an email body.
+    
+    Only the new part of a message is worth sending to the model; if
+    stripping would leave nothing (e.g. a bare forward), the original text
+    is kept.
+    """
+    if not text:
+        return ''
+    body = '\n' + text.replace('\r\n', '\n').replace('\r', '\n')
+    
+    cut = len(body)
+    for pattern in (REPLY_MARKER_RE, SIGNATURE_RE):
+        match = pattern.search(body, 0, cut)
+        if match:
+            cut = match.start()
+    
+    # One pass over the lines: drop '>' quotes and collapse blank runs
+    lines = []
+    blank = False
+    for line in body[1:cut].split('\n'):
+        if '>' in line and line.lstrip().startswith('>'):
+            continue
+        if line.strip():
+            lines.append(line)
+            blank = False
+        elif not blank:
+            lines.append('')
+            blank = True
+    cleaned = '\n'.join(lines).strip()
+    return cleaned or body.strip()
+
+
+def _codepage_encoding(codepage):
+    """Python codec for a Windows code page number, or None if there is none"""
+    encoding = CODEPAGE_ENCODINGS.get(codepage, f'cp{codepage}')
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+
+def _msg_encoding(ole):
+    """Codec for the 8-bit (001E) text streams of a .msg file"""
+    if not ole.exists(MSG_PROPERTIES_STREAM):
+        return MSG_DEFAULT_ENCODING
+    data = ole.openstream(MSG_PROPERTIES_STREAM).read()
+    codepages = {}
+    for offset in range(MSG_PROPERTIES_HEADER_SIZE, len(data) - 15, 16):
+        tag, _, value = struct.unpack_from('<III', data, offset)
+        if tag in MSG_CODEPAGE_TAGS:
+            codepages[tag] = value
+    for tag in MSG_CODEPAGE_TAGS:
+        encoding = _codepage_encoding(codepages[tag]) if tag in codepages else None
+        if encoding:
+            return encoding
+    return MSG_DEFAULT_ENCODING
+
+
+def _read_msg_text(ole, stream_names, encoding=MSG_DEFAULT_ENCODING):
+    """Decode the first existing text stream; other streams are never read"""
+    for name in stream_names:
+        if not ole.exists(name):
+            continue
+        data = ole.openstream(name).read()
+        if name.endswith('001F'):
+            return data.decode('utf-16-le', errors='replace').rstrip('\x00')
+        if name.endswith('001E'):
+            return data.decode(encoding, errors='replace').rstrip('\x00')
+        # Binary HTML body: charset is declared in the markup, UTF-8 in practice
+        return html_to_text(data.decode('utf-8', errors='replace'))
+    return None
+
+
+def _message_ids(value):
+    """All "<id>" tokens in a header value, in order"""
+    return MESSAGE_ID_RE.findall(str(value)) if value else []
+
+
+def _email_record(subject, body, message_id, in_reply_to, references):
+    message_ids = _message_ids(message_id)
+    return {
+        'subject': (subject or '').strip() or "No Subject",
+        'body': clean_email_body(body),
+        'message_id': message_ids[0] if message_ids else None,
+        'in_reply_to': _message_ids(in_reply_to),
+        'references': _message_ids(references)
+    }
+
+
+def format_email(record):
+    """Text for the model prompt from a record returned by read_msg/read_eml"""
+    return f"Subject: {record['subject']}\n\n{record['body']}"
+
+
+def read_msg(file_path):
+    """
+    Read the subject, cleaned body and threading ids from an Outlook .msg file.
+    
+    Only the subject, body and id property streams and the top-level
+    property table (for the code page of 8-bit text) are read from the
+    compound file; attachments and the rest of the container are never loaded.
+    
+    Returns:
+        Dict with 'subject', 'body', 'message_id', 'in_reply_to' and
+        'references', or None if the file has no text.
+    """
+    with olefile.OleFileIO(str(file_path)) as ole:
+        encoding = _msg_encoding(ole)
+        body = _read_msg_text(ole, MSG_BODY_STREAMS, encoding)
+        if not body:
+            body = _read_msg_text(ole, MSG_HTML_STREAMS, encoding) or ""
+        if not body.strip():
+            return None
+        return _email_record(
+            _read_msg_text(ole, MSG_SUBJECT_STREAMS, encoding),
+            body,
+            _read_msg_text(ole, MSG_MESSAGE_ID_STREAMS, encoding),
+            _read_msg_text(ole, MSG_IN_REPLY_TO_STREAMS, encoding),
+            _read_msg_text(ole, MSG_REFERENCES_STREAMS, encoding)
+        )
+
+
+def extract_msg_text(file_path):
+    """
+    Extract the subject and cleaned body from an Outlook .msg file.
+    
+    Returns:
+        "Subject: ...\n\n<body>" or None if the file has no text.
+    """
+    record = read_msg(file_path)
+    return format_email(record) if record else None
+
+class _MimeBodyFilter:
+    """
+    Line filter in front of the MIME parser that drops unwanted part bodies.
+    
+    It tracks multipart boundaries and part headers as lines stream past,
+    and only forwards the bodies of inline text/plain and text/html parts
+    (plus the structure around them). Attachment payloads never reach the
+    parser, so they are neither buffered nor decoded.
+    """
+    
+    def __init__(self):
+        self.boundaries = []
+        self.in_headers = True
+        self.header_lines = []
+        self.skip_body = False
+    
+    def _end_headers(self):
+        headers = BytesHeaderParser(policy=policy.compat32).parsebytes(b''.join(self.header_lines))
+        self.header_lines = []
+        self.in_headers = False
+        self.skip_body = False
+        
+        content_type = headers.get_content_type()
+        maintype = headers.get_content_maintype()
+        if maintype == 'multipart':
+            boundary = headers.get_param('boundary')
+            if boundary:
+                self.boundaries.append(b'--' + str(boundary).encode('ascii', 'ignore'))
+        elif maintype == 'message':
+            # An attached message: its body starts with another header block
+            self.in_headers = True
+        elif content_type not in ('text/plain', 'text/html') or headers.get_content_disposition() == 'attachment':
+            self.skip_body = True
+    
+    def _boundary(self, line):
+        """Match a boundary line against open multiparts: (index, is_close) or None"""
+        if not line.startswith(b'--'):
+            return None
+        stripped = line.rstrip()
+        for index in range(len(self.boundaries) - 1, -1, -1):
+            marker = self.boundaries[index]
+            if stripped == marker:
+                return index, False
+            if stripped == marker + b'--':
+                return index, True
+        return None
+    
+    def feed_line(self, line):
+        """Return the line to forward to the parser, or None to drop it"""
+        if self.in_headers:
+            self.header_lines.append(line)
+            if line in (b'\r\n', b'\n'):
+                header_block = b''.join(self.header_lines)
+                self._end_headers()
+                return header_block
+            return None
+        
+        found = self._boundary(line) if self.boundaries else None
+        if found:
+            index, is_close = found
+            if is_close:
+                del self.boundaries[index:]
+                self.skip_body = False
+            else:
+                del self.boundaries[index + 1:]
+                self.in_headers = True
+            return line
+        return None if self.skip_body else line
+    
+    def flush(self):
+        # Headers without a terminating blank line (e.g. an empty message)
+        return b''.join(self.header_lines)
+
+
+def _iter_lines(file, chunk_size):
+    """Yield lines (with endings) from a binary file read in fixed-size chunks"""
+    pending = b''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        # Split on LF only: a chunk may end between the CR and LF of a CRLF,
+        # and the partial line is carried over until its LF arrives
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    if pending:
+        yield pending
+
+
+def _decode_part(part):
+    payload = part.get_payload(decode=True) or b''
+    charset = part.get_content_charset() or 'utf-8'
+    try:
+        return payload.decode(charset, errors='replace')
+    except LookupError:
+        return payload.decode('utf-8', errors='replace')
+
+
+def read_eml(file_path, chunk_size=EML_CHUNK_SIZE):
+    """
+    Read the subject, cleaned body and threading ids from an .eml file.
+    
+    The file is read in chunks and fed to a BytesFeedParser through
+    _MimeBodyFilter, so memory stays bounded by the size of the text parts
+    however large the attachments are. Plain-text parts are used when
+    present; HTML parts are converted to text only as a fallback.
+    
+    Returns:
+        Dict with 'subject', 'body', 'message_id', 'in_reply_to' and
+        'references', or None if the message has no text.
+    """
+    parser = BytesFeedParser(policy=policy.default)
+    body_filter = _MimeBodyFilter()
+    with open(file_path, 'rb') as f:
+        for line in _iter_lines(f, chunk_size):
+            forwarded = body_filter.feed_line(line)
+            if forwarded:
+                parser.feed(forwarded)
+    parser.feed(body_filter.flush())
+    msg = parser.close()
+    
+    plain_parts = []
+    html_parts = []
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        content_type = part.get_content_type()
+        if content_type == 'text/plain':
+            plain_parts.append(_decode_part(part))
+        elif content_type == 'text/html' and not plain_parts:
+            html_parts.append(_decode_part(part))
+    
+    if plain_parts:
+        body = '\n\n'.join(text for text in plain_parts if text.strip())
+    else:
+        body = '\n\n'.join(html_to_text(html) for html in html_parts)
+    
+    if not body.strip():
+        return None
+    return _email_record(str(msg.get('subject', '') or ''), body, msg.get('message-id'),
+                         msg.get('in-reply-to'), msg.get('references'))
+
+
+def extract_eml_text(file_path, chunk_size=EML_CHUNK_SIZE):
+    """
+    Extract the subject and cleaned body from an .eml file.
+    
+    Returns:
+        "Subject: ...\n\n<body>" or None if the message has no text.
+    """
+    record = read_eml(file_path, chunk_size)
+    return format_email(record) if record else None
+
 
 def extract_email_content(file_path):
     """Extract content from email files (.msg or .eml)"""
-    logger.debug(f"Starting to process email file: {file_path}")
+    logger.debug("Starting to process email file: %s", file_path)
     file_path = Path(file_path)
     
     try:
         if file_path.suffix.lower() == '.msg':
             content = _process_msg_file(file_path)
-            logger.debug(f"MSG file processing result: {'Success' if content else 'Failed'}")
+            logger.debug("MSG file processing result: %s", 'Success' if content else 'Failed')
             return content
         elif file_path.suffix.lower() == '.eml':
             content = _process_eml_file(file_path)
-            logger.debug(f"EML file processing result: {'Success' if content else 'Failed'}")
+            logger.debug("EML file processing result: %s", 'Success' if content else 'Failed')
             return content
         else:
-            logger.error(f"Unsupported email file type: {file_path}")
+            logger.error("Unsupported email file type: %s", file_path)
             return None
     except Exception as e:
-        logger.error(f"Error processing email file {file_path}: {str(e)}")
+        logger.error("Error processing email file %s: %s", file_path, e)
         return None
 
 def _process_msg_file(file_path):
-    """Process .msg files using extract_msg library"""
+    """Process .msg files by reading the subject and body streams"""
     try:
-        logger.debug(f"Opening MSG file: {file_path}")
-        msg = extract_msg.Message(str(file_path))
-        subject = msg.subject or "No Subject"
-        body = msg.body or ""
-        
-        content = f"Subject: {subject}\n\n{body}"
-        if content.strip():
-            logger.info(f"Successfully extracted content from MSG file: {file_path}")
-            logger.debug(f"Content length: {len(content)} characters")
+        logger.debug("Opening MSG file: %s", file_path)
+        content = extract_msg_text(file_path)
+        if content:
+            logger.info("Successfully extracted content from MSG file: %s", file_path)
+            logger.debug("Content length: %d characters", len(content))
             return content
         else:
-            logger.error(f"Empty content extracted from MSG file: {file_path}")
+            logger.error("Empty content extracted from MSG file: %s", file_path)
             return None
     except Exception as e:
-        logger.error(f"Error processing MSG file {file_path}: {str(e)}")
+        logger.error("Error processing MSG file %s: %s", file_path, e)
         return None
 
 def _process_eml_file(file_path):
-    """Process .eml files using email library"""
+    """Process .eml files with the streaming MIME extractor"""
     try:
-        logger.debug(f"Opening EML file: {file_path}")
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            msg = email.message_from_file(f)
-            content_parts = []
-            
-            # Add subject
-            subject = msg.get('subject', 'No Subject')
-            content_parts.append(f"Subject: {subject}\n")
-            logger.debug(f"Added subject: {subject}")
-            
-            # Process body
-            if msg.is_multipart():
-                logger.debug("Processing multipart email")
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        try:
-                            payload = part.get_payload(decode=True)
-                            if payload:
-                                text = payload.decode('utf-8', errors='ignore')
-                                content_parts.append(text)
-                                logger.debug(f"Added text part: {len(text)} characters")
-                        except Exception as e:
-                            logger.error(f"Error decoding email part: {str(e)}")
-            else:
-                logger.debug("Processing single-part email")
-                try:
-                    payload = msg.get_payload(decode=True)
-                    if payload:
-                        text = payload.decode('utf-8', errors='ignore')
-                        content_parts.append(text)
-                        logger.debug(f"Added main content: {len(text)} characters")
-                except Exception as e:
-                    logger.error(f"Error decoding email content: {str(e)}")
-            
-            content = "\n".join(content_parts).strip()
-            if content:
-                logger.info(f"Successfully extracted content from EML file: {file_path}")
-                logger.debug(f"Total content length: {len(content)} characters")
-                return content
-            else:
-                logger.error(f"Empty content extracted from EML file: {file_path}")
-                return None
+        logger.debug("Opening EML file: %s", file_path)
+        content = extract_eml_text(file_path)
+        if content:
+            logger.info("Successfully extracted content from EML file: %s", file_path)
+            logger.debug("Total content length: %d characters", len(content))
+            return content
+        else:
+            logger.error("Empty content extracted from EML file: %s", file_path)
+            return None
     except Exception as e:
-        logger.error(f"Error processing EML file {file_path}: {str(e)}")
+        logger.error("Error processing EML file %s: %s", file_path, e)
         return None
 
-def process_email_directory(directory):
-    """Process all email files in a directory"""
+def read_email(file_path):
+    """Read an email file (.msg or .eml) into a record; None if it has no text"""
+    file_path = Path(file_path)
+    suffix = file_path.suffix.lower()
+    if suffix == '.msg':
+        return read_msg(file_path)
+    if suffix == '.eml':
+        return read_eml(file_path)
+    raise ValueError(f"Unsupported email file type: {file_path}")
+
+def _format_thread(thread):
+    """Prompt text for one thread of deduplicated email records"""
+    entries = [f"Email {record['name']}:\n{format_email(record)}" for record in thread]
+    if len(entries) == 1:
+        return entries[0]
+    return f"Thread: {thread[0]['subject']} ({len(entries)} emails)\n" + "\n\n".join(entries)
+
+def _read_email_outcome(file_path):
+    """(record, None) or (None, error text); runs in the batch reader processes"""
+    try:
+        return read_email(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+def _read_all(email_files, workers):
+    """_read_email_outcome for each file, `workers` at a time in separate processes"""
+    if workers <= 1 or len(email_files) <= 1:
+        return [_read_email_outcome(file_path) for file_path in email_files]
+    with ProcessPoolExecutor(max_workers=min(workers, len(email_files))) as pool:
+        return list(pool.map(_read_email_outcome, email_files))
+
+def process_email_files(email_files, dedup=True, workers=1):
+    """
+    Process a list of .msg/.eml files, reading up to `workers` at once
+    
+    With dedup enabled, repeated messages, near-duplicate forwards and
+    batch-wide boilerplate lines are removed and replies are grouped by
+    thread, so email_contents holds one entry per thread.
+    """
+    records = []
+    processed_files = []
+    failed_files = []
+    # Sorted so dedup keeps the same copy of a duplicate on every run
+    email_files = sorted(Path(file_path) for file_path in email_files)
+    
+    for file_path, (record, error) in zip(email_files, _read_all(email_files, workers)):
+        if error:
+            logger.error("Error processing email %s: %s", file_path.name, error)
+            failed_files.append(file_path.name)
+        elif record and record['body'].strip():
+            record['name'] = file_path.name
+            records.append(record)
+            processed_files.append(file_path.name)
+            logger.debug("Content length for %s: %d characters", file_path.name, len(record['body']))
+        else:
+            logger.error("No content extracted from: %s", file_path.name)
+            failed_files.append(file_path.name)
+    
+    if dedup:
+        # numpy (MinHash) is only loaded for batches that get deduplicated
+        from .email_dedup import dedupe_emails
+        threads, _ = dedupe_emails(records)
+    else:
+        threads = [[record] for record in records]
+    email_contents = [_format_thread(thread) for thread in threads]
+    
+    logger.info("Processed %d files successfully, %d files failed", len(processed_files), len(failed_files))
+    logger.debug("Total content entries: %d", len(email_contents))
+    
+    return email_contents, processed_files, failed_files
+
+def process_email_directory(directory, dedup=True, workers=1):
+    """
+    Process all email files in a directory
+    
+    See process_email_files for dedup and workers.
+    """
     directory = Path(directory)
-    logger.info(f"Starting to process email directory: {directory}")
+    logger.info("Starting to process email directory: %s", directory)
     
     if not directory.exists():
-        logger.error(f"Email directory does not exist: {directory}")
+        logger.error("Email directory does not exist: %s", directory)
         return [], [], []
     
-    email_contents = []
-    processed_files = []
-    failed_files = []
-    
     # Get all .msg and .eml files
     msg_files = list(directory.glob("*.msg"))
     eml_files = list(directory.glob("*.eml"))
-    email_files = msg_files + eml_files
     
-    logger.info(f"Found {len(msg_files)} MSG files and {len(eml_files)} EML files")
+    logger.info("Found %d MSG files and %d EML files", len(msg_files), len(eml_files))
     
-    if not email_files:
-        logger.warning(f"No email files found in directory: {directory}")
+    if not msg_files and not eml_files:
+        logger.warning("No email files found in directory: %s", directory)
         return [], [], []
     
-    for file_path in email_files:
-        try:
-            logger.debug(f"Processing file: {file_path.name}")
-            content = extract_email_content(file_path)
-            
-            if content and content.strip():
-                logger.info(f"Successfully extracted content from: {file_path.name}")
-                email_contents.append(f"Email {file_path.name}:\n{content}")
-                processed_files.append(file_path.name)
-                logger.debug(f"Content length for {file_path.name}: {len(content)} characters")
-            else:
-                logger.error(f"No content extracted from: {file_path.name}")
-                failed_files.append(file_path.name)
-        except Exception as e:
-            logger.error(f"Error processing email {file_path.name}: {str(e)}")
-            failed_files.append(file_path.name)
-    
-    logger.info(f"Processed {len(processed_files)} files successfully, {len(failed_files)} files failed")
-    logger.debug(f"Total content entries: {len(email_contents)}")
-    
-    return email_contents, processed_files, failed_files 
\ No newline at end of file
+    return process_email_files(msg_files + eml_files, dedup, workers)
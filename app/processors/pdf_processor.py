@@ -1,13 +1,14 @@
 import os
 import logging
 import PyPDF2
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 def extract_pdf_content(file_path):
     """Extract text content from a PDF file."""
-    logger.info(f"Processing PDF file: {file_path}")
+    logger.info("Processing PDF file: %s", file_path)
     try:
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
@@ -19,51 +20,60 @@ def extract_pdf_content(file_path):
                     if text.strip():
                         text_parts.append(f"Page {page_num}:\n{text}")
                 except Exception as e:
-                    logger.error(f"Error extracting text from page {page_num}: {str(e)}")
+                    logger.error("Error extracting text from page %s: %s", page_num, e)
             
             content = "\n\n".join(text_parts)
             if content.strip():
-                logger.info(f"Successfully extracted content from PDF: {file_path}")
+                logger.info("Successfully extracted content from PDF: %s", file_path)
                 return content
             else:
-                logger.error(f"Empty content extracted from PDF: {file_path}")
+                logger.error("Empty content extracted from PDF: %s", file_path)
                 return None
     except Exception as e:
-        logger.error(f"Error processing PDF file {file_path}: {str(e)}")
+        logger.error("Error processing PDF file %s: %s", file_path, e)
         return None
 
-def process_pdf_directory(directory):
+def _extract_all(pdf_files, workers):
+    """extract_pdf_content for each file, `workers` at a time in separate processes"""
+    if workers <= 1 or len(pdf_files) <= 1:
+        return [extract_pdf_content(file_path) for file_path in pdf_files]
+    # Text extraction is pure Python and CPU bound, so threads would only
+    # take turns on the GIL
+    with ProcessPoolExecutor(max_workers=min(workers, len(pdf_files))) as pool:
+        return list(pool.map(extract_pdf_content, pdf_files))
+
+def process_pdf_files(pdf_files, workers=1):
+    """Process a list of PDF files, extracting up to `workers` at once"""
+    pdf_contents = []
+    processed_files = []
+    failed_files = []
+    pdf_files = [Path(file_path) for file_path in pdf_files]
+    
+    logger.info("Found %d PDF files to process", len(pdf_files))
+    
+    for file_path, content in zip(pdf_files, _extract_all(pdf_files, workers)):
+        if content and content.strip():
+            pdf_contents.append(f"PDF {file_path.name}:\n{content}")
+            processed_files.append(file_path.name)
+            logger.info("Successfully processed PDF: %s", file_path.name)
+        else:
+            failed_files.append(file_path.name)
+            logger.error("Failed to extract content from: %s", file_path.name)
+    
+    return pdf_contents, processed_files, failed_files
+
+def process_pdf_directory(directory, workers=1):
     """Process all PDF files in a directory"""
     directory = Path(directory)
     if not directory.exists():
-        logger.error(f"PDF directory does not exist: {directory}")
+        logger.error("PDF directory does not exist: %s", directory)
         return [], [], []
     
-    pdf_contents = []
-    processed_files = []
-    failed_files = []
-    
     # Get all PDF files
-    pdf_files = list(directory.glob("*.pdf"))
+    pdf_files = sorted(directory.glob("*.pdf"))
     
     if not pdf_files:
-        logger.warning(f"No PDF files found in directory: {directory}")
+        logger.warning("No PDF files found in directory: %s", directory)
         return [], [], []
     
-    logger.info(f"Found {len(pdf_files)} PDF files to process")
-    
-    for file_path in pdf_files:
-        try:
-            content = extract_pdf_content(file_path)
-            if content and content.strip():
-                pdf_contents.append(f"PDF {file_path.name}:\n{content}")
-                processed_files.append(file_path.name)
-                logger.info(f"Successfully processed PDF: {file_path.name}")
-            else:
-                failed_files.append(file_path.name)
-                logger.error(f"Failed to extract content from: {file_path.name}")
-        except Exception as e:
-            failed_files.append(file_path.name)
-            logger.error(f"Error processing PDF {file_path.name}: {str(e)}")
-    
-    return pdf_contents, processed_files, failed_files 
\ No newline at end of file
+    return process_pdf_files(pdf_files, workers)
@@ -0,0 +1,208 @@
+import logging
+import math
+import re
+from functools import lru_cache
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Sentences longer than this are cut into pieces so a run-on line (tables,
+# extracted PDF columns) cannot crowd everything else out of the budget
+MAX_SENTENCE_CHARS = 500
+# Sentences with fewer content words than this (headings, page numbers,
+# "Section 12.") carry no information on their own and are never picked
+MIN_SENTENCE_TERMS = 3
+# Sentences sharing more than this cosine similarity with one already
+# selected are skipped as redundant
+REDUNDANCY_THRESHOLD = 0.7
+# Weight of the position prior: the first sentence scores up to this much
+# higher than the last, since documents tend to lead with the point
+POSITION_WEIGHT = 0.15
+
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+BLOCK_SPLIT_RE = re.compile(r'\n\s*\n|\n(?=\s*(?:[-*•]|\d+[.)])\s)')
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])["\')\]]*\s+(?=["\'(\[]?[A-Z0-9])')
+ABBREVIATIONS = {'e.g', 'i.e', 'mr', 'mrs', 'ms', 'dr', 'vs', 'etc', 'inc', 'ltd', 'no', 'fig', 'approx'}
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves also may might must shall us
+""".split())
+
+
+def split_sentences(text):
+    """
+    Split text into sentences.
+
+    Blank lines and list items always end a sentence; inside a block, line
+    breaks are treated as spaces (PDF extraction wraps mid-sentence).
+    """
+    sentences = []
+    for block in BLOCK_SPLIT_RE.split(text):
+        block = ' '.join(block.split())
+        if not block:
+            continue
+        pending = ''
+        for piece in SENTENCE_SPLIT_RE.split(block):
+            pending = f"{pending} {piece}" if pending else piece
+            last_word = pending.rsplit(' ', 1)[-1].rstrip('.').lower()
+            if last_word in ABBREVIATIONS:
+                continue
+            sentences.extend(_cap_length(pending))
+            pending = ''
+        if pending:
+            sentences.extend(_cap_length(pending))
+    return sentences
+
+
+def _cap_length(sentence):
+    while len(sentence) > MAX_SENTENCE_CHARS:
+        cut = sentence.rfind(' ', 0, MAX_SENTENCE_CHARS)
+        if cut <= 0:
+            cut = MAX_SENTENCE_CHARS
+        yield sentence[:cut]
+        sentence = sentence[cut:].lstrip()
+    if sentence:
+        yield sentence
+
+
+def _term_matrix(sentences):
+    """
+    Sparse TF-IDF entries as parallel arrays.
+
+    Returns:
+        (rows, cols, weights, vocabulary size): one entry per distinct term
+        of each sentence, weights are tf * idf.
+    """
+    vocabulary = {}
+    rows, cols = [], []
+    for index, sentence in enumerate(sentences):
+        for word in WORD_RE.findall(sentence.lower()):
+            if word in STOPWORDS or len(word) < 2:
+                continue
+            rows.append(index)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+
+    size = len(vocabulary)
+    if not size:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0), 0
+
+    # Term frequency per (sentence, term) pair
+    keys = np.asarray(rows, dtype=np.int64) * size + np.asarray(cols, dtype=np.int64)
+    pairs, tf = np.unique(keys, return_counts=True)
+    rows, cols = pairs // size, pairs % size
+
+    df = np.bincount(cols, minlength=size)
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1.0
+    weights = (1.0 + np.log(tf)) * idf[cols]
+    return rows, cols, weights, size
+
+
+def rank_sentences(sentences):
+    """
+    Score sentences by cosine similarity of their TF-IDF vector to the
+    document centroid, with a mild lead-position prior.
+
+    Returns:
+        (scores, vectors): an array of scores and, per sentence, a dict
+        {term id: weight} used for redundancy checks.
+    """
+    count = len(sentences)
+    rows, cols, weights, size = _term_matrix(sentences)
+    if not size:
+        return np.zeros(count), [{} for _ in range(count)]
+
+    centroid = np.bincount(cols, weights=weights, minlength=size)
+    centroid_norm = np.linalg.norm(centroid) or 1.0
+    dots = np.bincount(rows, weights=weights * centroid[cols], minlength=count)
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=count))
+    scores = np.divide(dots, norms * centroid_norm, out=np.zeros(count), where=norms > 0)
+    scores *= 1.0 + POSITION_WEIGHT * (1.0 - np.arange(count) / max(1, count - 1))
+    scores[np.bincount(rows, minlength=count) < MIN_SENTENCE_TERMS] = 0.0
+
+    vectors = [{} for _ in range(count)]
+    for row, col, weight in zip(rows.tolist(), cols.tolist(), weights.tolist()):
+        vectors[row][col] = weight
+    return scores, vectors
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(weight * b[term] for term, weight in a.items() if term in b)
+    if not dot:
+        return 0.0
+    return dot / (math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values())))
+
+
+def _select(sentences, scores, vectors, budget_chars=None, max_count=None, redundancy=REDUNDANCY_THRESHOLD):
+    """
+    Indices of the best sentences, greedily by score, skipping any too
+    similar to one already picked; returned in document order.
+    """
+    chosen = []
+    used = 0
+    for index in np.argsort(-scores, kind='stable').tolist():
+        if scores[index] <= 0:
+            break
+        length = len(sentences[index]) + 1
+        if budget_chars is not None and used + length > budget_chars:
+            continue
+        if any(_cosine(vectors[index], vectors[other]) > redundancy for other in chosen):
+            continue
+        chosen.append(index)
+        used += length
+        if max_count is not None and len(chosen) >= max_count:
+            break
+        if budget_chars is not None and budget_chars - used < 40:
+            break
+    return sorted(chosen)
+
+
+@lru_cache(maxsize=4)
+def summarize(text, budget_chars, redundancy=REDUNDANCY_THRESHOLD):
+    """
+    Pick the most informative sentences of `text` that fit in `budget_chars`.
+
+    Sentences are taken greedily by score, skipping any too similar to one
+    already picked, and returned in document order. Text that already fits
+    is returned unchanged. Results are cached for the last few texts, since
+    one upload usually feeds several prompts.
+
+    Args:
+        text: Extracted document text.
+        budget_chars: Maximum length of the result.
+        redundancy: Cosine similarity above which a sentence is redundant.
+
+    Returns:
+        The summary text.
+    """
+    if len(text) <= budget_chars:
+        return text
+
+    sentences = split_sentences(text)
+    scores, vectors = rank_sentences(sentences)
+    chosen = _select(sentences, scores, vectors, budget_chars=budget_chars, redundancy=redundancy)
+
+    summary = ' '.join(sentences[index] for index in chosen)
+    logger.info("Summarized %d chars (%d sentences) to %d chars (%d sentences)",
+                len(text), len(sentences), len(summary), len(chosen))
+    return summary
+
+
+def key_sentences(text, count, redundancy=REDUNDANCY_THRESHOLD):
+    """
+    The `count` most informative, mutually distinct sentences of `text`,
+    in document order (fewer if the text has fewer usable sentences).
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+    scores, vectors = rank_sentences(sentences)
+    return [sentences[index] for index in _select(sentences, scores, vectors, max_count=count, redundancy=redundancy)]
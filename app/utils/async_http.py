@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Tuple
+
+from flask import current_app
+
+if TYPE_CHECKING:
+    import httpx
+
+# Flask runs each async view in its own short-lived event loop (one per
+# request under WSGI), so a client bound to the view's loop could never
+# reuse a connection. Instead one background loop per worker process owns
+# a single pooled client; views hand their requests to it and await the
+# result, so keep-alive connections to the model and image APIs survive
+# across requests.
+_loop = None
+_client = None
+_lock = threading.Lock()
+
+
+def _io_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='async-http', daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def _pooled_client(limits: Dict[str, Any]) -> 'httpx.AsyncClient':
+    # Runs on the I/O loop only, so the client is created and used there.
+    # httpx is imported here, not at worker start, like the other heavy
+    # modules (see HEAVY_MODULES in app/__init__.py)
+    global _client
+    if _client is None:
+        import httpx
+        _client = httpx.AsyncClient(limits=httpx.Limits(**limits), follow_redirects=True)
+    return _client
+
+
+async def _send(method: str, url: str, limits: Dict[str, Any], kwargs: Dict[str, Any]) -> 'httpx.Response':
+    return await _pooled_client(limits).request(method, url, **kwargs)
+
+
+async def _download(url: str, path: str, chunk_size: int, limits: Dict[str, Any],
+                    kwargs: Dict[str, Any]) -> Tuple[str, int]:
+    hasher = hashlib.sha256()
+    size = 0
+    async with _pooled_client(limits).stream('GET', url, **kwargs) as response:
+        response.raise_for_status()
+        with open(path, 'wb') as f:
+            async for chunk in response.aiter_bytes(chunk_size):
+                f.write(chunk)
+                hasher.update(chunk)
+                size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+async def request(method: str, url: str, **kwargs) -> 'httpx.Response':
+    """
+    Send a request on the process-wide pooled client.
+
+    Can be awaited from any event loop; the body is read before returning.
+    Pool size comes from ASYNC_HTTP_LIMITS (read when the client is first
+    created).
+
+    Args:
+        method: HTTP method.
+        url: Absolute URL.
+        **kwargs: Passed to httpx.AsyncClient.request (headers, json, timeout, ...).
+    """
+    limits = current_app.config.get('ASYNC_HTTP_LIMITS', {})
+    future = asyncio.run_coroutine_threadsafe(_send(method, url, limits, kwargs), _io_loop())
+    return await asyncio.wrap_future(future)
+
+
+async def post(url: str, **kwargs) -> 'httpx.Response':
+    return await request('POST', url, **kwargs)
+
+
+async def get(url: str, **kwargs) -> 'httpx.Response':
+    return await request('GET', url, **kwargs)
+
+
+async def download(url: str, path: str, chunk_size: int = 256 * 1024, **kwargs) -> Tuple[str, int]:
+    """
+    Stream a GET response body to path on the pooled client, chunk by chunk.
+
+    Returns:
+        (sha256 of the body, size in bytes)
+    """
+    limits = current_app.config.get('ASYNC_HTTP_LIMITS', {})
+    future = asyncio.run_coroutine_threadsafe(_download(url, path, chunk_size, limits, kwargs), _io_loop())
+    return await asyncio.wrap_future(future)
+
+
+def _reset_after_fork() -> None:
+    # The loop thread does not survive fork; a worker starts its own on first use
+    global _loop, _client, _lock
+    _loop = None
+    _client = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,243 @@
+import math
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+from flask import current_app
+from .file_processor import extract_text_from_txt
+from .metrics import registry
+from .text_processor import batch_prompt, process_batch_content
+
+# Multi-file batches: extract every file (in parallel processes), pack the
+# texts into as few model requests as the prompt token budget allows and
+# merge the answers under the batch's CONTENT_LIMITS quotas.
+
+EMAIL_EXTENSIONS = ('msg', 'eml')
+DOCUMENT_EXTENSIONS = ('pdf', 'txt')
+BATCH_EXTENSIONS = EMAIL_EXTENSIONS + DOCUMENT_EXTENSIONS
+
+# CONTENT_LIMITS key and prompt wording per kind of file
+BATCH_KINDS = {
+    'email_batch': ('emails', EMAIL_EXTENSIONS),
+    'pdf_batch': ('documents', DOCUMENT_EXTENSIONS)
+}
+
+# Same place as the single-file results, so history lists batches too
+RESULTS_DIR_NAME = 'results'
+
+
+def _extension(path: str) -> str:
+    return os.path.splitext(path)[1].lower().lstrip('.')
+
+
+def collect_files(paths: Iterable[str]) -> List[str]:
+    """Supported files among paths; directories contribute their top-level files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in os.listdir(path))
+        else:
+            files.append(path)
+    return sorted({os.path.abspath(f) for f in files
+                   if os.path.isfile(f) and _extension(f) in BATCH_EXTENSIONS})
+
+
+def _settings() -> Dict[str, Any]:
+    return current_app.config.get('BATCH_PROCESSING', {})
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / _settings().get('chars_per_token', 4))
+
+
+def pack_documents(documents: List[str], budget_tokens: int) -> List[List[str]]:
+    """
+    Group documents into as few packs as possible, each within budget_tokens.
+
+    First-fit decreasing: the largest documents are placed first, each in
+    the first pack it fits. A document over the budget gets a pack of its
+    own (and is summarized down to the budget when the prompt is built).
+    Documents keep their original order within a pack.
+    """
+    sizes = [estimate_tokens(doc) for doc in documents]
+    packs: List[Tuple[int, List[int]]] = []
+    for index in sorted(range(len(documents)), key=lambda i: -sizes[i]):
+        for position, (used, members) in enumerate(packs):
+            if used + sizes[index] <= budget_tokens:
+                packs[position] = (used + sizes[index], members + [index])
+                break
+        else:
+            packs.append((sizes[index], [index]))
+    return [[documents[i] for i in sorted(members)] for _, members in packs]
+
+
+def batch_limits(batch_type: str) -> Dict[str, int]:
+    """Batch-wide totals from CONTENT_LIMITS, zero for content toggled off"""
+    limits = current_app.config.get('CONTENT_LIMITS', {}).get(batch_type, {})
+    toggles = current_app.config.get('CONTENT_TOGGLES', {})
+    linkedin = limits.get('linkedin', {})
+    instagram = limits.get('instagram', {})
+    return {
+        'topics': limits.get('topics', {}).get('max_total', 5),
+        'linkedin_posts': linkedin.get('total_posts', 0) if toggles.get('linkedin', True) else 0,
+        'linkedin_length': linkedin.get('max_length'),
+        'instagram_posts': instagram.get('total_posts', 0) if toggles.get('instagram', True) else 0,
+        'instagram_length': instagram.get('max_length'),
+        'comic_scripts': (limits.get('comics', {}).get('total_scripts', 0)
+                          if toggles.get('comic_scripts', True) else 0)
+    }
+
+
+def _pack_quotas(limits: Dict[str, int], packs: int) -> Dict[str, int]:
+    """What one of `packs` requests asks for; merging trims back to the totals"""
+    counts = ('topics', 'linkedin_posts', 'instagram_posts', 'comic_scripts')
+    return {name: math.ceil(value / packs) if name in counts and value else value
+            for name, value in limits.items()}
+
+
+def _merge(results: List[Dict[str, Any]], limits: Dict[str, int]) -> Tuple[Dict[str, Any], List[str]]:
+    """Interleave the packs' answers so every pack is represented, then trim to the batch totals"""
+    merged: Dict[str, Any] = {}
+    errors = []
+    ok = []
+    for result in results:
+        error = next((t for t in result.get('topics', []) if str(t).startswith('Error:')), None)
+        if error:
+            errors.append(error)
+        else:
+            ok.append(result)
+    for name in ('topics', 'linkedin_posts', 'instagram_posts', 'comic_scripts'):
+        items = []
+        seen = set()
+        for row in range(max((len(r.get(name, [])) for r in ok), default=0)):
+            for result in ok:
+                if row < len(result.get(name, [])):
+                    item = result[name][row]
+                    marker = json.dumps(item, sort_keys=True, default=str).lower()
+                    if marker not in seen:
+                        seen.add(marker)
+                        items.append(item)
+        merged[name] = items[:limits[name]]
+    return merged, errors
+
+
+def _extract(batch_type: str, files: List[str], workers: int) -> Tuple[List[str], List[str], List[str]]:
+    """(texts, processed file names, failed file names) for one kind of file"""
+    if batch_type == 'email_batch':
+        from app.processors.email_processor import process_email_files
+        return process_email_files(files, workers=workers)
+
+    from app.processors.pdf_processor import process_pdf_files
+    contents, processed, failed = process_pdf_files([f for f in files if _extension(f) == 'pdf'], workers)
+    for path in (f for f in files if _extension(f) == 'txt'):
+        text = extract_text_from_txt(path)
+        name = os.path.basename(path)
+        if text and text.strip():
+            contents.append(f"Text {name}:\n{text}")
+            processed.append(name)
+        else:
+            failed.append(name)
+    return contents, processed, failed
+
+
+def _generate(packs: List[List[str]], kind: str, quotas: Dict[str, int], budget_chars: int) -> List[Dict[str, Any]]:
+    """One model request per pack, `concurrency` at a time"""
+    app = current_app._get_current_object()
+
+    def run(pack):
+        with app.app_context():
+            return process_batch_content(pack, kind, quotas, budget_chars)
+
+    workers = max(1, min(_settings().get('concurrency', 2), len(packs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as executor:
+        return list(executor.map(run, packs))
+
+
+def _save(result: Dict[str, Any], name: str) -> str:
+    results_dir = os.path.join(current_app.static_folder, RESULTS_DIR_NAME)
+    os.makedirs(results_dir, exist_ok=True)
+    timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    result_filename = f"{name}_{timestamp_str}_{result['batch_type']}.json"
+    with open(os.path.join(results_dir, result_filename), 'w') as f_json:
+        json.dump(result, f_json, indent=4)
+    return result_filename
+
+
+def process_batch(batch_type: str, files: List[str], name: str) -> Dict[str, Any]:
+    """
+    Run one batch (all files of one CONTENT_LIMITS kind) and save its result.
+
+    Returns:
+        The saved result: merged content, per-file outcome, errors and a
+        'throughput' block with stage timings and rates.
+    """
+    kind = BATCH_KINDS[batch_type][0]
+    settings = _settings()
+    limits = batch_limits(batch_type)
+    started = time.perf_counter()
+
+    contents, processed, failed = _extract(batch_type, files, settings.get('extract_workers', 4))
+    extracted = time.perf_counter()
+
+    # Prompt budget left for the texts once the instructions are counted
+    overhead = estimate_tokens(batch_prompt([], kind, limits))
+    budget_tokens = max(1, settings.get('max_prompt_tokens', 6000) - overhead)
+    packs = pack_documents(contents, budget_tokens)
+    quotas = _pack_quotas(limits, len(packs)) if packs else limits
+    budget_chars = budget_tokens * settings.get('chars_per_token', 4)
+    results = _generate(packs, kind, quotas, budget_chars) if packs else []
+    finished = time.perf_counter()
+
+    merged, errors = _merge(results, limits)
+    if not contents:
+        errors.append('No text could be extracted from the batch.')
+    errors.extend(f"Could not extract text from {f}" for f in failed)
+    input_tokens = sum(estimate_tokens(doc) for doc in contents)
+    total_seconds = finished - started
+    throughput = {
+        'files': len(files),
+        'documents': len(contents),
+        'model_requests': len(packs),
+        'estimated_input_tokens': input_tokens,
+        'extract_seconds': round(extracted - started, 3),
+        'generate_seconds': round(finished - extracted, 3),
+        'total_seconds': round(total_seconds, 3),
+        'files_per_second': round(len(files) / total_seconds, 2) if total_seconds else None,
+        'input_tokens_per_second': round(input_tokens / total_seconds, 1) if total_seconds else None
+    }
+
+    result = {
+        'result_type': 'batch',
+        'batch_type': batch_type,
+        'original_filename': name,
+        'timestamp': datetime.utcnow().isoformat(),
+        'processed_files': processed,
+        'failed_files': failed,
+        **merged,
+        'errors': errors,
+        'throughput': throughput
+    }
+    result['result_file'] = _save(result, name)
+
+    registry.inc('aisensum_batch_files_total', len(processed), batch=batch_type, result='processed')
+    registry.inc('aisensum_batch_files_total', len(failed), batch=batch_type, result='failed')
+    registry.observe('aisensum_batch_duration_seconds', total_seconds, batch=batch_type)
+    current_app.logger.info(
+        f"Batch {result['result_file']}: {len(files)} files, {len(contents)} texts in {len(packs)} model requests, "
+        f"extract {throughput['extract_seconds']:.1f}s, generate {throughput['generate_seconds']:.1f}s, "
+        f"{throughput['files_per_second']} files/s")
+    return result
+
+
+def run_batches(paths: Iterable[str], name: str = 'batch') -> List[Dict[str, Any]]:
+    """Split files or directories into email and document batches and run each."""
+    files = collect_files(paths)
+    results = []
+    for batch_type, (_, extensions) in BATCH_KINDS.items():
+        selected = [f for f in files if _extension(f) in extensions]
+        if selected:
+            results.append(process_batch(batch_type, selected, name))
+    return results
@@ -1,43 +1,358 @@
-import requests
-from typing import List, Dict
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Dict, Optional, Tuple
 import json
 import re
-from flask import current_app # Added to log errors
+from flask import current_app, url_for, has_request_context, copy_current_request_context # Added to log errors
+from .rate_limiter import get_scheduler, parse_retry_after
+from .metrics import timed
+from . import async_http, panel_renderer, single_flight
+
+# Retries after a 429, each one waits for the shared bucket to refill first
+MAX_RATE_LIMIT_RETRIES = 2
+
+# Panel renders that a request waits for at most the fallback latency
+# budget run on one thread pool per process, created on first use
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+def _render_pool() -> ThreadPoolExecutor:
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            workers = current_app.config.get('COMIC_FALLBACK', {}).get('render_workers', 8)
+            _render_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='comic-render')
+        return _render_executor
+
+def in_context(fn: Callable) -> Callable:
+    """
+    fn bound to the caller's request (or app) context and context
+    variables (request id), to be called once from another thread.
+    """
+    if has_request_context():
+        bound = copy_current_request_context(fn)
+    else:
+        app = current_app._get_current_object()
+        def bound(*args, **kwargs):
+            with app.app_context():
+                return fn(*args, **kwargs)
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(bound, *args, **kwargs)
+
+def submit_render(fn: Callable, *args) -> Future:
+    """Run fn(*args) on the shared panel render pool, in the caller's context"""
+    return _render_pool().submit(in_context(fn), *args)
+
+def request_ideogram_image(api_key: str, image_request: Dict, timeout: int = 60,
+                           priority: str = 'interactive', fresh: bool = False) -> Dict:
+    """
+    Submit an image generation request to Ideogram through the shared rate limiter.
+    
+    Args:
+        api_key: Ideogram API key.
+        image_request: The 'image_request' body (prompt, model, aspect_ratio, ...).
+        timeout: HTTP timeout in seconds.
+        priority: Scheduler priority, 'interactive' or 'batch'.
+        fresh: Always send the request (explicit regenerations), never
+            share another call's image.
+    
+    Returns:
+        The decoded JSON response.
+    
+    Identical requests in flight at the same time (in any worker) are sent
+    once and share the response; see single_flight. A finished request's
+    image is never handed to a later one.
+    """
+    if fresh:
+        return _send_ideogram_image(api_key, image_request, timeout, priority)
+    key = single_flight.flight_key('ideogram', api_key, image_request)
+    return single_flight.do('ideogram', key, lambda: _send_ideogram_image(api_key, image_request, timeout, priority),
+                            concurrent_only=True)
+
+def _send_ideogram_image(api_key: str, image_request: Dict, timeout: int, priority: str) -> Dict:
+    import requests
+    scheduler = get_scheduler()
+    
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        scheduler.acquire('ideogram', api_key, priority=priority,
+                          timeout=current_app.config.get('RATE_LIMIT_TIMEOUT'))
+        with timed('image_request', model=image_request.get('model', '')):
+            response = requests.post(
+                f"{current_app.config['IDEOGRAM_BASE_URL'].rstrip('/')}/generate",
+                headers={
+                    'Api-Key': api_key,
+                    'Content-Type': 'application/json'
+                },
+                json={'image_request': image_request},
+                timeout=timeout
+            )
+        if response.status_code == 429 and attempt < MAX_RATE_LIMIT_RETRIES:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            current_app.logger.warning(f"Ideogram rate limited (429), backing off {retry_after or 'default'}s")
+            scheduler.penalize('ideogram', api_key, retry_after)
+            continue
+        response.raise_for_status() # Raise HTTPError for bad responses
+        return response.json()
+
+async def request_ideogram_image_async(api_key: str, image_request: Dict, timeout: int = 60,
+                                       priority: str = 'interactive', fresh: bool = False) -> Dict:
+    """Async variant of request_ideogram_image on the pooled HTTP client."""
+    if fresh:
+        return await _send_ideogram_image_async(api_key, image_request, timeout, priority)
+    key = single_flight.flight_key('ideogram', api_key, image_request)
+    return await single_flight.do_async('ideogram', key,
+                                        lambda: _send_ideogram_image_async(api_key, image_request, timeout, priority),
+                                        concurrent_only=True)
+
+async def _send_ideogram_image_async(api_key: str, image_request: Dict, timeout: int, priority: str) -> Dict:
+    scheduler = get_scheduler()
+    
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        await scheduler.acquire_async('ideogram', api_key, priority=priority,
+                                      timeout=current_app.config.get('RATE_LIMIT_TIMEOUT'))
+        with timed('image_request', model=image_request.get('model', '')):
+            response = await async_http.post(
+                f"{current_app.config['IDEOGRAM_BASE_URL'].rstrip('/')}/generate",
+                headers={
+                    'Api-Key': api_key,
+                    'Content-Type': 'application/json'
+                },
+                json={'image_request': image_request},
+                timeout=timeout
+            )
+        if response.status_code == 429 and attempt < MAX_RATE_LIMIT_RETRIES:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            current_app.logger.warning(f"Ideogram rate limited (429), backing off {retry_after or 'default'}s")
+            scheduler.penalize('ideogram', api_key, retry_after)
+            continue
+        response.raise_for_status()
+        return response.json()
+
+# Image prompts built from document sentences are kept to this length
+MAX_SCENE_CHARS = 300
+QUOTE_RE = re.compile(r'["\u201c]([^"\u201c\u201d]{3,160})["\u201d]')
 
 def extract_scenes(title: str, content: str, num_panels: int = 4) -> List[str]:
     """
     Extract key scenes from article content for comic panels.
+    
+    Scenes are the most informative, mutually distinct sentences of the
+    content (see app.processors.summarizer), in reading order. Falls back
+    to the title when the content has no usable sentences.
+    """
+    from app.processors.summarizer import key_sentences
+    with timed('extract_scenes'):
+        scenes = key_sentences(content or '', num_panels)
+    if not scenes and title:
+        scenes = [title]
+    return scenes
+
+def _scene_panel(panel_num: int, scene: str, title: str) -> Dict:
+    """Script panel for a scene sentence; quoted speech in it becomes the dialogue"""
+    quote = QUOTE_RE.search(scene)
+    if quote:
+        dialogue = quote.group(1).strip()
+    else:
+        # The opening panel introduces the story
+        dialogue = title if panel_num == 1 else ''
+    description = scene if len(scene) <= MAX_SCENE_CHARS else scene[:MAX_SCENE_CHARS].rsplit(' ', 1)[0] + '...'
+    return {'panel': panel_num, 'description': description, 'dialogue': dialogue}
+
+def generate_fast_comic_script(text: str, num_comic_panels: int = 4, title: str = '') -> Dict:
+    """
+    Build a comic script locally from the key scenes of the text, without a
+    model call. Same result shape as text_processor.generate_comic_script,
+    meant for previews and drafts; the model script is for final renders.
+    
+    Args:
+        text: Source text.
+        num_comic_panels: Maximum number of panels.
+        title: Optional title, used as the opening caption.
+    
+    Returns:
+        {'comic_script': [{'panel': int, 'description': str, 'dialogue': str}, ...]}
+    """
+    scenes = extract_scenes(title, text, num_comic_panels)
+    if not scenes:
+        return {'comic_script': [{'panel': 1, 'description': 'Error: No usable text for a comic script', 'dialogue': ''}]}
+    return {'comic_script': [_scene_panel(i + 1, scene, title) for i, scene in enumerate(scenes)]}
+
+def _panel_request(panel_data: Dict) -> Tuple[object, str, str, Optional[Dict]]:
+    """(panel number, description, dialogue, Ideogram image request); no request for an empty description"""
+    panel_num = panel_data.get('panel', 'N/A')
+    description = panel_data.get('description', '').strip()
+    dialogue = panel_data.get('dialogue', '').strip()
+    
+    if not description:
+        current_app.logger.warning(f"Panel {panel_num} has empty description, skipping image generation.")
+        return panel_num, 'Error: Empty description provided', dialogue, None
+    
+    prompt_text = f"Comic book style panel: {description}" # Add style context
+    current_app.logger.debug("Submitting image generation for Panel %s with prompt: %s", panel_num, prompt_text)
+    image_request = {
+        "prompt": prompt_text,
+        "negative_prompt": "inconsistent characters, blurry, low quality, deformed faces, multiple styles",
+        "model": "V_2",
+        "aspect_ratio": "ASPECT_1_1",
+        "magic_prompt_option": "AUTO"
+    }
+    return panel_num, description, dialogue, image_request
+
+def _panel_result(panel_num, description: str, dialogue: str, result: Dict) -> Dict:
+    """Panel entry from an Ideogram response"""
+    panel = {'panel': panel_num, 'image_url': '', 'description': description, 'dialogue': dialogue}
+    if 'data' in result and len(result['data']) > 0:
+        image_url = result['data'][0].get('url')
+        if image_url:
+            panel['image_url'] = image_url
+            current_app.logger.info(f"Panel {panel_num} image generated successfully: {image_url}")
+        else:
+            current_app.logger.error(f"No image URL in response for panel {panel_num}")
+            panel['error'] = 'No image URL in response'
+    else:
+        current_app.logger.error(f"Invalid response format for panel {panel_num}")
+        panel['error'] = 'Invalid response format'
+    return panel
+
+def _panel_failure(panel_num, description: str, dialogue: str, e: Exception) -> Dict:
+    import httpx
+    import requests
+    if isinstance(e, (requests.exceptions.RequestException, httpx.HTTPError)):
+        current_app.logger.error(f"Error submitting panel {panel_num} to Ideogram: {e}")
+    else:
+        current_app.logger.error(f"Unexpected error submitting panel {panel_num}: {e}")
+    return {'panel': panel_num, 'image_url': '', 'description': description, 'dialogue': dialogue, 'error': str(e)}
+
+def _missing_key_panels(script: List[Dict]) -> List[Dict]:
+    current_app.logger.error("Ideogram API key is missing.")
+    # Return script panels without image URLs if API key is missing
+    return [
+        {
+            'panel': panel_data.get('panel', i + 1),
+            'image_url': '', 
+            'description': panel_data.get('description', 'Error: API Key Missing'),
+            'dialogue': panel_data.get('dialogue', '')
+        } for i, panel_data in enumerate(script)
+    ]
+
+def _skipped_panel(panel_data: Dict) -> Dict:
+    """Panel left for the fallback renderer once the latency budget is spent"""
+    return {'panel': panel_data.get('panel', 'N/A'), 'image_url': '',
+            'description': panel_data.get('description', '').strip(), 'dialogue': panel_data.get('dialogue', '').strip(),
+            'error': 'Image generation exceeded the latency budget'}
+
+def _needs_fallback(panel: Dict) -> bool:
+    description = panel.get('description', '')
+    return not panel.get('image_url') and description and not description.startswith('Error')
+
+def _fallback_url(filename: str) -> str:
+    return url_for('static', filename=f'placeholders/{filename}')
+
+def _with_fallback(generated_panels: List[Dict]) -> List[Dict]:
+    """Draw local placeholders for panels without an image (see panel_renderer)"""
+    if not panel_renderer.enabled():
+        return generated_panels
+    directory = os.path.join(current_app.root_path, 'static', 'placeholders')
+    for panel in generated_panels:
+        if _needs_fallback(panel):
+            filename = panel_renderer.render(panel['description'], panel.get('dialogue'),
+                                             f"Panel {panel.get('panel', '')}", directory)
+            panel['image_url'] = _fallback_url(filename)
+            panel['fallback'] = True
+    return generated_panels
+
+async def _with_fallback_async(generated_panels: List[Dict]) -> List[Dict]:
+    if not panel_renderer.enabled():
+        return generated_panels
+    directory = os.path.join(current_app.root_path, 'static', 'placeholders')
+    for panel in generated_panels:
+        if _needs_fallback(panel):
+            filename = await panel_renderer.render_async(panel['description'], panel.get('dialogue'),
+                                                         f"Panel {panel.get('panel', '')}", directory)
+            panel['image_url'] = _fallback_url(filename)
+            panel['fallback'] = True
+    return generated_panels
+
+def _budget() -> Optional[float]:
+    return panel_renderer.latency_budget() if panel_renderer.enabled() else None
+
+def _deadline() -> Optional[float]:
+    budget = _budget()
+    return time.monotonic() + budget if budget is not None else None
+
+def _finish_panels(generated_panels: List[Dict]) -> List[Dict]:
+    # Clean up temporary keys from final result
+    for panel in generated_panels:
+        if panel.get('error') and not panel.get('image_url'):
+             panel['description'] += f" (Error: {panel.pop('error')})"
+        else:
+             panel.pop('error', None)
+    return generated_panels
+
+def _generate_panel(panel_data: Dict, api_key: str) -> Dict:
+    panel_num, description, dialogue, image_request = _panel_request(panel_data)
+    if image_request is None:
+        return {'panel': panel_num, 'image_url': '', 'description': description, 'dialogue': dialogue}
+    try:
+        result = request_ideogram_image(api_key, image_request, timeout=30) # Timeout for the submission request
+        return _panel_result(panel_num, description, dialogue, result)
+    except Exception as e:
+        return _panel_failure(panel_num, description, dialogue, e)
+
+async def _generate_panel_async(panel_data: Dict, api_key: str) -> Dict:
+    panel_num, description, dialogue, image_request = _panel_request(panel_data)
+    if image_request is None:
+        return {'panel': panel_num, 'image_url': '', 'description': description, 'dialogue': dialogue}
+    try:
+        result = await request_ideogram_image_async(api_key, image_request, timeout=30)
+        return _panel_result(panel_num, description, dialogue, result)
+    except Exception as e:
+        return _panel_failure(panel_num, description, dialogue, e)
+
+def _replaced_panels(panels: List[Dict], replacements: Dict[int, Future]) -> List[Dict]:
+    """Copy of panels with each placeholder whose replacement render succeeded swapped for it"""
+    replaced = [dict(panel) for panel in panels]
+    for index, future in replacements.items():
+        panel = future.result() if future.exception() is None else {}
+        if panel.get('image_url'):
+            replaced[index] = _finish_panels([panel])[0]
+    return replaced
+
+def _queue_replacements(script: List[Dict], api_key: str, panels: List[Dict], running: Dict[int, Future],
+                        on_replaced: Callable[[List[Dict]], None]) -> None:
     """
-    # Combine title and content
-    full_text = f"{title}\n\n{content}"
-    
-    # Split into paragraphs
-    paragraphs = [p.strip() for p in full_text.split('\n') if p.strip()]
-    
-    # If we have fewer paragraphs than needed panels, duplicate some
-    while len(paragraphs) < num_panels:
-        paragraphs.extend(paragraphs)
-    
-    # Take the first sentence from selected paragraphs
-    scenes = []
-    step = max(1, len(paragraphs) // num_panels)
-    
-    for i in range(0, len(paragraphs), step):
-        if len(scenes) >= num_panels:
-            break
-            
-        paragraph = paragraphs[i]
-        # Split into sentences and take the first one
-        sentences = re.split(r'[.!?]+', paragraph)
-        if sentences:
-            scene = sentences[0].strip()
-            if scene:
-                scenes.append(scene)
-    
-    return scenes[:num_panels]
+    Render every placeholder panel for real: a render still running (in
+    running) is left to finish, the others are submitted again. Once all
+    are done, on_replaced gets the panel list with the real images.
+    """
+    replacements = {}
+    for index, (panel_data, panel) in enumerate(zip(script, panels)):
+        if panel.get('fallback'):
+            replacements[index] = running.get(index) or submit_render(_generate_panel, panel_data, api_key)
+    if not replacements:
+        return
+    current_app.logger.info("Queued real renders for %d placeholder panel(s)", len(replacements))
+    apply = in_context(lambda: on_replaced(_replaced_panels(panels, replacements)))
+    remaining = [len(replacements)]
+    remaining_lock = threading.Lock()
+    
+    def finished(future):
+        with remaining_lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            apply()
+    
+    for future in replacements.values():
+        future.add_done_callback(finished)
 
 # Modified function to accept a pre-generated script
-def generate_comic_panels(script: List[Dict], api_key: str) -> List[Dict]:
+def generate_comic_panels(script: List[Dict], api_key: str,
+                          on_replaced: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
     """
     Generate comic panels using Ideogram API based on a structured script.
     
@@ -52,115 +367,72 @@ def generate_comic_panels(script: List[Dict], api_key: str) -> List[Dict]:
             'panel': int,         # Added panel number from script
             'image_url': str,
             'description': str,   # From script
-            'dialogue': str      # From script
+            'dialogue': str,      # From script
+            'fallback': bool      # Only present for locally drawn placeholders
         }
+    
+    Panels are requested concurrently on the shared render pool. With
+    COMIC_FALLBACK enabled the call returns within the latency budget:
+    panels without an image by then (no key, API error, still rendering)
+    get a local placeholder image instead of an empty image_url.
+    
+    on_replaced, if given, is called once with the panel list after real
+    renders of the placeholder panels have finished (see
+    _queue_replacements); it runs in a pool thread with this request's
+    context.
     """
     if not api_key:
-        current_app.logger.error("Ideogram API key is missing.")
-        # Return script panels without image URLs if API key is missing
-        return [
-            {
-                'panel': panel_data.get('panel', i + 1),
-                'image_url': '', 
-                'description': panel_data.get('description', 'Error: API Key Missing'),
-                'dialogue': panel_data.get('dialogue', '')
-            } for i, panel_data in enumerate(script)
-        ]
-        
-    # Updated base URL and endpoint for Ideogram API
-    ideogram_base_url = "https://api.ideogram.ai"
-    image_endpoint = f"{ideogram_base_url}/generate"
-
-    generated_panels = []
-    job_ids = []
-
-    # 1. Submit all generation jobs
-    for panel_data in script:
-        panel_num = panel_data.get('panel', 'N/A')
-        description = panel_data.get('description', '').strip()
-        dialogue = panel_data.get('dialogue', '').strip()
-        
-        if not description:
-             current_app.logger.warning(f"Panel {panel_num} has empty description, skipping image generation.")
-             generated_panels.append({
-                 'panel': panel_num,
-                 'image_url': '', # No image if description is empty
-                 'description': 'Error: Empty description provided',
-                 'dialogue': dialogue
-             })
-             job_ids.append(None) # Placeholder for skipped job
-             continue
-             
-        prompt_text = f"Comic book style panel: {description}" # Add style context
-        current_app.logger.info(f"Submitting image generation for Panel {panel_num} with prompt: {prompt_text}")
-        
-        try:
-            # Updated request payload structure
-            data = {
-                "image_request": {
-                    "prompt": prompt_text,
-                    "negative_prompt": "inconsistent characters, blurry, low quality, deformed faces, multiple styles",
-                    "model": "V_2",
-                    "aspect_ratio": "ASPECT_1_1",
-                    "magic_prompt_option": "AUTO"
-                }
-            }
-            
-            # Updated headers with Api-Key instead of Authorization
-            response = requests.post(
-                image_endpoint,
-                headers={
-                    'Api-Key': api_key,
-                    'Content-Type': 'application/json'
-                },
-                json=data,
-                timeout=30 # Timeout for the submission request
-            )
-            response.raise_for_status() # Raise HTTPError for bad responses
-            
-            # Updated response handling for synchronous API
-            result = response.json()
-            if 'data' in result and len(result['data']) > 0:
-                image_url = result['data'][0].get('url')
-                if image_url:
-                    generated_panels.append({
-                        'panel': panel_num,
-                        'image_url': image_url,
-                        'description': description,
-                        'dialogue': dialogue
-                    })
-                    current_app.logger.info(f"Panel {panel_num} image generated successfully: {image_url}")
-                else:
-                    current_app.logger.error(f"No image URL in response for panel {panel_num}")
-                    generated_panels.append({
-                        'panel': panel_num,
-                        'image_url': '',
-                        'description': description,
-                        'dialogue': dialogue,
-                        'error': 'No image URL in response'
-                    })
-            else:
-                current_app.logger.error(f"Invalid response format for panel {panel_num}")
-                generated_panels.append({
-                    'panel': panel_num,
-                    'image_url': '',
-                    'description': description,
-                    'dialogue': dialogue,
-                    'error': 'Invalid response format'
-                })
-                 
-        except requests.exceptions.RequestException as e:
-            current_app.logger.error(f"Error submitting panel {panel_num} to Ideogram: {e}")
-            generated_panels.append({'panel': panel_num, 'image_url': '', 'description': description, 'dialogue': dialogue, 'error': str(e)})
-        except Exception as e:
-             current_app.logger.error(f"Unexpected error submitting panel {panel_num}: {e}")
-             generated_panels.append({'panel': panel_num, 'image_url': '', 'description': description, 'dialogue': dialogue, 'error': str(e)})
-             
-    # Clean up temporary keys from final result
-    for panel in generated_panels:
-        if panel.get('error') and not panel.get('image_url'):
-             panel['description'] += f" (Error: {panel.pop('error')})"
+        return _with_fallback(_missing_key_panels(script))
+    futures = [submit_render(_generate_panel, panel_data, api_key) for panel_data in script]
+    wait(futures, timeout=_budget())
+    panels = []
+    running = {}
+    for index, (panel_data, future) in enumerate(zip(script, futures)):
+        if future.done() and future.exception() is None:
+            panels.append(future.result())
+        elif future.done():
+            panels.append(_panel_failure(panel_data.get('panel', 'N/A'), panel_data.get('description', '').strip(),
+                                         panel_data.get('dialogue', '').strip(), future.exception()))
         else:
-             panel.pop('error', None)
-             
-    return generated_panels 
\ No newline at end of file
+            panels.append(_skipped_panel(panel_data))
+            running[index] = future
+    panels = _finish_panels(_with_fallback(panels))
+    if on_replaced is not None:
+        _queue_replacements(script, api_key, panels, running, on_replaced)
+    return panels
+
+async def generate_comic_panels_async(script: List[Dict], api_key: str,
+                                      on_replaced: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+    """
+    Async variant of generate_comic_panels: all panels are requested
+    concurrently (still subject to the shared Ideogram rate limit).
+    Panels come back in script order; requests still running when the
+    latency budget runs out are cancelled and drawn locally. With
+    on_replaced, placeholder panels are rendered again on the shared
+    render pool, which outlives the request's event loop.
+    """
+    if not api_key:
+        return await _with_fallback_async(_missing_key_panels(script))
+    tasks = [asyncio.ensure_future(_generate_panel_async(panel_data, api_key)) for panel_data in script]
+    deadline = _deadline()
+    if tasks:
+        await asyncio.wait(tasks, timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+    panels = []
+    for panel_data, task in zip(script, tasks):
+        if task.done():
+            panels.append(task.result())
+        else:
+            task.cancel()
+            panels.append(_skipped_panel(panel_data))
+    panels = _finish_panels(await _with_fallback_async(panels))
+    if on_replaced is not None:
+        _queue_replacements(script, api_key, panels, {}, on_replaced)
+    return panels
+
+def _reset_after_fork() -> None:
+    global _render_executor, _render_executor_lock
+    _render_executor = None
+    _render_executor_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,68 @@
+from typing import Dict, List, Any, Optional
+from .comic_store import build_character_index
+
+# Shared by every panel of every comic
+STYLE_BLOCK = "Comic book style, clear lines, vibrant colors, dynamic composition. "
+NEGATIVE_PROMPT = "inconsistent characters, blurry, low quality, deformed faces, multiple styles"
+
+
+def build_character_block(characters: List[str]) -> str:
+    """Character consistency block, empty when the script has no speakers."""
+    if not characters:
+        return ""
+    return (f"Characters: {', '.join(characters)}. "
+            "Maintain consistent character appearances throughout all panels. ")
+
+
+def compile_panel_prompts(panels: List[Dict[str, Any]],
+                          characters: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Compile the Ideogram image requests for a whole comic in one pass.
+
+    The character registry and style block are built once and each panel
+    only adds its own sequence and previous-panel context, so the result
+    can be stored with the comic and re-submitted as-is on regeneration.
+
+    Args:
+        panels: Parsed panels, each with 'description' and 'dialogue'.
+        characters: Precomputed character index; built from panels if omitted.
+
+    Returns:
+        One 'image_request' dictionary per panel, in panel order.
+    """
+    if characters is None:
+        characters = build_character_index(panels)
+    character_block = build_character_block(characters)
+    total_panels = len(panels)
+
+    image_requests = []
+    previous_description = None
+    for index, panel in enumerate(panels):
+        description = panel.get('description', '')
+
+        context_block = ""
+        if index > 0 and previous_description:
+            context_block = f"This follows the previous panel where: {previous_description}. "
+        sequence_block = f"This is panel {index + 1} of {total_panels}. "
+
+        prompt = (
+            f"{STYLE_BLOCK} {character_block} {context_block} {sequence_block} "
+            f"Panel content: {description}"
+        )
+        image_requests.append({
+            'prompt': prompt,
+            'negative_prompt': NEGATIVE_PROMPT,
+            'aspect_ratio': 'ASPECT_1_1',
+            'model': 'V_2',
+            'magic_prompt_option': 'AUTO',
+            'style': 'ANIME'
+        })
+        previous_description = description
+
+    return image_requests
+
+
+def draft_request(image_request: Dict[str, Any], model: str = 'V_2_TURBO',
+                  magic_prompt_option: str = 'OFF') -> Dict[str, Any]:
+    """Copy of a compiled image request for a quick draft render on a faster model tier."""
+    return dict(image_request, model=model, magic_prompt_option=magic_prompt_option)
@@ -0,0 +1,348 @@
+import json
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Any, Optional
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # Windows: the dev server is a single process
+    fcntl = None
+
+# Comic ids are uuid4 hex strings; anything else is rejected before touching disk
+COMIC_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Which cached downloads go stale when a given part of the comic changes
+DOWNLOAD_DEPENDENCIES = {
+    'panel_images': ('pdf', 'images'),
+    'panels': ('script',),
+    'title': ('pdf', 'images', 'script')
+}
+
+RECORD_FILE = 'record.json'
+PANELS_FILE = 'panels.json'
+SCRIPT_FILE = 'script.txt'
+PROMPTS_FILE = 'prompts.json'
+LOCK_FILE = 'record.lock'
+
+# Record updates are read-modify-write. They are serialized by this lock
+# between threads and by an flock on the comic's LOCK_FILE between worker
+# processes; _held lets a thread that holds a comic's lock take it again
+_record_lock = threading.RLock()
+_held = threading.local()
+
+
+def store_root() -> str:
+    """Directory holding one sub-directory per comic."""
+    root = current_app.config.get('COMIC_STORE_DIR') or os.path.join(current_app.instance_path, 'comics')
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def _comic_dir(comic_id: str) -> Optional[str]:
+    if not comic_id or not COMIC_ID_PATTERN.match(comic_id):
+        return None
+    return os.path.join(store_root(), comic_id)
+
+
+def _existing_comic_dir(comic_id: str) -> Optional[str]:
+    comic_dir = _comic_dir(comic_id)
+    return comic_dir if comic_dir and os.path.isdir(comic_dir) else None
+
+
+@contextmanager
+def _record_locked(comic_dir: str) -> Iterator[None]:
+    """Hold the record lock of the comic in comic_dir, in this thread and across processes."""
+    held = _held.__dict__.setdefault('dirs', set())
+    if comic_dir in held:
+        yield
+        return
+    with _record_lock, open(os.path.join(comic_dir, LOCK_FILE), 'a') as lock_file:
+        if fcntl is not None:
+            # Released when the file is closed
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        held.add(comic_dir)
+        try:
+            yield
+        finally:
+            held.discard(comic_dir)
+
+
+def _new_versions(count: int) -> List[str]:
+    """Fresh panel version tokens; every write of a panel image gets a new one"""
+    return [uuid.uuid4().hex[:16] for _ in range(count)]
+
+
+def _write_atomic(path: str, data: str) -> None:
+    """Write via a temp file so readers never see a half-written file."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_character_index(panels: List[Dict[str, Any]]) -> List[str]:
+    """Unique character names across all panel dialogue, in order of appearance."""
+    characters = []
+    seen = set()
+    for panel in panels:
+        for dialogue in panel.get('dialogue', []):
+            character = dialogue.get('character', '').strip()
+            if character and character not in seen:
+                seen.add(character)
+                characters.append(character)
+    return characters
+
+
+def create_comic(title: str, script: str, panels: List[Dict[str, Any]],
+                 panel_images: Optional[List[str]] = None,
+                 prompts: Optional[List[Dict[str, Any]]] = None,
+                 panel_quality: Optional[List[str]] = None) -> str:
+    """
+    Store a new comic and return its id.
+
+    The compact record (title, image URLs, character index) is kept apart
+    from the panel list and raw script, so views that only need images or
+    the title never load the dialogue. panel_quality marks each image as
+    'final' (the default) or 'draft' while a final render is pending;
+    panel_versions (see swap_panel_image) starts with a fresh token per panel.
+    """
+    comic_id = uuid.uuid4().hex
+    comic_dir = os.path.join(store_root(), comic_id)
+    os.makedirs(comic_dir, exist_ok=True)
+
+    now = datetime.utcnow().isoformat()
+    record = {
+        'id': comic_id,
+        'title': title,
+        'created': now,
+        'updated': now,
+        'panel_count': len(panels),
+        'characters': build_character_index(panels),
+        'panel_images': panel_images or [],
+        'panel_quality': panel_quality or ['final'] * len(panel_images or []),
+        'panel_versions': _new_versions(len(panel_images or [])),
+        'downloads': {}
+    }
+
+    _write_atomic(os.path.join(comic_dir, SCRIPT_FILE), script)
+    _write_atomic(os.path.join(comic_dir, PANELS_FILE), json.dumps(panels))
+    if prompts is not None:
+        _write_atomic(os.path.join(comic_dir, PROMPTS_FILE), json.dumps(prompts))
+    _write_atomic(os.path.join(comic_dir, RECORD_FILE), json.dumps(record))
+    return comic_id
+
+
+def load_comic(comic_id: str, panels: bool = False, script: bool = False,
+               prompts: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Load a comic record, optionally with its panels, raw script and prompts.
+
+    Args:
+        comic_id: Id returned by create_comic.
+        panels: Also load the panel list (descriptions and dialogue).
+        script: Also load the raw script text.
+        prompts: Also load the compiled image requests ('prompts', None if
+            the comic was stored without them).
+
+    Returns:
+        The record dictionary, or None if the comic does not exist.
+    """
+    comic_dir = _comic_dir(comic_id)
+    if not comic_dir:
+        return None
+
+    try:
+        with open(os.path.join(comic_dir, RECORD_FILE), 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        if panels:
+            with open(os.path.join(comic_dir, PANELS_FILE), 'r', encoding='utf-8') as f:
+                record['panels'] = json.load(f)
+        if script:
+            with open(os.path.join(comic_dir, SCRIPT_FILE), 'r', encoding='utf-8') as f:
+                record['script'] = f.read()
+        if prompts:
+            prompts_path = os.path.join(comic_dir, PROMPTS_FILE)
+            record['prompts'] = None
+            if os.path.exists(prompts_path):
+                with open(prompts_path, 'r', encoding='utf-8') as f:
+                    record['prompts'] = json.load(f)
+        return record
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, IOError) as e:
+        current_app.logger.error("Could not read comic %s: %s", comic_id, e)
+        return None
+
+
+def _invalidate_downloads(record: Dict[str, Any], changed: List[str]) -> None:
+    """Drop (and delete) cached download files that depend on changed parts."""
+    downloads = record.setdefault('downloads', {})
+    for part in changed:
+        for kind in DOWNLOAD_DEPENDENCIES.get(part, ()):
+            path = downloads.pop(kind, None)
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def update_comic(comic_id: str, panels: Optional[List[Dict[str, Any]]] = None,
+                 script: Optional[str] = None,
+                 prompts: Optional[List[Dict[str, Any]]] = None, **fields) -> Optional[Dict[str, Any]]:
+    """
+    Update parts of a stored comic.
+
+    Args:
+        comic_id: Id returned by create_comic.
+        panels: New panel list; the character index is rebuilt from it.
+        script: New raw script text.
+        prompts: New compiled image requests. Pass these whenever panels
+            change, otherwise the stale prompts are dropped.
+        **fields: Record fields to overwrite (e.g. panel_images, title).
+            Cached downloads built from changed parts are invalidated.
+
+    Returns:
+        The updated record, or None if the comic does not exist.
+
+    The record is re-read and written under the comic's record lock, so
+    concurrent updates from other threads or workers are not lost.
+    """
+    comic_dir = _existing_comic_dir(comic_id)
+    if not comic_dir:
+        return None
+    with _record_locked(comic_dir):
+        record = load_comic(comic_id)
+        if record is None:
+            return None
+
+        changed = [name for name in fields if fields[name] != record.get(name)]
+        if panels is not None:
+            changed.append('panels')
+        _invalidate_downloads(record, changed)
+
+        if script is not None:
+            _write_atomic(os.path.join(comic_dir, SCRIPT_FILE), script)
+        if panels is not None:
+            _write_atomic(os.path.join(comic_dir, PANELS_FILE), json.dumps(panels))
+            record['panel_count'] = len(panels)
+            record['characters'] = build_character_index(panels)
+            if prompts is None and os.path.exists(os.path.join(comic_dir, PROMPTS_FILE)):
+                os.remove(os.path.join(comic_dir, PROMPTS_FILE))
+        if prompts is not None:
+            _write_atomic(os.path.join(comic_dir, PROMPTS_FILE), json.dumps(prompts))
+
+        record.update(fields)
+        record['updated'] = datetime.utcnow().isoformat()
+        _write_atomic(os.path.join(comic_dir, RECORD_FILE), json.dumps(record))
+        return record
+
+
+def swap_panel_image(comic_id: str, index: int, version: str, image_url: Optional[str], quality: str) -> bool:
+    """
+    Replace panel `index`'s image with image_url (None keeps the image and
+    only sets its quality) if the panel is still at `version`.
+
+    Used by background renders, which take the panel's version from
+    panel_versions when they are queued: a panel regenerated or swapped in
+    the meantime has a new version and keeps its newer image, even if the
+    URLs happen to match. Returns whether the record was changed.
+    """
+    comic_dir = _existing_comic_dir(comic_id)
+    if not comic_dir:
+        return False
+    with _record_locked(comic_dir):
+        record = load_comic(comic_id)
+        if record is None:
+            return False
+        images = list(record.get('panel_images', []))
+        versions = panel_versions(record)
+        if index >= len(images) or versions[index] != version:
+            return False
+        if image_url is not None:
+            images[index] = image_url
+        quality_list = panel_quality(record)
+        quality_list[index] = quality
+        versions[index] = _new_versions(1)[0]
+        update_comic(comic_id, panel_images=images, panel_quality=quality_list, panel_versions=versions)
+        return True
+
+
+def set_panel_images(comic_id: str, images: Dict[int, str], quality: str = 'final',
+                     **changes) -> Optional[Dict[str, Any]]:
+    """
+    Set the images of the panels in `images` (index -> URL), keeping the rest.
+
+    The record is reloaded under the same lock as swap_panel_image, so a
+    background render that finished while these panels were being drawn is
+    not overwritten with a stale list. **changes (panels, script, prompts,
+    ...) go to update_comic in the same write; new panels start without an
+    image. The set and new panels get new versions, so background renders
+    queued for them earlier are dropped. Returns the updated record, or
+    None if the comic does not exist.
+    """
+    comic_dir = _existing_comic_dir(comic_id)
+    if not comic_dir:
+        return None
+    with _record_locked(comic_dir):
+        record = load_comic(comic_id)
+        if record is None:
+            return None
+        panel_images = list(record.get('panel_images', []))
+        quality_list = panel_quality(record)
+        versions = panel_versions(record)
+        if changes.get('panels') is not None:
+            count = len(changes['panels'])
+        else:
+            count = max([len(panel_images)] + [index + 1 for index in images])
+        added = max(0, count - len(panel_images))
+        panel_images = (panel_images + [''] * count)[:count]
+        quality_list = (quality_list + ['final'] * count)[:count]
+        versions = (versions + _new_versions(added))[:count]
+        for index, image_url in images.items():
+            if index < count:
+                panel_images[index] = image_url
+                quality_list[index] = quality
+                versions[index] = _new_versions(1)[0]
+        return update_comic(comic_id, panel_images=panel_images, panel_quality=quality_list,
+                            panel_versions=versions, **changes)
+
+
+def panel_quality(record: Dict[str, Any]) -> List[str]:
+    """Quality of each panel image; comics stored before drafts existed are all 'final'."""
+    count = len(record.get('panel_images', []))
+    quality = list(record.get('panel_quality') or [])[:count]
+    return quality + ['final'] * (count - len(quality))
+
+
+def panel_versions(record: Dict[str, Any]) -> List[str]:
+    """Version token of each panel image; '' for comics stored before versions existed."""
+    count = len(record.get('panel_images', []))
+    versions = list(record.get('panel_versions') or [])[:count]
+    return versions + [''] * (count - len(versions))
+
+
+def cache_download(comic_id: str, kind: str, path: str) -> None:
+    """Remember a built download file ('pdf', 'images' or 'script') for reuse."""
+    comic_dir = _existing_comic_dir(comic_id)
+    if not comic_dir:
+        return
+    with _record_locked(comic_dir):
+        record = load_comic(comic_id)
+        if record is None:
+            return
+        record.setdefault('downloads', {})[kind] = path
+        _write_atomic(os.path.join(comic_dir, RECORD_FILE), json.dumps(record))
+
+
+def cached_download(record: Dict[str, Any], kind: str) -> Optional[str]:
+    """Path of a still-valid cached download for a loaded record, if any."""
+    path = record.get('downloads', {}).get(kind)
+    if path and os.path.exists(path):
+        return path
+    return None
@@ -1,11 +1,8 @@
 import os
 from typing import Dict, Any, Optional
-import PyPDF2
-import re
-import email
-from email import policy
-from email.parser import BytesParser
 from .text_processor import process_text_content
+from app.processors.email_processor import extract_eml_text, extract_msg_text
+from .metrics import timed
 
 def process_file(file_path: str) -> Dict[str, Any]:
     """
@@ -45,8 +42,11 @@ def process_file(file_path: str) -> Dict[str, Any]:
             'instagram_posts': []
         }
 
+@timed('extract', file_type='pdf')
 def extract_text_from_pdf(file_path: str) -> Optional[str]:
     """Extract text content from PDF file."""
+    # Imported on first use so workers that never see a PDF skip it
+    import PyPDF2
     try:
         text = ""
         with open(file_path, 'rb') as file:
@@ -59,57 +59,29 @@ def extract_text_from_pdf(file_path: str) -> Optional[str]:
         print(f"Error extracting text from PDF: {str(e)}")
         return None
 
+@timed('extract', file_type='msg')
 def extract_text_from_msg(file_path: str) -> Optional[str]:
-    """Extract text content from MSG file."""
-    # Note: This is a placeholder. Actual MSG parsing requires additional libraries
-    # like extract_msg or win32com (Windows only)
+    """Extract the subject and body from an Outlook MSG file."""
     try:
-        # Simulated implementation - in a real app, use a proper MSG parser
-        with open(file_path, 'rb') as file:
-            content = file.read()
-            # Very basic extraction of text parts - not reliable for production
-            text_parts = re.findall(rb'[\x20-\x7E\r\n]{20,}', content)
-            text = b'\n'.join(text_parts).decode('utf-8', errors='ignore')
-        return text
+        # Same engine as the email directory processor: reads only the
+        # subject/body streams and drops quoted replies and signatures
+        return extract_msg_text(file_path)
     except Exception as e:
         print(f"Error extracting text from MSG: {str(e)}")
         return None
 
+@timed('extract', file_type='eml')
 def extract_text_from_eml(file_path: str) -> Optional[str]:
-    """Extract text content from EML file."""
+    """Extract the subject and body from an EML file."""
     try:
-        with open(file_path, 'rb') as file:
-            msg = BytesParser(policy=policy.default).parse(file)
-            
-            # Get subject and body
-            subject = msg.get('subject', '')
-            
-            # Extract body text from different parts
-            body = ""
-            
-            # Function to extract text from parts
-            def extract_text_from_part(part):
-                content_type = part.get_content_type()
-                if content_type == 'text/plain':
-                    return part.get_content()
-                elif content_type == 'multipart/alternative' or content_type.startswith('multipart/'):
-                    text = ""
-                    for subpart in part.iter_parts():
-                        text += extract_text_from_part(subpart)
-                    return text
-                return ""
-            
-            # Extract text from the message
-            body = extract_text_from_part(msg)
-            
-            # Combine subject and body
-            full_text = f"Subject: {subject}\n\n{body}"
-            return full_text
-            
+        # Streams the MIME tree and skips attachment bodies, so memory does
+        # not grow with attachment size
+        return extract_eml_text(file_path)
     except Exception as e:
         print(f"Error extracting text from EML: {str(e)}")
         return None
 
+@timed('extract', file_type='txt')
 def extract_text_from_txt(file_path: str) -> Optional[str]:
     """Extract text content from TXT file."""
     try:
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from typing import Tuple
+
+from flask import current_app
+from . import async_http
+from .metrics import timed
+
+# Downloads are written to disk in chunks of this size, never held whole
+CHUNK_SIZE = 256 * 1024
+
+
+def _temp_path(directory: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f".download_{uuid.uuid4().hex}.tmp")
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def download(url: str, directory: str, timeout: float = 120) -> Tuple[str, str, int]:
+    """
+    Stream an image to a temp file in directory.
+
+    Returns:
+        (temp path, sha256 of the content, size in bytes)
+    """
+    tmp_path = _temp_path(directory)
+    hasher = hashlib.sha256()
+    size = 0
+    import requests
+    try:
+        with requests.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    size += len(chunk)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    return tmp_path, hasher.hexdigest(), size
+
+
+async def download_async(url: str, directory: str, timeout: float = 120) -> Tuple[str, str, int]:
+    """download() on the pooled async client."""
+    tmp_path = _temp_path(directory)
+    try:
+        digest, size = await async_http.download(url, tmp_path, CHUNK_SIZE, timeout=timeout)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    return tmp_path, digest, size
+
+
+def ingest(tmp_path: str, digest: str, directory: str, size: Tuple[int, int]) -> Tuple[str, str]:
+    """
+    Move a downloaded image into directory as panel_<content hash>.png.
+
+    An image that is already a PNG of the target size is moved as is,
+    without decoding its pixels. Anything else is decoded at reduced scale
+    where the format allows it (JPEG draft mode), shrunk by whole factors
+    with reduce() and then resized with LANCZOS. The result is written
+    through a temp file, so readers never see a partial image. Identical
+    content maps to the same file, which is then not written again.
+
+    Returns:
+        (filename, what was done: 'reused', 'kept' or 'resized from WxH')
+    """
+    from PIL import Image
+
+    filename = f"panel_{digest[:32]}.png"
+    path = os.path.join(directory, filename)
+    try:
+        if os.path.exists(path):
+            return filename, 'reused'
+        with Image.open(tmp_path) as source:
+            source_size = source.size
+            keep = source_size == tuple(size) and source.format == 'PNG'
+            if not keep:
+                source.draft('RGB', tuple(size))
+                image = source.resize(tuple(size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        if keep:
+            os.replace(tmp_path, path)
+            return filename, 'kept'
+        out_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            image.save(out_path, format='PNG')
+            os.replace(out_path, path)
+        except BaseException:
+            _remove(out_path)
+            raise
+        return filename, f"resized from {source_size[0]}x{source_size[1]}"
+    finally:
+        _remove(tmp_path)
+
+
+def panel_size() -> Tuple[int, int]:
+    settings = current_app.config.get('COMIC_SETTINGS', {})
+    return settings.get('panel_width', 1024), settings.get('panel_height', 1024)
+
+
+def _log_ingest(filename: str, size: int, download_seconds: float, process_seconds: float, action: str) -> None:
+    current_app.logger.info("Ingested %s: %.0f KB, download %.0f ms, processing %.0f ms (%s)",
+                            filename, size / 1024, download_seconds * 1000, process_seconds * 1000, action)
+
+
+def fetch_panel(url: str, directory: str) -> str:
+    """Download, normalize and store a panel image; returns its filename in directory."""
+    started = time.perf_counter()
+    with timed('image_download'):
+        tmp_path, digest, size = download(url, directory)
+    downloaded = time.perf_counter()
+    with timed('image_process', operation='panel_ingest'):
+        filename, action = ingest(tmp_path, digest, directory, panel_size())
+    _log_ingest(filename, size, downloaded - started, time.perf_counter() - downloaded, action)
+    return filename
+
+
+async def fetch_panel_async(url: str, directory: str) -> str:
+    """fetch_panel() on the pooled async client; decoding runs in a worker thread."""
+    started = time.perf_counter()
+    with timed('image_download'):
+        tmp_path, digest, size = await download_async(url, directory)
+    downloaded = time.perf_counter()
+    with timed('image_process', operation='panel_ingest'):
+        filename, action = await asyncio.to_thread(ingest, tmp_path, digest, directory, panel_size())
+    _log_ingest(filename, size, downloaded - started, time.perf_counter() - downloaded, action)
+    return filename
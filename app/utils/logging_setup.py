@@ -0,0 +1,192 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Optional
+
+# Ids attached to every log record; set per request by the app and per
+# background job via log_context()
+request_id_var = contextvars.ContextVar('request_id', default=None)
+job_id_var = contextvars.ContextVar('job_id', default=None)
+
+TEXT_FORMAT = '[%(asctime)s] %(levelname)s in %(module)s [%(request_id)s %(job_id)s]: %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_queue_handler = None
+_listener_lock = threading.Lock()
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def log_context(request_id: Optional[str] = None, job_id: Optional[str] = None):
+    """
+    Tag log records emitted inside the block with a request and/or job id.
+
+    Background threads do not inherit the request's ids, so jobs started
+    from a request should pass them in explicitly.
+    """
+    tokens = []
+    if request_id is not None:
+        tokens.append((request_id_var, request_id_var.set(request_id)))
+    if job_id is not None:
+        tokens.append((job_id_var, job_id_var.set(job_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the current request/job ids onto the record (runs on the caller's thread)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or '-'
+        record.job_id = job_id_var.get() or '-'
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """
+    Keep the first and then every Nth DEBUG record per call site.
+
+    Hot loops (one line per file or MIME part) stay visible without paying
+    for every record; higher levels always pass.
+    """
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno > logging.DEBUG:
+            return True
+        site = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(site, 0)
+            self._counts[site] = count + 1
+        return count % self.every == 0
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread.
+
+    The stock QueueHandler formats the message before enqueueing so records
+    can cross process boundaries; this queue is in-process, so the record
+    is passed as is and `msg % args` runs off the request thread. Log
+    arguments should therefore not be mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the request/job ids and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+            'job_id': getattr(record, 'job_id', '-')
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _stop_listener() -> None:
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _restart_listener_in_child() -> None:
+    """
+    Restart the listener thread in a forked child.
+
+    Threads do not survive fork, so a worker forked from a preloaded
+    master (gunicorn --preload) would queue records that nothing drains.
+    The child gets a fresh lock, a fresh queue (the parent's may hold
+    records the parent will still write) and its own listener.
+    """
+    global _listener, _listener_lock
+    _listener_lock = threading.Lock()
+    if _listener is not None and _queue_handler is not None:
+        _queue_handler.queue = queue.SimpleQueue()
+        _listener = QueueListener(_queue_handler.queue, *_listener.handlers,
+                                  respect_handler_level=_listener.respect_handler_level)
+        _listener.start()
+
+
+def configure_logging(app) -> None:
+    """
+    Configure the app's logger tree from config.
+
+    Records from app.logger and every module logger under the 'app'
+    package go through a queue to a single stream handler, so log I/O and
+    formatting happen on a background thread.
+
+    Config keys: LOG_LEVEL, LOG_LEVELS (per-logger overrides), LOG_FORMAT
+    ('text' or 'json'), LOG_DEBUG_SAMPLE_EVERY and LOG_QUEUE.
+    """
+    global _listener, _queue_handler
+
+    config = app.config
+    formatter = JsonFormatter() if config.get('LOG_FORMAT') == 'json' else logging.Formatter(TEXT_FORMAT)
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+
+    _stop_listener()
+    if config.get('LOG_QUEUE', True):
+        handler = _queue_handler = LazyQueueHandler(queue.SimpleQueue())
+        with _listener_lock:
+            _listener = QueueListener(handler.queue, stream_handler, respect_handler_level=True)
+            _listener.start()
+    else:
+        handler = stream_handler
+        _queue_handler = None
+    handler.addFilter(ContextFilter())
+    handler.addFilter(DebugSampler(int(config.get('LOG_DEBUG_SAMPLE_EVERY', 1))))
+
+    # app.logger is the 'app' package logger, the parent of every module logger
+    logger = app.logger
+    for existing in list(logger.handlers):
+        logger.removeHandler(existing)
+    logger.addHandler(handler)
+    logger.setLevel(config.get('LOG_LEVEL', 'INFO'))
+    logger.propagate = False
+
+    levels: Dict[str, Any] = config.get('LOG_LEVELS', {})
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+
+atexit.register(_stop_listener)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
@@ -0,0 +1,149 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple
+from flask import g, has_request_context
+
+# Latency buckets in seconds, wide enough for 3-minute LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 180.0, 300.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class MetricsRegistry:
+    """
+    Process-local counters and histograms rendered in Prometheus text format.
+
+    Every worker process keeps its own registry; Prometheus should scrape
+    each worker (or aggregate per pod) rather than assume a global view.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {'buckets': buckets, 'series': {}})
+            series = histogram['series'].get(key)
+            if series is None:
+                series = histogram['series'][key] = {'counts': [0] * len(histogram['buckets']), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._counters):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+
+            for name in sorted(self._histograms):
+                histogram = self._histograms[name]
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, series in sorted(histogram['series'].items()):
+                    for bound, count in zip(histogram['buckets'], series['counts']):
+                        lines.append(f"{name}_bucket{_format_labels(key, {'le': repr(float(bound))})} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {series['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {series['sum']}")
+                    lines.append(f"{name}_count{_format_labels(key)} {series['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+registry.describe('aisensum_stage_duration_seconds', 'Duration of pipeline stages (extraction, LLM, image, persistence).')
+registry.describe('aisensum_http_request_duration_seconds', 'Duration of HTTP requests served by the app.')
+registry.describe('aisensum_llm_tokens_total', 'Tokens reported by the model provider.')
+registry.describe('aisensum_cache_requests_total', 'Cache lookups by cache and result (hit/miss; attached = waited on an identical running job).')
+registry.describe('aisensum_stage_errors_total', 'Pipeline stages that raised an exception.')
+registry.describe('aisensum_single_flight_calls_total', 'Outbound API calls by kind: executed, or shared with an identical call in flight (shared_process / shared_host).')
+registry.describe('aisensum_model_requests_total', 'Model requests by routed endpoint, task and result.')
+registry.describe('aisensum_model_hedges_total', 'Hedge requests sent, by task and reason (slow primary / failed primary).')
+registry.describe('aisensum_model_hedge_wins_total', 'Hedge races by task and the endpoint that answered first.')
+registry.describe('aisensum_circuit_breaker_trips_total', 'Times a model endpoint circuit breaker opened.')
+registry.describe('aisensum_fallback_panels_total', 'Comic panels drawn locally instead of by Ideogram.')
+registry.describe('aisensum_batch_files_total', 'Files in multi-file batches by batch type and extraction result.')
+registry.describe('aisensum_batch_duration_seconds', 'Wall time of multi-file batches, extraction to merged result.')
+registry.describe('aisensum_speculative_jobs_total', 'Pipelines started at upload time, by route and outcome (started / collected by the results request / expired uncollected).')
+registry.describe('aisensum_rate_limit_wait_seconds', 'Time spent waiting for an outbound rate limit token.')
+
+
+@contextmanager
+def timed(stage: str, **labels):
+    """
+    Time a pipeline stage; usable as a context manager or a decorator.
+
+    The duration goes to the stage histogram and, inside a request, to the
+    per-request timings returned by request_timings().
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc('aisensum_stage_errors_total', stage=stage, **labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe('aisensum_stage_duration_seconds', elapsed, stage=stage, **labels)
+        if has_request_context():
+            if 'stage_timings' not in g:
+                g.stage_timings = []
+            g.stage_timings.append({'stage': stage, **labels, 'seconds': round(elapsed, 4)})
+
+
+def request_timings() -> List[Dict[str, Any]]:
+    """Stage timings recorded so far in the current request."""
+    if has_request_context():
+        return list(g.get('stage_timings', []))
+    return []
+
+
+def record_token_usage(usage: Optional[Dict[str, Any]], model: str, task: str) -> None:
+    """Count prompt/completion tokens from an OpenAI-compatible 'usage' block."""
+    if not usage:
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        if usage.get(kind):
+            registry.inc('aisensum_llm_tokens_total', usage[kind],
+                         model=model, task=task, type=kind.split('_')[0])
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup; hit rate is hits / (hits + misses)."""
+    registry.inc('aisensum_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
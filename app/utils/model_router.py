@@ -0,0 +1,342 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from flask import current_app
+from .metrics import registry, timed
+from .rate_limiter import RateLimitTimeout
+
+# Latency samples kept per endpoint and task for the hedge delay
+LATENCY_WINDOW = 200
+
+
+class CircuitOpenError(Exception):
+    """Raised when every endpoint routed for a task has an open circuit breaker."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures of an endpoint. While open,
+    requests skip the endpoint; every `reset_timeout` seconds one request is
+    let through as a trial, and a success closes the breaker again.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def blocked(self) -> bool:
+        """True while open and not yet due for a trial request."""
+        with self._lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        """Whether a request may go out now; a trial request restarts the open period."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record(self, ok: bool) -> bool:
+        """Record an outcome; returns True when this failure opened the breaker."""
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return False
+            self.failures += 1
+            if self.failures < self.threshold:
+                return False
+            tripped = self.opened_at is None
+            self.opened_at = time.monotonic()
+            return tripped
+
+
+_breakers: Dict[tuple, CircuitBreaker] = {}
+_latencies: Dict[tuple, deque] = {}
+_state_lock = threading.Lock()
+_executor = None
+
+
+def _identity(endpoint: Dict[str, Any]) -> tuple:
+    return endpoint['base_url'], endpoint['model']
+
+
+def _breaker(endpoint: Dict[str, Any]) -> CircuitBreaker:
+    settings = current_app.config.get('MODEL_CIRCUIT_BREAKER', {})
+    with _state_lock:
+        breaker = _breakers.get(_identity(endpoint))
+        if breaker is None:
+            breaker = CircuitBreaker(int(settings.get('failure_threshold', 5)),
+                                     float(settings.get('reset_timeout', 30)))
+            _breakers[_identity(endpoint)] = breaker
+        return breaker
+
+
+def _record_latency(endpoint: Dict[str, Any], task: str, seconds: float) -> None:
+    with _state_lock:
+        _latencies.setdefault((*_identity(endpoint), task), deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def hedge_delay(endpoint: Dict[str, Any], task: str) -> float:
+    """
+    Seconds to wait on `endpoint` before racing the hedge: the configured
+    percentile of its recent latencies for the task, clamped to
+    [min_delay, max_delay]; initial_delay until enough samples exist.
+    """
+    settings = current_app.config.get('MODEL_HEDGING', {})
+    with _state_lock:
+        samples = sorted(_latencies.get((*_identity(endpoint), task), ()))
+    if len(samples) < settings.get('min_samples', 20):
+        delay = settings.get('initial_delay', 15.0)
+    else:
+        index = min(len(samples) - 1, int(len(samples) * settings.get('percentile', 95) / 100.0))
+        delay = samples[index]
+    return min(max(delay, settings.get('min_delay', 1.0)), settings.get('max_delay', 60.0))
+
+
+def _endpoint(name: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Settings of a named endpoint, None if it has no model configured.
+    'default' (or no name) is the MODEL_BASE_URL / MODEL_NAME / AISENSUM_API_KEY
+    endpoint; other endpoints fall back to those for unset fields.
+    """
+    config = current_app.config
+    default = {
+        'name': 'default',
+        'base_url': config.get('MODEL_BASE_URL'),
+        'model': config.get('MODEL_NAME'),
+        'api_key': config.get('AISENSUM_API_KEY')
+    }
+    if name in (None, 'default'):
+        return default
+    settings = config.get('MODEL_ENDPOINTS', {}).get(name) or {}
+    if not settings.get('model'):
+        return None
+    return {
+        'name': name,
+        'base_url': settings.get('base_url') or default['base_url'],
+        'model': settings['model'],
+        'api_key': settings.get('api_key') or default['api_key']
+    }
+
+
+def endpoints(task: str) -> List[Dict[str, Any]]:
+    """
+    Endpoints routed for a task from MODEL_ROUTES: the primary, then the
+    hedge/fallback if one is configured and differs from the primary.
+    """
+    route = current_app.config.get('MODEL_ROUTES', {}).get(task, {})
+    primary = _endpoint(route.get('endpoint')) or _endpoint('default')
+    routed = [primary]
+    hedge = _endpoint(route.get('hedge')) if route.get('hedge') else None
+    if hedge and _identity(hedge) != _identity(primary):
+        routed.append(hedge)
+    return routed
+
+
+def _counts_as_failure(e: Exception) -> bool:
+    """Errors that say something about the endpoint's health (not our own limits or bad requests)"""
+    import httpx
+    import requests
+    if isinstance(e, (RateLimitTimeout, CircuitOpenError)):
+        return False
+    response = getattr(e, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if isinstance(e, (requests.exceptions.HTTPError, httpx.HTTPStatusError)) and status is not None:
+        return status >= 500 or status == 429
+    return True
+
+
+def _before_attempt(endpoint: Dict[str, Any], task: str) -> CircuitBreaker:
+    breaker = _breaker(endpoint)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit open for model endpoint '{endpoint['name']}'")
+    current_app.logger.info("Sending %s request to AI model: %s at %s (%s)",
+                            task, endpoint['model'], endpoint['base_url'], endpoint['name'])
+    return breaker
+
+
+def _after_attempt(endpoint: Dict[str, Any], task: str, breaker: CircuitBreaker,
+                   started: float, error: Optional[Exception]) -> None:
+    if error is None:
+        breaker.record(True)
+        _record_latency(endpoint, task, time.monotonic() - started)
+        registry.inc('aisensum_model_requests_total', endpoint=endpoint['name'], task=task, result='ok')
+        return
+    registry.inc('aisensum_model_requests_total', endpoint=endpoint['name'], task=task, result='error')
+    if _counts_as_failure(error) and breaker.record(False):
+        registry.inc('aisensum_circuit_breaker_trips_total', endpoint=endpoint['name'])
+        current_app.logger.warning("Circuit breaker opened for model endpoint '%s' after %d consecutive failures: %s",
+                                   endpoint['name'], breaker.failures, error)
+
+
+def _attempt(endpoint: Dict[str, Any], task: str, send: Callable[[Dict[str, Any]], Any]) -> Any:
+    breaker = _before_attempt(endpoint, task)
+    started = time.monotonic()
+    try:
+        result = send(endpoint)
+    except Exception as e:
+        _after_attempt(endpoint, task, breaker, started, e)
+        raise
+    _after_attempt(endpoint, task, breaker, started, None)
+    return result
+
+
+async def _attempt_async(endpoint: Dict[str, Any], task: str,
+                         send: Callable[[Dict[str, Any]], Awaitable[Any]]) -> Any:
+    breaker = _before_attempt(endpoint, task)
+    started = time.monotonic()
+    try:
+        result = await send(endpoint)
+    except Exception as e:
+        _after_attempt(endpoint, task, breaker, started, e)
+        raise
+    _after_attempt(endpoint, task, breaker, started, None)
+    return result
+
+
+def _candidates(task: str) -> List[Dict[str, Any]]:
+    routed = endpoints(task)
+    available = [endpoint for endpoint in routed if not _breaker(endpoint).blocked()]
+    if not available:
+        raise CircuitOpenError(f"All model endpoints for {task} are unavailable (circuit open)")
+    return available
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _state_lock:
+        if _executor is None:
+            max_workers = current_app.config.get('MODEL_HEDGING', {}).get('max_workers', 32)
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='model-hedge')
+        return _executor
+
+
+def complete(task: str, send: Callable[[Dict[str, Any]], Any]) -> Any:
+    """
+    Run a model call for `task` on its routed endpoint(s).
+
+    With only a primary endpoint the call runs directly. With a hedge, the
+    primary gets hedge_delay() seconds; if it has not answered by then (or
+    failed), the same request goes to the hedge endpoint and the first
+    success wins. With MODEL_HEDGING disabled, the hedge endpoint is only
+    used after the primary fails. Endpoints with an open circuit breaker
+    are skipped.
+
+    Args:
+        task: Task name, the key in MODEL_ROUTES.
+        send: Callable taking an endpoint dict (name, base_url, model,
+            api_key) and returning the response.
+    """
+    candidates = _candidates(task)
+    if len(candidates) == 1:
+        return _attempt(candidates[0], task, send)
+    primary, hedge = candidates[0], candidates[1]
+
+    if not current_app.config.get('MODEL_HEDGING', {}).get('enabled', True):
+        try:
+            return _attempt(primary, task, send)
+        except Exception as e:
+            current_app.logger.warning("%s request to '%s' failed, falling back to '%s': %s",
+                                       task, primary['name'], hedge['name'], e)
+            registry.inc('aisensum_model_hedges_total', task=task, reason='failed')
+            return _attempt(hedge, task, send)
+
+    # Attempts run in pool threads so the caller can stop waiting on a slow one;
+    # each gets a copy of the caller's context variables (request and job ids)
+    app = current_app._get_current_object()
+
+    def run(endpoint):
+        with app.app_context():
+            return _attempt(endpoint, task, send)
+
+    def submit(endpoint):
+        return _pool().submit(contextvars.copy_context().run, run, endpoint)
+
+    with timed('llm_routed', task=task):
+        first = submit(primary)
+        done, _ = wait([first], timeout=hedge_delay(primary, task))
+        if done and first.exception() is None:
+            return first.result()
+
+        registry.inc('aisensum_model_hedges_total', task=task, reason='failed' if done else 'slow')
+        pending = {submit(hedge)}
+        if not done:
+            pending.add(first)
+        error = first.exception() if done else None
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future.exception() is None:
+                    winner = primary if future is first else hedge
+                    registry.inc('aisensum_model_hedge_wins_total', task=task, endpoint=winner['name'])
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+
+async def complete_async(task: str, send: Callable[[Dict[str, Any]], Awaitable[Any]]) -> Any:
+    """complete() for coroutines; the losing attempt of a hedge race is cancelled."""
+    candidates = _candidates(task)
+    if len(candidates) == 1:
+        return await _attempt_async(candidates[0], task, send)
+    primary, hedge = candidates[0], candidates[1]
+
+    if not current_app.config.get('MODEL_HEDGING', {}).get('enabled', True):
+        try:
+            return await _attempt_async(primary, task, send)
+        except Exception as e:
+            current_app.logger.warning("%s request to '%s' failed, falling back to '%s': %s",
+                                       task, primary['name'], hedge['name'], e)
+            registry.inc('aisensum_model_hedges_total', task=task, reason='failed')
+            return await _attempt_async(hedge, task, send)
+
+    with timed('llm_routed', task=task):
+        first = asyncio.ensure_future(_attempt_async(primary, task, send))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay(primary, task))
+            if done and first.exception() is None:
+                return first.result()
+
+            registry.inc('aisensum_model_hedges_total', task=task, reason='failed' if done else 'slow')
+            second = asyncio.ensure_future(_attempt_async(hedge, task, send))
+            pending = {second} if done else {first, second}
+            error = first.exception() if done else None
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task_future in finished:
+                    if task_future.exception() is None:
+                        winner = primary if task_future is first else hedge
+                        registry.inc('aisensum_model_hedge_wins_total', task=task, endpoint=winner['name'])
+                        return task_future.result()
+                    error = error or task_future.exception()
+            raise error
+        finally:
+            for task_future in pending:
+                task_future.cancel()
+
+
+def _reset_after_fork() -> None:
+    # Pool threads do not survive fork; breakers and latencies start fresh per worker
+    global _executor, _state_lock
+    _executor = None
+    _state_lock = threading.Lock()
+    _breakers.clear()
+    _latencies.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from flask import current_app
+from .metrics import registry, timed
+
+# Local stand-in panels for when Ideogram is missing, failing or too slow:
+# a flat illustrated background with the panel description as a caption
+# and the dialogue in speech bubbles, styled from COMIC_SETTINGS. Drawing
+# runs in a small process pool so text layout never holds the GIL of a
+# request thread.
+
+Dialogue = Union[str, List[Dict[str, str]], None]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def dialogue_lines(dialogue: Dialogue) -> List[Tuple[str, str]]:
+    """(speaker, text) pairs from parsed dialogue dicts or a 'SPEAKER: text' string."""
+    if not dialogue:
+        return []
+    if isinstance(dialogue, str):
+        lines = []
+        for line in dialogue.splitlines():
+            speaker, sep, text = line.partition(':')
+            if sep and speaker.strip() and len(speaker) <= 40:
+                lines.append((speaker.strip(), text.strip()))
+            elif line.strip():
+                lines.append(('', line.strip()))
+        return lines
+    return [(d.get('character', ''), d.get('text', '')) for d in dialogue if d.get('text')]
+
+
+def _font(settings: Dict[str, Any], kind: str, root: str, scale: float = 1.0):
+    from PIL import ImageFont
+    font = settings.get('font', {}).get(kind, {})
+    size = max(8, int(font.get('size', 16) * scale))
+    path = font.get('path')
+    if path:
+        try:
+            return ImageFont.truetype(os.path.join(root, path), size)
+        except OSError:
+            pass
+    return ImageFont.load_default(size)
+
+
+def _wrap(draw, text: str, font, width: int) -> List[str]:
+    lines = []
+    current = ''
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and draw.textlength(candidate, font=font) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _palette(seed: bytes) -> Tuple[Tuple[int, int, int], Tuple[int, int, int]]:
+    """Two soft colours for the background gradient, stable per description"""
+    top = tuple(150 + b % 90 for b in seed[:3])
+    bottom = tuple(90 + b % 110 for b in seed[3:6])
+    return top, bottom
+
+
+def draw_panel(path: str, label: str, description: str, lines: List[Tuple[str, str]],
+               settings: Dict[str, Any], fallback: Dict[str, Any], root: str) -> None:
+    """
+    Draw one placeholder panel and save it as PNG at path.
+
+    Runs in the renderer process pool, so it takes plain data only.
+    """
+    from PIL import Image, ImageDraw
+
+    width, height = settings.get('panel_width', 1024), settings.get('panel_height', 1024)
+    padding = settings.get('panel_padding', 30)
+    bubble = settings.get('bubble', {})
+    border = settings.get('panel_border', {})
+    scale = fallback.get('text_scale', 2.0)
+    caption_font = _font(settings, 'dialogue', root, scale * 1.1)
+    label_font = _font(settings, 'title', root)
+    bubble_font = _font(settings, 'dialogue', root, scale)
+
+    # Background: vertical gradient plus a few soft shapes, seeded by the text
+    seed = hashlib.sha256(description.encode('utf-8')).digest()
+    top, bottom = _palette(seed)
+    gradient = Image.linear_gradient('L').resize((width, height))
+    image = Image.composite(Image.new('RGB', (width, height), bottom),
+                            Image.new('RGB', (width, height), top), gradient)
+    shapes = Image.new('RGBA', (width, height))
+    shape_draw = ImageDraw.Draw(shapes)
+    for i in range(5):
+        x = seed[6 + i] * width // 256
+        y = height // 3 + seed[11 + i] * height // 512
+        r = width // 10 + seed[16 + i] * width // 1024
+        shape_draw.ellipse((x - r, y - r, x + r, y + r), fill=(255, 255, 255, 40 + seed[21 + i] % 40))
+    image = Image.alpha_composite(image.convert('RGBA'), shapes).convert('RGB')
+    draw = ImageDraw.Draw(image)
+
+    # Caption box with the panel label and description
+    text_width = width - 4 * padding
+    caption = _wrap(draw, description, caption_font, text_width)[:fallback.get('max_caption_lines', 6)]
+    line_height = int(caption_font.size * 1.25)
+    label_height = int(label_font.size * 1.3)
+    caption_bottom = 2 * padding + label_height + line_height * len(caption)
+    draw.rectangle((padding, padding, width - padding, caption_bottom),
+                   fill=fallback.get('caption_background', '#fdf6e3'), outline=border.get('color', '#404040'),
+                   width=border.get('width', 2))
+    y = padding + padding // 2
+    draw.text((2 * padding, y), label, font=label_font, fill=bubble.get('text_color', 'black'))
+    y += label_height
+    for line in caption:
+        draw.text((2 * padding, y), line, font=caption_font, fill=bubble.get('text_color', 'black'))
+        y += line_height
+
+    # Speech bubbles stacked from the bottom, alternating sides
+    bubble_padding = bubble.get('padding', 12)
+    radius = bubble.get('corner_radius', 15)
+    shadow = bubble.get('shadow', {})
+    line_height = int(bubble_font.size * 1.25)
+    max_text_width = int(width * 0.6)
+    bottom_edge = height - padding
+    for index, (speaker, text) in reversed(list(enumerate(lines[:fallback.get('max_bubbles', 3)]))):
+        content = f"{speaker}: {text}" if speaker else text
+        wrapped = _wrap(draw, content, bubble_font, max_text_width)[:4]
+        box_width = max(draw.textlength(line, font=bubble_font) for line in wrapped) + 2 * bubble_padding
+        box_height = line_height * len(wrapped) + 2 * bubble_padding
+        left = padding * 2 if index % 2 == 0 else width - padding * 2 - box_width
+        top_edge = bottom_edge - box_height - padding
+        if top_edge < caption_bottom + padding:
+            break
+        box = (left, top_edge, left + box_width, top_edge + box_height)
+        tail_x = left + box_width / 3 if index % 2 == 0 else left + 2 * box_width / 3
+        tail = [(tail_x - 12, box[3] - 1), (tail_x + 12, box[3] - 1), (tail_x, box[3] + padding * 0.8)]
+        if shadow.get('enabled'):
+            offset = shadow.get('offset', 1)
+            draw.rounded_rectangle(tuple(v + offset for v in box), radius=radius, fill=shadow.get('color', '#404040'))
+        draw.polygon(tail, fill=bubble.get('background', 'white'), outline=bubble.get('outline_color', '#404040'))
+        draw.rounded_rectangle(box, radius=radius, fill=bubble.get('background', 'white'),
+                               outline=bubble.get('outline_color', '#404040'), width=bubble.get('outline_width', 2))
+        ty = top_edge + bubble_padding
+        for line in wrapped:
+            draw.text((left + bubble_padding, ty), line, font=bubble_font, fill=bubble.get('text_color', 'black'))
+            ty += line_height
+        bottom_edge = top_edge - padding // 2
+
+    draw.rectangle((0, 0, width - 1, height - 1), outline=border.get('color', '#404040'),
+                   width=border.get('width', 2))
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    image.save(tmp_path, format='PNG')
+    os.replace(tmp_path, path)
+
+
+def _renderer_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = current_app.config.get('COMIC_FALLBACK', {}).get('workers', 2)
+            # Never fork the threaded server: a forked child inherits locks
+            # held by other request threads. forkserver starts children from
+            # a clean single-threaded process; draw_panel takes plain data
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _pool
+
+
+def enabled() -> bool:
+    return current_app.config.get('COMIC_FALLBACK', {}).get('enabled', True)
+
+
+def _job(description: str, dialogue: Dialogue, label: str, directory: str) -> Tuple[str, str, tuple]:
+    """(path, filename, draw_panel args); the name is a hash of everything drawn"""
+    settings = current_app.config.get('COMIC_SETTINGS', {})
+    fallback = current_app.config.get('COMIC_FALLBACK', {})
+    lines = dialogue_lines(dialogue)
+    material = json.dumps([label, description, lines, settings.get('panel_width'), settings.get('panel_height'),
+                           fallback.get('text_scale')], default=str).encode('utf-8')
+    filename = f"fallback_{hashlib.sha256(material).hexdigest()[:32]}.png"
+    path = os.path.join(directory, filename)
+    # Fonts are looked up relative to the app package, as the rest of COMIC_SETTINGS
+    args = (path, label, description, lines, settings, fallback, current_app.root_path)
+    return path, filename, args
+
+
+def render(description: str, dialogue: Dialogue, label: str, directory: str) -> str:
+    """
+    Draw a placeholder panel into directory; returns its filename.
+
+    Identical panels are drawn once and reused.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path, filename, args = _job(description, dialogue, label, directory)
+    if not os.path.exists(path):
+        with timed('image_process', operation='fallback_panel'):
+            _renderer_pool().submit(draw_panel, *args).result()
+    registry.inc('aisensum_fallback_panels_total')
+    return filename
+
+
+async def render_async(description: str, dialogue: Dialogue, label: str, directory: str) -> str:
+    """render() awaiting the process pool without blocking the event loop."""
+    os.makedirs(directory, exist_ok=True)
+    path, filename, args = _job(description, dialogue, label, directory)
+    if not os.path.exists(path):
+        with timed('image_process', operation='fallback_panel'):
+            await asyncio.wrap_future(_renderer_pool().submit(draw_panel, *args))
+    registry.inc('aisensum_fallback_panels_total')
+    return filename
+
+
+def latency_budget() -> Optional[float]:
+    """Seconds to wait for Ideogram before drawing placeholders, None for no limit."""
+    return current_app.config.get('COMIC_FALLBACK', {}).get('latency_budget')
+
+
+def _reset_after_fork() -> None:
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
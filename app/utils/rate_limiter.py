@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+from flask import current_app
+from .metrics import registry
+
+# Lower value is served first when several requests wait on the same bucket
+PRIORITIES = {
+    'interactive': 0,
+    'batch': 1
+}
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request could not get a token within the allowed wait."""
+
+
+def _key_fingerprint(api_key: Optional[str]) -> str:
+    """Short stable id for an API key so raw keys never hit the database."""
+    if not api_key:
+        return 'default'
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+class RequestScheduler:
+    """
+    Token-bucket scheduler shared by every worker process.
+
+    Buckets are keyed by provider and API key and stored in a small SQLite
+    database, so all processes draw from the same quota. Within a process,
+    waiting requests are queued by priority and only the head of each
+    bucket's queue may take the next token.
+    """
+
+    def __init__(self, db_path: str, limits: Dict[str, Dict[str, float]]):
+        self.db_path = db_path
+        self.limits = limits
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._seq = itertools.count()
+        self._stats = {}
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _update_bucket(self, bucket: str, rate: float, burst: float, cost: float) -> float:
+        """
+        Refill the bucket and try to take `cost` tokens atomically.
+
+        Returns 0 when the tokens were taken, otherwise the number of
+        seconds until enough tokens will be available.
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated FROM buckets WHERE name = ?', (bucket,)
+            ).fetchone()
+            now = time.time()
+            if row is None:
+                tokens = burst
+            else:
+                tokens = min(burst, row[0] + max(0.0, now - row[1]) * rate)
+
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / rate
+
+            conn.execute(
+                'INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)',
+                (bucket, tokens, now)
+            )
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _bucket_stats(self, bucket: str) -> Dict[str, Any]:
+        return self._stats.setdefault(bucket, {
+            'granted': 0,
+            'throttled': 0,
+            'timeouts': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0
+        })
+
+    def acquire(self, provider: str, api_key: Optional[str] = None,
+                priority: str = 'interactive', timeout: Optional[float] = None) -> float:
+        """
+        Block until the provider/key bucket grants a request.
+
+        Args:
+            provider: Name of the provider entry in RATE_LIMITS (e.g. 'llm').
+            api_key: API key the request will be sent with.
+            priority: 'interactive' or 'batch'; interactive requests go first.
+            timeout: Maximum seconds to wait, None to wait indefinitely.
+
+        Returns:
+            Seconds spent waiting for the token.
+        """
+        limits = self.limits.get(provider)
+        if not limits:
+            return 0.0
+
+        rate = float(limits['rate'])
+        burst = float(limits.get('burst', 1))
+        bucket = f"{provider}:{_key_fingerprint(api_key)}"
+        entry = (PRIORITIES.get(priority, PRIORITIES['batch']), next(self._seq))
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+
+        with self._cond:
+            queue = self._queues.setdefault(bucket, [])
+            heapq.heappush(queue, entry)
+
+        try:
+            while True:
+                with self._cond:
+                    while queue[0] != entry:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise RateLimitTimeout(f"Timed out waiting for {provider} rate limit")
+                        self._cond.wait(remaining)
+
+                wait = self._update_bucket(bucket, rate, burst, 1.0)
+                if wait <= 0:
+                    break
+
+                with self._cond:
+                    self._bucket_stats(bucket)['throttled'] += 1
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RateLimitTimeout(f"Timed out waiting for {provider} rate limit")
+                    wait = min(wait, remaining)
+                time.sleep(wait)
+        except RateLimitTimeout:
+            with self._cond:
+                self._bucket_stats(bucket)['timeouts'] += 1
+            raise
+        finally:
+            with self._cond:
+                queue.remove(entry)
+                heapq.heapify(queue)
+                self._cond.notify_all()
+
+        waited = time.monotonic() - start
+        registry.observe('aisensum_rate_limit_wait_seconds', waited, provider=provider, priority=priority)
+        with self._cond:
+            stats = self._bucket_stats(bucket)
+            stats['granted'] += 1
+            stats['total_wait'] += waited
+            stats['max_wait'] = max(stats['max_wait'], waited)
+        return waited
+
+    async def acquire_async(self, provider: str, api_key: Optional[str] = None,
+                            priority: str = 'interactive', timeout: Optional[float] = None) -> float:
+        """acquire() for coroutines: the wait happens in a worker thread so the event loop keeps running."""
+        if not self.limits.get(provider):
+            return 0.0
+        return await asyncio.to_thread(self.acquire, provider, api_key, priority, timeout)
+
+    def penalize(self, provider: str, api_key: Optional[str] = None,
+                 retry_after: Optional[float] = None) -> None:
+        """
+        Drain a bucket after the provider answered 429 so every process backs
+        off together instead of retrying straight into the limit again.
+        """
+        limits = self.limits.get(provider)
+        if not limits:
+            return
+        rate = float(limits['rate'])
+        bucket = f"{provider}:{_key_fingerprint(api_key)}"
+        backoff = retry_after if retry_after and retry_after > 0 else 1.0 / rate
+
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)',
+                (bucket, -backoff * rate, time.time())
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth and wait times per bucket for this process."""
+        with self._cond:
+            result = {}
+            for bucket in set(self._queues) | set(self._stats):
+                stats = dict(self._bucket_stats(bucket))
+                stats['queue_depth'] = len(self._queues.get(bucket, []))
+                stats['avg_wait'] = stats['total_wait'] / stats['granted'] if stats['granted'] else 0.0
+                result[bucket] = stats
+            return result
+
+    def ping(self) -> None:
+        """Check the shared bucket database is reachable; raises sqlite3.Error if not."""
+        self._connection().execute("SELECT 1 FROM buckets LIMIT 1").fetchall()
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Return the process-wide scheduler for the current app's configuration."""
+    db_path = current_app.config['RATE_LIMIT_DB']
+    with _schedulers_lock:
+        scheduler = _schedulers.get(db_path)
+        if scheduler is None:
+            scheduler = RequestScheduler(db_path, current_app.config.get('RATE_LIMITS', {}))
+            _schedulers[db_path] = scheduler
+        return scheduler
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds."""
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from flask import current_app
+from .metrics import registry
+from .single_flight import claim, release, try_lock, unlock
+
+# Settings that change what a pipeline produces for the same upload
+MODEL_SETTINGS = ('MODEL_NAME', 'MODEL_BASE_URL', 'MODEL_MAX_TOKENS', 'MODEL_TEMPERATURE',
+                  'MODEL_TOP_P', 'MODEL_ENDPOINTS', 'MODEL_ROUTES', 'SUMMARIZE_INPUT', 'CONTENT_TOGGLES')
+# How often a request waiting on another process's job checks for its result
+POLL_INTERVAL = 0.25
+CHUNK_SIZE = 1024 * 1024
+
+# (path, mtime, size) -> sha256, so repeated requests for an unchanged
+# upload do not re-read it
+_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's content."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    digest = _digests.get(memo_key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        _digests[memo_key] = digest
+    return digest
+
+
+def save_upload(file, path: str) -> str:
+    """
+    Save an uploaded file (a werkzeug FileStorage) to path; returns its sha256.
+
+    The digest is computed while the file is written and remembered for
+    file_digest, so building the pipeline key does not read the upload
+    again. The file appears complete under path (written via a temp file).
+    """
+    hasher = hashlib.sha256()
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    digest = hasher.hexdigest()
+    stat = os.stat(path)
+    _digests[(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)] = digest
+    return digest
+
+
+def pipeline_key(route: str, file_path: str, **params) -> str:
+    """
+    Key of one pipeline run: the route, the upload's content hash, the
+    request parameters and the generation settings in effect.
+    """
+    config = current_app.config
+    material = {
+        'route': route,
+        'file': file_digest(file_path),
+        'params': params,
+        'settings': {name: config.get(name) for name in MODEL_SETTINGS}
+    }
+    encoded = json.dumps(material, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _cache_dir() -> str:
+    directory = current_app.config.get('RESULT_CACHE_DIR') or os.path.join(current_app.instance_path, 'result_cache')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _load(key: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(_cache_dir(), f"{key}.json")
+    try:
+        if time.time() - os.path.getmtime(path) > current_app.config.get('RESULT_CACHE_TTL', 86400):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _store(key: str, result: Dict[str, Any]) -> None:
+    path = os.path.join(_cache_dir(), f"{key}.json")
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        current_app.logger.warning("Could not cache pipeline result %s: %s", key[:12], e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _enabled() -> bool:
+    return current_app.config.get('RESULT_CACHE_ENABLED', True)
+
+
+def _count(route: str, outcome: str) -> None:
+    registry.inc('aisensum_cache_requests_total', cache=f'pipeline:{route}', result=outcome)
+
+
+def run_once(key: str, route: str, run: Callable[[], Dict[str, Any]],
+             cacheable: Callable[[Dict[str, Any]], bool] = lambda result: True) -> Dict[str, Any]:
+    """
+    Result of the pipeline identified by key, running it at most once.
+
+    A finished result is served from the cache. If the same job is running
+    in this process, the request waits for it; if it is running in another
+    worker, the request polls for its result (and runs the job itself if
+    that worker gives up without one). Only results accepted by `cacheable`
+    are kept; exceptions raised by run reach every waiting request.
+    """
+    if not _enabled():
+        return run()
+
+    future, owner = claim(key)
+    if not owner:
+        _count(route, 'attached')
+        return future.result(timeout=current_app.config.get('RESULT_CACHE_WAIT', 600))
+
+    try:
+        cached = _load(key)
+        if cached is not None:
+            _count(route, 'hit')
+            future.set_result(cached)
+            return cached
+
+        directory = _cache_dir()
+        wait = current_app.config.get('RESULT_CACHE_WAIT', 600)
+        deadline = time.monotonic() + wait
+        locked = try_lock(directory, key, wait)
+        while not locked and time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            cached = _load(key)
+            if cached is not None:
+                _count(route, 'attached')
+                future.set_result(cached)
+                return cached
+            locked = try_lock(directory, key, wait)
+        try:
+            _count(route, 'miss')
+            result = run()
+            if cacheable(result):
+                _store(key, result)
+        finally:
+            if locked:
+                unlock(directory, key)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        if not future.done():
+            future.set_exception(e)
+        raise
+    finally:
+        release(key, future)
+
+
+async def run_once_async(key: str, route: str, run: Callable[[], Awaitable[Dict[str, Any]]],
+                         cacheable: Callable[[Dict[str, Any]], bool] = lambda result: True) -> Dict[str, Any]:
+    """run_once for coroutines; waits happen without blocking the event loop."""
+    if not _enabled():
+        return await run()
+
+    future, owner = claim(key)
+    if not owner:
+        _count(route, 'attached')
+        return await asyncio.wait_for(asyncio.wrap_future(future),
+                                      timeout=current_app.config.get('RESULT_CACHE_WAIT', 600))
+
+    try:
+        cached = _load(key)
+        if cached is not None:
+            _count(route, 'hit')
+            future.set_result(cached)
+            return cached
+
+        directory = _cache_dir()
+        wait = current_app.config.get('RESULT_CACHE_WAIT', 600)
+        deadline = time.monotonic() + wait
+        locked = try_lock(directory, key, wait)
+        while not locked and time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+            cached = _load(key)
+            if cached is not None:
+                _count(route, 'attached')
+                future.set_result(cached)
+                return cached
+            locked = try_lock(directory, key, wait)
+        try:
+            _count(route, 'miss')
+            result = await run()
+            if cacheable(result):
+                _store(key, result)
+        finally:
+            if locked:
+                unlock(directory, key)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        if not future.done():
+            future.set_exception(e)
+        raise
+    finally:
+        release(key, future)
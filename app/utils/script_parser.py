@@ -0,0 +1,361 @@
+import re
+import threading
+from bisect import bisect_right
+from typing import Dict, FrozenSet, Iterable, List, Any, Optional, Tuple
+from .metrics import registry
+
+# A panel header starts a new block: "Panel 1:", "Scene 2 - Lab:", "**Frame 3:**".
+# The scan is anchored on a literal newline so the regex engine can jump
+# between line starts instead of trying every offset; HEADER_START_RE
+# checks the first line (or a stripped line)
+HEADER_LINE = r'[^\S\n]*[*_]*(?:panel|scene|frame)\b[^:\n]*:(?P<rest>[^\n]*)'
+HEADER_RE = re.compile(r'\n' + HEADER_LINE, re.IGNORECASE)
+HEADER_START_RE = re.compile(HEADER_LINE, re.IGNORECASE)
+HEADER_FIRST_CHARS = 'PpSsFf*_'
+
+# A speaker is a name of up to four words with an optional parenthetical
+# such as "(V.O.)"; see _classify for which names count
+SPEAKER_RE = re.compile(r"[A-Za-z0-9][\w'.\-]*(?: [\w'.\-()]+){0,3}")
+# "Sarah", "Dr. Smith", "Dr. Chen (V.O.)": one to three capitalised words
+TITLE_SPEAKER_RE = re.compile(r"[A-Z][\w'.\-]*(?: [A-Z][\w'.\-]*){0,2}(?: \([^()]*\))?")
+
+# First words of "Label: text" lines that are stage directions or notes, not speakers
+STAGE_WORDS = frozenset({
+    'meanwhile', 'later', 'earlier', 'suddenly', 'then', 'next', 'finally', 'now', 'cut', 'fade',
+    'flashback', 'transition', 'setting', 'location', 'time', 'background', 'foreground', 'note',
+    'notes', 'title', 'summary', 'description', 'style', 'mood', 'tone', 'theme', 'camera', 'angle',
+    'shot', 'view', 'close-up', 'closeup', 'insert', 'interior', 'exterior', 'int.', 'ext.', 'page'
+})
+
+# Caption labels that are speakers whatever their case
+CAPTION_SPEAKERS = frozenset({'Caption', 'Narrator', 'Narration', 'SFX'})
+
+SEPARATOR_RE = re.compile(r'^(?:-{3,}|={3,}|\*{3,}|_{3,})$')
+EMPHASIS_CHARS = '*_'
+SEPARATOR_CHARS = '-=*_'
+# First characters of lines that may be markup, comments or separators
+MARKUP_CHARS = '-=*_#/'
+
+# "**End**" closes the script; anything after it (e.g. the download's closing note) is ignored
+END_MARKERS = frozenset({'end', 'the end'})
+_END = object()
+
+# Compact internal form: (description, ((character, text), ...))
+CompactPanel = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# One panel block: (start offset, has header, description, dialogue, ends the script)
+Block = Tuple[int, bool, str, Tuple[Tuple[str, str], ...], bool]
+
+
+def _strip_emphasis(value: str) -> str:
+    return value.strip().strip('*_').strip()
+
+
+def _normalize(text: str) -> str:
+    return (text.replace('\r\n', '\n') if '\r' in text else text).strip()
+
+
+def _is_speaker(name: str, known: FrozenSet[str]) -> bool:
+    if not SPEAKER_RE.fullmatch(name):
+        return False
+    if name in known:
+        return True
+    if name.split(None, 1)[0].lower() in STAGE_WORDS:
+        return False
+    return name.split('(')[0].isupper() or bool(TITLE_SPEAKER_RE.fullmatch(name))
+
+
+def _classify(line: str, speakers: Dict[str, bool], known: FrozenSet[str]):
+    """
+    None to skip a stripped, non-header line, _END, a (speaker, text) pair
+    or its description text. Markdown headings ("#"), comments ("//") and
+    separators are skipped.
+
+    Dialogue needs a speaker marked up as one ("**Sarah:**"), known, or
+    written as a capitalised name ("Sarah", "Dr. Smith", "DR. CHEN (V.O.)")
+    that does not start with a stage word, so "Meanwhile: the clock
+    ticks." stays description. speakers caches the verdict per name.
+    """
+    first = line[0]
+    if first == '#' or (first == '/' and line.startswith('//')):
+        return None
+    bold = False
+    if first in SEPARATOR_CHARS or line[-1] in EMPHASIS_CHARS:
+        if SEPARATOR_RE.match(line):
+            return None
+        bold = line.startswith(('**', '__'))
+        line = _strip_emphasis(line)
+        if not line:
+            return None
+    if len(line) <= 7 and line.lower() in END_MARKERS:
+        return _END
+    colon = line.find(':')
+    if colon > 0:
+        if bold:
+            name = _strip_emphasis(line[:colon])
+            if SPEAKER_RE.fullmatch(name):
+                return name, _strip_emphasis(line[colon + 1:])
+        else:
+            name = line[:colon].rstrip()
+            speaker = speakers.get(name)
+            if speaker is None:
+                speaker = speakers[name] = _is_speaker(name, known)
+            if speaker:
+                return name, line[colon + 1:].strip()
+    return line
+
+
+def _close_panel(panels: List[Dict[str, Any]], description: List[str], dialogue: List[Dict[str, str]],
+                 pending_dialogue: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Append a block's panel to panels; returns the dialogue left pending for the next block"""
+    if pending_dialogue:
+        dialogue = pending_dialogue + dialogue
+    if description:
+        panels.append({'description': ' '.join(description), 'dialogue': dialogue})
+        return []
+    # A header without a description ("Panel 1:" followed by "Scene: ...")
+    # shares its dialogue with the next block
+    return dialogue
+
+
+def _parse_panels(text: str, known: FrozenSet[str]) -> List[Dict[str, Any]]:
+    """
+    Parse a whole script into panel dictionaries in one pass over its lines.
+
+    Lines without markup are handled inline, the rest by _classify, so
+    this gives the same panels as _parse_region and _assemble.
+    """
+    panels = []
+    speakers = {}
+    pending_dialogue = []
+    description = []
+    dialogue = []
+    # Text before the first header (title, setting notes) is not a panel,
+    # unless the script has no headers at all
+    in_preamble = True
+
+    for line in filter(None, map(str.strip, text.split('\n'))):
+        first = line[0]
+        if ':' not in line:
+            if first not in MARKUP_CHARS and line[-1] not in EMPHASIS_CHARS and len(line) > 7:
+                description.append(line)
+                continue
+        else:
+            header = HEADER_START_RE.match(line) if first in HEADER_FIRST_CHARS else None
+            if header:
+                if not in_preamble:
+                    pending_dialogue = _close_panel(panels, description, dialogue, pending_dialogue)
+                in_preamble = False
+                rest = header.group('rest').strip()
+                if rest and (rest[0] in EMPHASIS_CHARS or rest[-1] in EMPHASIS_CHARS):
+                    rest = _strip_emphasis(rest)
+                description = [rest] if rest else []
+                dialogue = []
+                continue
+            if first not in MARKUP_CHARS and line[-1] not in EMPHASIS_CHARS:
+                name, _, spoken = line.partition(':')
+                name = name.rstrip()
+                speaker = speakers.get(name)
+                if speaker is None:
+                    speaker = speakers[name] = _is_speaker(name, known)
+                if speaker:
+                    dialogue.append({'character': name, 'text': spoken.strip()})
+                else:
+                    description.append(line)
+                continue
+        token = _classify(line, speakers, known)
+        if token is None:
+            continue
+        if token is _END:
+            break
+        if type(token) is tuple:
+            dialogue.append({'character': token[0], 'text': token[1]})
+        else:
+            description.append(token)
+    _close_panel(panels, description, dialogue, pending_dialogue)
+    return panels
+
+
+def _parse_body(body: str, description: List[str], speakers: Dict[str, bool],
+                known: FrozenSet[str]) -> Tuple[str, Tuple[Tuple[str, str], ...], bool]:
+    """(description, dialogue, ends the script) of the lines after a block's header"""
+    dialogue = []
+    for line in filter(None, map(str.strip, body.split('\n'))):
+        token = _classify(line, speakers, known)
+        if token is None:
+            continue
+        if token is _END:
+            return ' '.join(description), tuple(dialogue), True
+        if type(token) is tuple:
+            dialogue.append(token)
+        else:
+            description.append(token)
+    return ' '.join(description), tuple(dialogue), False
+
+
+def _parse_region(text: str, start: int, end: int, known: FrozenSet[str]) -> List[Block]:
+    """
+    Parse text[start:end] into panel blocks, one per header line plus one
+    for any text before the first header. start must be a line start.
+    """
+    blocks = []
+    speakers = {}
+    # (line start, match) per header; HEADER_RE matches begin at the '\n' before it
+    headers = [(match.start() + 1, match) for match in HEADER_RE.finditer(text, max(start - 1, 0), end)]
+    if start == 0:
+        first = HEADER_START_RE.match(text, 0, end)
+        if first:
+            headers.insert(0, (0, first))
+        else:
+            stop = headers[0][0] if headers else end
+            blocks.append((0, False) + _parse_body(text[:stop], [], speakers, known))
+
+    for index, (line_start, header) in enumerate(headers):
+        stop = headers[index + 1][0] if index + 1 < len(headers) else end
+        rest = _strip_emphasis(header.group('rest'))
+        body = _parse_body(text[header.end():stop], [rest] if rest else [], speakers, known)
+        blocks.append((line_start, True) + body)
+    return blocks
+
+
+def _assemble(blocks: List[Block]) -> List[CompactPanel]:
+    panels = []
+    pending_dialogue = ()
+    ends = next((index for index, block in enumerate(blocks) if block[4]), len(blocks))
+    blocks = blocks[:ends + 1]
+    # Text before the first header is a panel only if there are no headers
+    headed = any(has_header for _, has_header, _, _, _ in blocks)
+    for _, has_header, description, dialogue, _ in blocks:
+        if has_header or not headed:
+            dialogue = pending_dialogue + dialogue
+            if description:
+                panels.append((description, dialogue))
+                pending_dialogue = ()
+            else:
+                # A header without a description ("Panel 1:" followed by
+                # "Scene: ...") shares its dialogue with the next block
+                pending_dialogue = dialogue
+    return panels
+
+
+def _common_prefix(a: str, b: str, step: int = 4096) -> int:
+    """Length of the common prefix, compared a chunk at a time"""
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i:i + step] == b[i:i + step]:
+        i += step
+    if i >= limit:
+        return limit
+    low, high = i, min(i + step, limit)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[i:mid] == b[i:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix(a: str, b: str, limit: int, step: int = 4096) -> int:
+    """Length of the common suffix, at most limit"""
+    len_a, len_b = len(a), len(b)
+    i = 0
+    while i < limit:
+        size = min(step, limit - i)
+        if a[len_a - i - size:len_a - i] != b[len_b - i - size:len_b - i]:
+            break
+        i += size
+    if i >= limit:
+        return limit
+    low, high = i, min(i + step, limit)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len_a - mid:len_a - i] == b[len_b - mid:len_b - i]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class ScriptParser:
+    """
+    Single-pass comic script parser with incremental re-parsing of edits.
+
+    A new script is parsed in one pass over its lines straight into panel
+    dictionaries. When the caller passes the text an edited script was
+    derived from (previous), the script is kept as panel blocks with their
+    offsets: the blocks of a recent parse of the previous text are reused
+    and only the blocks the edit touched are parsed again.
+    """
+
+    def __init__(self, cache_size: int = 16):
+        self.cache_size = cache_size
+        # Recently edited scripts: text -> (known speakers, blocks, block starts)
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def _reparse(self, text: str, known: FrozenSet[str], previous: str) -> Tuple[List[Block], bool]:
+        """(blocks, whether a previous parse was reused)"""
+        cached = self._recent.get(previous)
+        if cached is None or cached[0] != known:
+            return _parse_region(text, 0, len(text), known), False
+        _, old_blocks, starts = cached
+
+        prefix = _common_prefix(previous, text)
+        if prefix == len(previous) == len(text):
+            return old_blocks, True
+        suffix = _common_suffix(previous, text, min(len(previous), len(text)) - prefix)
+        delta = len(text) - len(previous)
+
+        # The changed block's header may be the edited line, so its
+        # predecessor is parsed again too; blocks starting after the change
+        # are unchanged apart from their offset
+        first = max(0, bisect_right(starts, prefix) - 2)
+        last = bisect_right(starts, len(previous) - suffix)
+        region_end = starts[last] + delta if last < len(starts) else len(text)
+        middle = _parse_region(text, starts[first], region_end, known)
+        tail = [(block[0] + delta,) + block[1:] for block in old_blocks[last:]]
+        return old_blocks[:first] + middle + tail, True
+
+    def _parse_edit(self, text: str, known: FrozenSet[str], previous: str) -> List[CompactPanel]:
+        blocks, reused = self._reparse(text, known, previous)
+        with self._lock:
+            self._recent.pop(text, None)
+            self._recent[text] = (known, blocks, [block[0] for block in blocks])
+            while len(self._recent) > self.cache_size:
+                # Evict the oldest entry (dicts keep insertion order)
+                self._recent.pop(next(iter(self._recent)))
+        registry.inc('aisensum_cache_requests_total', cache='script_blocks', result='hit' if reused else 'miss')
+        return _assemble(blocks)
+
+    def parse(self, script_text: str, characters: Optional[Iterable[str]] = None,
+              previous: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Parse a script into panel dictionaries with 'description' and 'dialogue'.
+
+        Args:
+            script_text: The script.
+            characters: Names accepted as speakers in any case.
+            previous: The script this one was edited from, if any; the
+                parse of a recently edited text is reused.
+        """
+        text = _normalize(script_text)
+        known = CAPTION_SPEAKERS.union(characters or ())
+        if previous is None:
+            return _parse_panels(text, known)
+        return [
+            {
+                'description': description,
+                'dialogue': [{'character': character, 'text': spoken} for character, spoken in dialogue]
+            }
+            for description, dialogue in self._parse_edit(text, known, _normalize(previous))
+        ]
+
+
+_default_parser = ScriptParser()
+
+
+def parse_comic_script(script_text: str, characters: Optional[Iterable[str]] = None,
+                       previous: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Parse a comic script into panels and dialogue"""
+    return _default_parser.parse(script_text, characters, previous)
@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from flask import current_app
+from .metrics import registry
+
+# Single-flight for outbound API calls: while a call is running, identical
+# calls wait for it and share its result instead of going out again.
+#
+# In a process, waiters block on the leader's future. Across worker
+# processes, the leader holds a lock file and publishes its result next to
+# it; other processes poll for that file. A published result stays
+# shareable for SINGLE_FLIGHT_SHARE_SECONDS so near-simultaneous duplicates
+# (double clicks, the same newsletter uploaded by several people) are
+# covered too, unless the caller asks for concurrent_only: then only a
+# result published after it arrived, i.e. by a call that was in flight,
+# is taken. Failures are never published: another process that was
+# waiting makes the call itself.
+
+# How often a request waiting on another process checks for the result
+POLL_INTERVAL = 0.1
+# Minimum seconds between sweeps of expired result and lock files
+SWEEP_INTERVAL = 60
+
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+def flight_key(kind: str, *parts: Any) -> str:
+    """Stable key for a call: its kind plus everything that determines the response."""
+    encoded = json.dumps([kind, *parts], sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def claim(key: str) -> Tuple[Future, bool]:
+    """The in-process future for key and whether the caller leads (must run the work)."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight[key] = Future()
+        return future, True
+
+
+def release(key: str, future: Future) -> None:
+    """Forget the leader's future once it has its outcome."""
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def try_lock(directory: str, key: str, stale_after: float) -> bool:
+    """Take the cross-process lock for key; a lock older than stale_after seconds is treated as abandoned."""
+    path = os.path.join(directory, f"{key}.lock")
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) <= stale_after:
+                    return False
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def unlock(directory: str, key: str) -> None:
+    try:
+        os.remove(os.path.join(directory, f"{key}.lock"))
+    except FileNotFoundError:
+        pass
+
+
+def _flight_dir() -> str:
+    directory = current_app.config.get('SINGLE_FLIGHT_DIR') or os.path.join(tempfile.gettempdir(), 'aisensum_flights')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _load_shared(directory: str, key: str, since: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    {'result': ...} published by another process within the share window
+    (and not before since, if given), else None
+    """
+    path = os.path.join(directory, f"{key}.json")
+    try:
+        published = os.path.getmtime(path)
+        if time.time() - published > current_app.config.get('SINGLE_FLIGHT_SHARE_SECONDS', 30):
+            return None
+        if since is not None and published < since:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _publish(directory: str, key: str, result: Any) -> None:
+    path = os.path.join(directory, f"{key}.json")
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'result': result}, f)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        current_app.logger.warning("Could not share single-flight result %s: %s", key[:12], e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _sweep(directory)
+
+
+def _sweep(directory: str) -> None:
+    """Remove result files past the share window and abandoned locks, at most once a minute per process"""
+    global _last_sweep
+    now = time.time()
+    if now - _last_sweep < SWEEP_INTERVAL:
+        return
+    _last_sweep = now
+    share = current_app.config.get('SINGLE_FLIGHT_SHARE_SECONDS', 30)
+    stale = current_app.config.get('SINGLE_FLIGHT_WAIT', 300)
+    try:
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if now - os.path.getmtime(path) > (stale if name.endswith('.lock') else share):
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+    except OSError as e:
+        current_app.logger.warning("Could not sweep single-flight directory: %s", e)
+
+
+def _count(kind: str, result: str) -> None:
+    registry.inc('aisensum_single_flight_calls_total', kind=kind, result=result)
+
+
+def do(kind: str, key: str, call: Callable[[], Any],
+       shareable: Callable[[Any], bool] = lambda result: True, concurrent_only: bool = False) -> Any:
+    """
+    Run call() unless an identical call (same key) is already running, in
+    which case wait for it and return its result.
+
+    Args:
+        kind: Label for the counters ('llm', 'ideogram', ...).
+        key: flight_key() of the call.
+        call: Zero-argument callable; its result must be JSON-serializable.
+        shareable: Whether a result may be published to other processes
+            (e.g. not an error response); waiters in this process get it
+            either way.
+        concurrent_only: Share only with calls that were in flight when
+            this one arrived, not results of calls that already finished
+            within the share window (e.g. images, where a repeat should
+            draw a new one).
+    """
+    if not current_app.config.get('SINGLE_FLIGHT_ENABLED', True):
+        return call()
+
+    wait = current_app.config.get('SINGLE_FLIGHT_WAIT', 300)
+    future, leader = claim(key)
+    if not leader:
+        _count(kind, 'shared_process')
+        return future.result(timeout=wait)
+
+    try:
+        directory = _flight_dir()
+        since = time.time() if concurrent_only else None
+        deadline = time.monotonic() + wait
+        locked = False
+        while True:
+            shared = _load_shared(directory, key, since)
+            if shared is not None:
+                _count(kind, 'shared_host')
+                future.set_result(shared['result'])
+                return shared['result']
+            locked = try_lock(directory, key, wait)
+            if locked or time.monotonic() >= deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+        try:
+            _count(kind, 'executed')
+            result = call()
+            if shareable(result):
+                _publish(directory, key, result)
+        finally:
+            if locked:
+                unlock(directory, key)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        if not future.done():
+            future.set_exception(e)
+        raise
+    finally:
+        release(key, future)
+
+
+async def do_async(kind: str, key: str, call: Callable[[], Awaitable[Any]],
+                   shareable: Callable[[Any], bool] = lambda result: True, concurrent_only: bool = False) -> Any:
+    """do() for coroutines; waits happen without blocking the event loop."""
+    if not current_app.config.get('SINGLE_FLIGHT_ENABLED', True):
+        return await call()
+
+    wait = current_app.config.get('SINGLE_FLIGHT_WAIT', 300)
+    future, leader = claim(key)
+    if not leader:
+        _count(kind, 'shared_process')
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=wait)
+
+    try:
+        directory = _flight_dir()
+        since = time.time() if concurrent_only else None
+        deadline = time.monotonic() + wait
+        locked = False
+        while True:
+            shared = _load_shared(directory, key, since)
+            if shared is not None:
+                _count(kind, 'shared_host')
+                future.set_result(shared['result'])
+                return shared['result']
+            locked = try_lock(directory, key, wait)
+            if locked or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+        try:
+            _count(kind, 'executed')
+            result = await call()
+            if shareable(result):
+                _publish(directory, key, result)
+        finally:
+            if locked:
+                unlock(directory, key)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        if not future.done():
+            future.set_exception(e)
+        raise
+    finally:
+        release(key, future)
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from flask import current_app, copy_current_request_context
+from .metrics import registry
+from .result_cache import run_once, run_once_async
+
+# Speculative processing: an upload starts its pipeline here as soon as the
+# file is saved, so extraction and model calls run while the browser
+# follows the redirect and requests the results page. The results route
+# collects the running (or finished) job by its pipeline key instead of
+# starting the work itself.
+#
+# Jobs live in the process that took the upload. When the results request
+# lands on another worker, run_once finds the job through the result
+# cache's cross-process lock and waits for its stored result.
+
+Pipeline = Callable[[], Dict[str, Any]]
+
+# key -> (future, monotonic start time, route)
+_jobs: Dict[str, Tuple[Future, float, str]] = {}
+_jobs_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _settings() -> Dict[str, Any]:
+    return current_app.config.get('SPECULATIVE_PROCESSING', {})
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_settings().get('workers', 4),
+                                           thread_name_prefix='speculative')
+        return _executor
+
+
+def _expire(ttl: float) -> None:
+    """Drop finished jobs nobody collected within ttl seconds; call with _jobs_lock held"""
+    now = time.monotonic()
+    for key, (future, started, route) in list(_jobs.items()):
+        if future.done() and now - started > ttl:
+            del _jobs[key]
+            registry.inc('aisensum_speculative_jobs_total', route=route, result='expired')
+
+
+def start(key: str, route: str, run: Pipeline, cacheable: Callable[[Dict[str, Any]], bool]) -> bool:
+    """
+    Run a pipeline in the background, through run_once, ahead of its results request.
+
+    Must be called inside the upload request: the job runs with a copy of
+    its request context, so url_for and flash behave as in the results
+    route. Returns False if speculative processing is off or the same job
+    is already waiting to be collected.
+    """
+    if not _settings().get('enabled', True):
+        return False
+    logger = current_app.logger
+
+    def logged(future):
+        if future.exception() is not None:
+            logger.warning("Speculative %s job %s failed: %s", route, key[:12], future.exception())
+
+    with _jobs_lock:
+        _expire(_settings().get('ttl', 300))
+        if key in _jobs:
+            return False
+        job = copy_current_request_context(lambda: run_once(key, route, run, cacheable))
+        future = _pool().submit(job)
+        _jobs[key] = (future, time.monotonic(), route)
+    future.add_done_callback(logged)
+    registry.inc('aisensum_speculative_jobs_total', route=route, result='started')
+    return True
+
+
+def _take(key: str, route: str) -> Optional[Future]:
+    with _jobs_lock:
+        future = _jobs.pop(key, (None,))[0]
+    if future is not None:
+        registry.inc('aisensum_speculative_jobs_total', route=route, result='collected')
+    return future
+
+
+def collect(key: str, route: str, run: Pipeline, cacheable: Callable[[Dict[str, Any]], bool]) -> Dict[str, Any]:
+    """
+    Result of the pipeline: the speculative job's if this process started
+    one (waiting for it if needed), otherwise run_once(key, route, run, cacheable).
+    Exceptions raised by the job are raised here.
+    """
+    future = _take(key, route)
+    if future is None:
+        return run_once(key, route, run, cacheable)
+    return future.result(timeout=current_app.config.get('RESULT_CACHE_WAIT', 600))
+
+
+async def collect_async(key: str, route: str, run: Callable[[], Awaitable[Dict[str, Any]]],
+                        cacheable: Callable[[Dict[str, Any]], bool]) -> Dict[str, Any]:
+    """collect() for async routes; a fresh run uses run_once_async."""
+    future = _take(key, route)
+    if future is None:
+        return await run_once_async(key, route, run, cacheable)
+    return await asyncio.wait_for(asyncio.wrap_future(future),
+                                  timeout=current_app.config.get('RESULT_CACHE_WAIT', 600))
+
+
+def _reset_after_fork() -> None:
+    global _executor, _executor_lock, _jobs_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+    _jobs_lock = threading.Lock()
+    _jobs.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
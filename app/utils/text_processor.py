@@ -1,146 +1,270 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import re
-import requests
 import json
 from flask import current_app
+from .rate_limiter import get_scheduler, parse_retry_after, RateLimitTimeout
+from .metrics import timed, record_token_usage
+from . import async_http, model_router, single_flight
 
-def process_text_content(text: str) -> Dict[str, Any]:
+# Retries after a 429, each one waits for the shared bucket to refill first
+MAX_RATE_LIMIT_RETRIES = 2
+
+def _post_chat_completion(payload: Dict[str, Any], timeout: int, task: str,
+                          priority: str = 'interactive') -> Dict[str, Any]:
     """
-    Process raw text content using the configured AI model (e.g., Grok)
-    to extract insights and generate content suggestions.
+    Send a chat completion request on the task's routed model endpoint(s)
+    through the shared rate limiter.
+    
+    MODEL_ROUTES picks the endpoint (and an optional hedge) per task; see
+    model_router. Identical requests in flight at the same time (in any
+    worker) are sent once and share the response; see single_flight.
     
     Args:
-        text: The raw text content to process
+        payload: JSON request body without 'model' (set per endpoint).
+        timeout: HTTP timeout in seconds.
+        task: Name of the calling task ('topics', 'carousel', 'comic_script'),
+            used for routing and to label timings and token usage.
+        priority: Scheduler priority, 'interactive' or 'batch'.
         
     Returns:
-        Dictionary containing processed content, matching the structure 
-        expected by the results template.
+        The decoded JSON response.
     """
-    # Get model configuration from .env (via app.config)
-    api_key = current_app.config.get('AISENSUM_API_KEY') # Assuming this key is for the Grok endpoint
-    base_url = current_app.config.get('MODEL_BASE_URL')
-    model_name = current_app.config.get('MODEL_NAME')
-    max_tokens = current_app.config.get('MODEL_MAX_TOKENS', 2000)
-    temperature = current_app.config.get('MODEL_TEMPERATURE', 0.7)
-    top_p = current_app.config.get('MODEL_TOP_P', 1.0)
+    def send(endpoint):
+        api_endpoint, body = _endpoint_request(endpoint, payload)
+        key = single_flight.flight_key('llm', api_endpoint, endpoint['api_key'], body)
+        return single_flight.do('llm', key, lambda: _send_chat_completion(api_endpoint, endpoint['api_key'], body,
+                                                                          timeout, task, priority))
+    return model_router.complete(task, send)
+
+def _endpoint_request(endpoint: Dict[str, Any], payload: Dict[str, Any]):
+    """(chat completions URL, request body) for one routed endpoint"""
+    return f"{endpoint['base_url'].rstrip('/')}/chat/completions", {"model": endpoint['model'], **payload}
+
+def _send_chat_completion(api_endpoint: str, api_key: str, payload: Dict[str, Any],
+                          timeout: int, task: str, priority: str) -> Dict[str, Any]:
+    import requests
+    scheduler = get_scheduler()
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json'
+    }
     
-    if not all([api_key, base_url, model_name]):
-        current_app.logger.error("AI Model configuration (API Key, Base URL, Model Name) is missing.")
-        # Return default structure on config error
-        return { 
-            'topics': ["Error: Model configuration missing."], 
-            'linkedin_posts': [], 
-            'instagram_posts': [] 
-        }
-        
-    # Construct the prompt for the AI model
-    # Ask for specific structured output (JSON format within the response)
-    prompt_text_part1 = """Analyze the following text content and generate social media content suggestions. 
-Format the output strictly as a JSON object with three keys: 
-1. 'topics': A list of 5 relevant string topics based on the text.
-2. 'linkedin_posts': A list of 2-3 JSON objects, each with 'title' (string), 'content' (string), and 'hashtags' (list of strings).
-3. 'instagram_posts': A list of 1-2 JSON objects, each with 'caption' (string) and 'image_suggestion' (string).
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        scheduler.acquire('llm', api_key, priority=priority,
+                          timeout=current_app.config.get('RATE_LIMIT_TIMEOUT'))
+        with timed('llm_request', task=task):
+            response = requests.post(api_endpoint, headers=headers, json=payload, timeout=timeout)
+        if response.status_code == 429 and attempt < MAX_RATE_LIMIT_RETRIES:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            current_app.logger.warning(f"AI model rate limited (429), backing off {retry_after or 'default'}s")
+            scheduler.penalize('llm', api_key, retry_after)
+            continue
+        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+        response_data = response.json()
+        record_token_usage(response_data.get('usage'), payload.get('model', ''), task)
+        return response_data
 
-Text content:
-"""
-    prompt_text_part2 = text[:max_tokens*2] # Limit input text size roughly
-    prompt_text_part3 = """""" # Closing triple quotes
-    prompt = f"{prompt_text_part1}{prompt_text_part2}{prompt_text_part3}"
+async def _post_chat_completion_async(payload: Dict[str, Any], timeout: int, task: str,
+                                      priority: str = 'interactive') -> Dict[str, Any]:
+    """
+    Async variant of _post_chat_completion on the pooled HTTP client.
     
-    # Prepare API request
+    The rate-limit wait runs in a worker thread and the request on the
+    shared I/O loop, so the caller's event loop stays free for other calls.
+    """
+    async def send(endpoint):
+        api_endpoint, body = _endpoint_request(endpoint, payload)
+        key = single_flight.flight_key('llm', api_endpoint, endpoint['api_key'], body)
+        return await single_flight.do_async('llm', key, lambda: _send_chat_completion_async(
+            api_endpoint, endpoint['api_key'], body, timeout, task, priority))
+    return await model_router.complete_async(task, send)
+
+async def _send_chat_completion_async(api_endpoint: str, api_key: str, payload: Dict[str, Any],
+                                      timeout: int, task: str, priority: str) -> Dict[str, Any]:
+    scheduler = get_scheduler()
     headers = {
         'Authorization': f'Bearer {api_key}',
         'Content-Type': 'application/json'
     }
+    
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        await scheduler.acquire_async('llm', api_key, priority=priority,
+                                      timeout=current_app.config.get('RATE_LIMIT_TIMEOUT'))
+        with timed('llm_request', task=task):
+            response = await async_http.post(api_endpoint, headers=headers, json=payload, timeout=timeout)
+        if response.status_code == 429 and attempt < MAX_RATE_LIMIT_RETRIES:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            current_app.logger.warning(f"AI model rate limited (429), backing off {retry_after or 'default'}s")
+            scheduler.penalize('llm', api_key, retry_after)
+            continue
+        response.raise_for_status()
+        response_data = response.json()
+        record_token_usage(response_data.get('usage'), payload.get('model', ''), task)
+        return response_data
+
+def _request_failure(e: Exception, label: str) -> str:
+    """Log a failed chat completion call and return the error text for the result"""
+    import httpx
+    import requests
+    if isinstance(e, (requests.exceptions.Timeout, httpx.TimeoutException)):
+        current_app.logger.error(f"{label} request timed out.")
+        return "AI request timed out."
+    if isinstance(e, RateLimitTimeout):
+        current_app.logger.error(f"{label} request not sent: {e}")
+        return "AI request rate limited."
+    if isinstance(e, model_router.CircuitOpenError):
+        current_app.logger.error(f"{label} request not sent: {e}")
+        return "AI service temporarily unavailable."
+    if isinstance(e, (requests.exceptions.RequestException, httpx.HTTPError)):
+        current_app.logger.error(f"{label} API request failed: {e}")
+        return f"AI API request failed: {e}"
+    current_app.logger.error(f"Unexpected error in {label} processing: {e}", exc_info=True)
+    return "Unexpected processing error."
+
+def _prompt_text(text: str, budget_chars: int) -> str:
+    """
+    Input text for a prompt, at most budget_chars long.
+    
+    Long documents are reduced to their most informative sentences by the
+    local extractive summarizer instead of being cut after the first
+    budget_chars characters; SUMMARIZE_INPUT=False restores plain truncation.
+    """
+    if len(text) <= budget_chars:
+        return text
+    if not current_app.config.get('SUMMARIZE_INPUT', True):
+        return text[:budget_chars]
+    from app.processors.summarizer import summarize
+    with timed('summarize'):
+        return summarize(text, budget_chars)
+
+def _chat_request(task: str, prompt: str, max_tokens: int, temperature: float, timeout: int) -> Dict[str, Any]:
+    """Keyword arguments for _post_chat_completion(_async)"""
     payload = {
-        "model": model_name,
         "messages": [{"role": "user", "content": prompt}],
         "max_tokens": max_tokens,
         "temperature": temperature,
-        "top_p": top_p
-        # Add other parameters compatible with the API if needed
+        "top_p": current_app.config.get('MODEL_TOP_P', 1.0)
     }
+    return {
+        'payload': payload,
+        'timeout': timeout,
+        'task': task
+    }
+
+def _model_configured() -> bool:
+    config = current_app.config
+    return all([config.get('AISENSUM_API_KEY'), config.get('MODEL_BASE_URL'), config.get('MODEL_NAME')])
+
+def _response_content(response_data: Dict[str, Any]) -> Optional[str]:
+    """Message content of the first choice, None if the response has no choices"""
+    if response_data.get('choices') and len(response_data['choices']) > 0:
+        return response_data['choices'][0].get('message', {}).get('content', '')
+    return None
+
+def _parse_json_content(ai_content_raw: str) -> Any:
+    # Clean up potential markdown code fences if AI wrapped JSON in them
+    ai_content_clean = re.sub(r'^```json\n?|```$', '', ai_content_raw.strip())
+    return json.loads(ai_content_clean)
+
+# --- Topics and posts ---
+
+def _topics_error(message: str) -> Dict[str, Any]:
+    return {'topics': [f"Error: {message}"], 'linkedin_posts': [], 'instagram_posts': []}
+
+def _topics_request(text: str) -> Optional[Dict[str, Any]]:
+    """Chat request for process_text_content, None if the model configuration is missing"""
+    if not _model_configured():
+        current_app.logger.error("AI Model configuration (API Key, Base URL, Model Name) is missing.")
+        return None
+    max_tokens = current_app.config.get('MODEL_MAX_TOKENS', 2000)
     
-    api_endpoint = f"{base_url.rstrip('/')}/chat/completions" # Common endpoint for chat models
+    # Ask for specific structured output (JSON format within the response)
+    prompt_text_part1 = """Analyze the following text content and generate social media content suggestions. 
+Format the output strictly as a JSON object with three keys: 
+1. 'topics': A list of 5 relevant string topics based on the text.
+2. 'linkedin_posts': A list of 2-3 JSON objects, each with 'title' (string), 'content' (string), and 'hashtags' (list of strings).
+3. 'instagram_posts': A list of 1-2 JSON objects, each with 'caption' (string) and 'image_suggestion' (string).
 
+Text content:
+"""
+    prompt_text_part2 = _prompt_text(text, max_tokens*2) # Limit input text size roughly
+    prompt = f"{prompt_text_part1}{prompt_text_part2}"
+    
+    request_args = _chat_request('topics', prompt, max_tokens,
+                                 current_app.config.get('MODEL_TEMPERATURE', 0.7), timeout=120)
+    return request_args
+
+def _topics_result(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    current_app.logger.debug("Raw AI response: %s", response_data)
+    ai_content_raw = _response_content(response_data)
+    if ai_content_raw is None:
+        current_app.logger.error(f"AI response format unexpected: {response_data}")
+        return _topics_error("Unexpected AI response format.")
+    current_app.logger.info("AI content successfully generated.")
+    
     try:
-        current_app.logger.info(f"Sending request to AI model: {model_name} at {api_endpoint}")
-        response = requests.post(api_endpoint, headers=headers, json=payload, timeout=120) # Increased timeout
-        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-        
-        response_data = response.json()
-        current_app.logger.debug(f"Raw AI response: {response_data}")
+        parsed_content = _parse_json_content(ai_content_raw)
         
-        # Extract the generated content (structure depends on the API)
-        # Assuming a structure like OpenAI/Anthropic chat completion
-        if response_data.get('choices') and len(response_data['choices']) > 0:
-            ai_content_raw = response_data['choices'][0].get('message', {}).get('content', '')
-            current_app.logger.info("AI content successfully generated.")
+        # Validate structure (basic check)
+        if all(k in parsed_content for k in ['topics', 'linkedin_posts', 'instagram_posts']):
+            current_app.logger.info("Successfully parsed structured JSON from AI response.")
+            return {
+                'topics': parsed_content.get('topics', [])[:5], # Limit topics
+                'linkedin_posts': parsed_content.get('linkedin_posts', [])[:3], # Limit posts
+                'instagram_posts': parsed_content.get('instagram_posts', [])[:2] # Limit captions
+            }
+        raise ValueError("Parsed JSON missing required keys.")
             
-            # Attempt to parse the JSON string within the AI's response
-            try:
-                # Clean up potential markdown code fences if AI wrapped JSON in them
-                ai_content_clean = re.sub(r'^```json\n?|```$', '', ai_content_raw.strip())
-                parsed_content = json.loads(ai_content_clean)
-                
-                # Validate structure (basic check)
-                if all(k in parsed_content for k in ['topics', 'linkedin_posts', 'instagram_posts']):
-                    current_app.logger.info("Successfully parsed structured JSON from AI response.")
-                    # Ensure lists are correctly typed, provide defaults if keys missing
-                    return {
-                        'topics': parsed_content.get('topics', [])[:5], # Limit topics
-                        'linkedin_posts': parsed_content.get('linkedin_posts', [])[:3], # Limit posts
-                        'instagram_posts': parsed_content.get('instagram_posts', [])[:2] # Limit captions
-                    }
-                else:
-                    raise ValueError("Parsed JSON missing required keys.")
-                    
-            except (json.JSONDecodeError, ValueError) as json_err:
-                current_app.logger.error(f"Failed to parse JSON from AI response: {json_err}\nRaw content: {ai_content_raw}")
-                # Return raw content with an error message if parsing fails
-                return { 
-                    'topics': [f"Error: Could not parse AI response."], 
-                    'linkedin_posts': [{'title': 'Raw AI Response', 'content': ai_content_raw, 'hashtags': []}], 
-                    'instagram_posts': [] 
-                }
-        else:
-            current_app.logger.error(f"AI response format unexpected: {response_data}")
-            return { 'topics': ["Error: Unexpected AI response format."], 'linkedin_posts': [], 'instagram_posts': [] }
-
-    except requests.exceptions.Timeout:
-        current_app.logger.error(f"API request timed out after 120 seconds.")
-        return { 'topics': ["Error: AI request timed out."], 'linkedin_posts': [], 'instagram_posts': [] }
-    except requests.exceptions.RequestException as e:
-        current_app.logger.error(f"AI API request failed: {e}")
-        return { 'topics': [f"Error: AI API request failed: {e}"], 'linkedin_posts': [], 'instagram_posts': [] }
-    except Exception as e:
-        current_app.logger.error(f"An unexpected error occurred in process_text_content: {e}", exc_info=True)
-        return { 'topics': [f"Error: Unexpected processing error."], 'linkedin_posts': [], 'instagram_posts': [] }
+    except (json.JSONDecodeError, ValueError) as json_err:
+        current_app.logger.error(f"Failed to parse JSON from AI response: {json_err}\nRaw content: {ai_content_raw}")
+        # Return raw content with an error message if parsing fails
+        return { 
+            'topics': [f"Error: Could not parse AI response."], 
+            'linkedin_posts': [{'title': 'Raw AI Response', 'content': ai_content_raw, 'hashtags': []}], 
+            'instagram_posts': [] 
+        }
 
-def process_text_for_carousel(text: str, num_panels: int = 8) -> Dict[str, Any]:
-    """
-    Process text using the AI model to generate content for a carousel.
-    Args: 
-        text: The input summary/text content.
-        num_panels: The desired number of carousel panels (default 8).
-    Returns: 
-        Dictionary containing carousel panels, e.g., {'carousel_panels': [...]}
+def process_text_content(text: str) -> Dict[str, Any]:
     """
-    # Validate num_panels input
-    if not 4 <= num_panels <= 12:
-        num_panels = 8 # Default to 8 if invalid
-        current_app.logger.warning(f"Invalid num_panels requested, defaulting to 8.")
+    Process raw text content using the configured AI model (e.g., Grok)
+    to extract insights and generate content suggestions.
+    
+    Args:
+        text: The raw text content to process
         
-    api_key = current_app.config.get('AISENSUM_API_KEY')
-    base_url = current_app.config.get('MODEL_BASE_URL')
-    model_name = current_app.config.get('MODEL_NAME')
-    max_tokens = current_app.config.get('MODEL_MAX_TOKENS', 2000) 
-    temperature = current_app.config.get('MODEL_TEMPERATURE', 0.7)
-    top_p = current_app.config.get('MODEL_TOP_P', 1.0)
+    Returns:
+        Dictionary containing processed content, matching the structure 
+        expected by the results template.
+    """
+    request_args = _topics_request(text)
+    if request_args is None:
+        return _topics_error("Model configuration missing.")
+    try:
+        return _topics_result(_post_chat_completion(**request_args))
+    except Exception as e:
+        return _topics_error(_request_failure(e, 'AI'))
+
+async def process_text_content_async(text: str) -> Dict[str, Any]:
+    """Async variant of process_text_content"""
+    request_args = _topics_request(text)
+    if request_args is None:
+        return _topics_error("Model configuration missing.")
+    try:
+        return _topics_result(await _post_chat_completion_async(**request_args))
+    except Exception as e:
+        return _topics_error(_request_failure(e, 'AI'))
 
-    if not all([api_key, base_url, model_name]):
+# --- Carousel ---
+
+def _carousel_error(message: str) -> Dict[str, Any]:
+    return {'carousel_panels': [{"title": "Error", "text": message, "image_suggestion": "Error"}]}
+
+def _carousel_request(text: str, num_panels: int) -> Optional[Dict[str, Any]]:
+    """Chat request for process_text_for_carousel, None if the model configuration is missing"""
+    if not _model_configured():
         current_app.logger.error("AI Model configuration missing for carousel.")
-        return {'carousel_panels': [{"title": "Error", "text": "Model configuration missing."}]}
+        return None
+    max_tokens = current_app.config.get('MODEL_MAX_TOKENS', 2000) 
 
     # Update prompt to use num_panels and request image suggestions
     prompt = f"""Based on the following text, generate content for a {num_panels}-panel Facebook/Instagram carousel ad. 
@@ -153,95 +277,87 @@ Each object in the list must have three keys:
 Ensure the panels tell a coherent story or flow logically based on the input text.
 
 Input Text:
-{text[:max_tokens*2]} 
+{_prompt_text(text, max_tokens*2)} 
 """
 
-    headers = {
-        'Authorization': f'Bearer {api_key}',
-        'Content-Type': 'application/json'
-    }
-    payload = {
-        "model": model_name,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": max_tokens, 
-        "temperature": temperature,
-        "top_p": top_p
-    }
-    api_endpoint = f"{base_url.rstrip('/')}/chat/completions"
+    request_args = _chat_request('carousel', prompt, max_tokens,
+                                 current_app.config.get('MODEL_TEMPERATURE', 0.7), timeout=180)
+    current_app.logger.info(f"Preparing carousel request for {num_panels} panels")
+    return request_args
 
+def _carousel_result(response_data: Dict[str, Any], num_panels: int) -> Dict[str, Any]:
+    current_app.logger.debug("Raw AI carousel response: %s", response_data)
+    ai_content_raw = _response_content(response_data)
+    if ai_content_raw is None:
+        current_app.logger.error(f"AI carousel response format unexpected: {response_data}")
+        return _carousel_error("Unexpected AI response format.")
+    current_app.logger.info(f"AI carousel content generated ({len(ai_content_raw)} chars).")
+    
     try:
-        current_app.logger.info(f"Sending carousel request for {num_panels} panels to AI model: {model_name}")
-        response = requests.post(api_endpoint, headers=headers, json=payload, timeout=180) # Increased timeout slightly
-        response.raise_for_status()
-        response_data = response.json()
-        current_app.logger.debug(f"Raw AI carousel response: {response_data}")
-
-        if response_data.get('choices') and len(response_data['choices']) > 0:
-            ai_content_raw = response_data['choices'][0].get('message', {}).get('content', '')
-            current_app.logger.info(f"AI carousel content generated ({len(ai_content_raw)} chars).")
+        parsed_content = _parse_json_content(ai_content_raw)
+        
+        # Validate structure and panel content
+        if ('carousel_panels' in parsed_content and 
+            isinstance(parsed_content['carousel_panels'], list) and
+            all('title' in p and 'text' in p and 'image_suggestion' in p for p in parsed_content['carousel_panels'])):
             
-            try:
-                ai_content_clean = re.sub(r'^```json\n?|```$', '', ai_content_raw.strip())
-                parsed_content = json.loads(ai_content_clean)
-                
-                # Validate structure and panel content
-                if ('carousel_panels' in parsed_content and 
-                    isinstance(parsed_content['carousel_panels'], list) and
-                    all('title' in p and 'text' in p and 'image_suggestion' in p for p in parsed_content['carousel_panels'])):
-                    
-                    # Limit the number of panels to the requested number
-                    limited_panels = parsed_content['carousel_panels'][:num_panels]
-                    current_app.logger.info(f"Successfully parsed {len(limited_panels)} structured carousel panels from AI response.")
-                    return {'carousel_panels': limited_panels}
-                else:
-                    raise ValueError("Parsed JSON missing 'carousel_panels' key, is not a list, or panels missing required keys (title, text, image_suggestion).")
-
-            except (json.JSONDecodeError, ValueError) as json_err:
-                current_app.logger.error(f"Failed to parse JSON from AI carousel response: {json_err}\nRaw content: {ai_content_raw}")
-                return {'carousel_panels': [{"title": "Error", "text": f"Could not parse AI response: {ai_content_raw}", "image_suggestion":"Error"}]}
-        else:
-             current_app.logger.error(f"AI carousel response format unexpected: {response_data}")
-             return {'carousel_panels': [{"title": "Error", "text": "Unexpected AI response format.", "image_suggestion":"Error"}]}
-
-    except requests.exceptions.Timeout:
-        current_app.logger.error(f"AI carousel request timed out.")
-        return {'carousel_panels': [{"title": "Error", "text": "AI request timed out.", "image_suggestion":"Error"}]}
-    except requests.exceptions.RequestException as e:
-        current_app.logger.error(f"AI API carousel request failed: {e}")
-        return {'carousel_panels': [{"title": "Error", "text": f"AI API request failed: {e}", "image_suggestion":"Error"}]}
-    except Exception as e:
-        current_app.logger.error(f"Unexpected error in process_text_for_carousel: {e}", exc_info=True)
-        return {'carousel_panels': [{"title": "Error", "text": "Unexpected processing error.", "image_suggestion":"Error"}]}
+            # Limit the number of panels to the requested number
+            limited_panels = parsed_content['carousel_panels'][:num_panels]
+            current_app.logger.info(f"Successfully parsed {len(limited_panels)} structured carousel panels from AI response.")
+            return {'carousel_panels': limited_panels}
+        raise ValueError("Parsed JSON missing 'carousel_panels' key, is not a list, or panels missing required keys (title, text, image_suggestion).")
 
-# --- New Function for Comic Script Generation --- 
+    except (json.JSONDecodeError, ValueError) as json_err:
+        current_app.logger.error(f"Failed to parse JSON from AI carousel response: {json_err}\nRaw content: {ai_content_raw}")
+        return _carousel_error(f"Could not parse AI response: {ai_content_raw}")
 
-def generate_comic_script(text: str, num_comic_panels: int = 4) -> Dict[str, Any]:
+def _carousel_panels(num_panels: int) -> int:
+    # Validate num_panels input
+    if not 4 <= num_panels <= 12:
+        current_app.logger.warning(f"Invalid num_panels requested, defaulting to 8.")
+        return 8 # Default to 8 if invalid
+    return num_panels
+
+def process_text_for_carousel(text: str, num_panels: int = 8) -> Dict[str, Any]:
     """
-    Generate a comic script from text using the AI model (Groq).
-    
-    Args:
-        text: The input text/summary.
-        num_comic_panels: The desired number of comic panels (e.g., 4).
-        
-    Returns:
-        Dictionary containing the generated script, e.g., 
-        {'comic_script': [{'panel': 1, 'description': '...', 'dialogue': '...'}, ...]}
-        or an error structure.
+    Process text using the AI model to generate content for a carousel.
+    Args: 
+        text: The input summary/text content.
+        num_panels: The desired number of carousel panels (default 8).
+    Returns: 
+        Dictionary containing carousel panels, e.g., {'carousel_panels': [...]}
     """
-    if not 2 <= num_comic_panels <= 6: # Limit comic panels for brevity/cost
-        num_comic_panels = 4 
-        current_app.logger.warning(f"Invalid num_comic_panels requested, defaulting to 4.")
-        
-    api_key = current_app.config.get('AISENSUM_API_KEY') # Using the same key as others for Groq
-    base_url = current_app.config.get('MODEL_BASE_URL')
-    model_name = current_app.config.get('MODEL_NAME')
-    max_tokens = current_app.config.get('MODEL_MAX_TOKENS', 1500) # Might need fewer tokens than content gen
-    temperature = current_app.config.get('MODEL_TEMPERATURE', 0.6)
-    top_p = current_app.config.get('MODEL_TOP_P', 1.0)
+    num_panels = _carousel_panels(num_panels)
+    request_args = _carousel_request(text, num_panels)
+    if request_args is None:
+        return _carousel_error("Model configuration missing.")
+    try:
+        return _carousel_result(_post_chat_completion(**request_args), num_panels)
+    except Exception as e:
+        return _carousel_error(_request_failure(e, 'AI carousel'))
 
-    if not all([api_key, base_url, model_name]):
+async def process_text_for_carousel_async(text: str, num_panels: int = 8) -> Dict[str, Any]:
+    """Async variant of process_text_for_carousel"""
+    num_panels = _carousel_panels(num_panels)
+    request_args = _carousel_request(text, num_panels)
+    if request_args is None:
+        return _carousel_error("Model configuration missing.")
+    try:
+        return _carousel_result(await _post_chat_completion_async(**request_args), num_panels)
+    except Exception as e:
+        return _carousel_error(_request_failure(e, 'AI carousel'))
+
+# --- Comic script ---
+
+def _comic_script_error(message: str) -> Dict[str, Any]:
+    return {'comic_script': [{"panel": 1, "description": f"Error: {message}", "dialogue": ""}]}
+
+def _comic_script_request(text: str, num_comic_panels: int) -> Optional[Dict[str, Any]]:
+    """Chat request for generate_comic_script, None if the model configuration is missing"""
+    if not _model_configured():
         current_app.logger.error("AI Model configuration missing for comic script generation.")
-        return {'comic_script': [{"panel": 1, "description": "Error: Model configuration missing.", "dialogue": ""}]}
+        return None
+    max_tokens = current_app.config.get('MODEL_MAX_TOKENS', 1500) # Might need fewer tokens than content gen
 
     # Define the desired JSON structure for the script
     json_format_description = f"""A JSON object with a single key: 'comic_script'.
@@ -257,68 +373,175 @@ def generate_comic_script(text: str, num_comic_panels: int = 4) -> Dict[str, Any
  Ensure the descriptions are vivid and suitable for an AI image generator.
 
  Input Text:
- {text[:max_tokens*2]} 
+ {_prompt_text(text, max_tokens*2)} 
  """
 
-    headers = {
-        'Authorization': f'Bearer {api_key}',
-        'Content-Type': 'application/json'
-    }
-    payload = {
-        "model": model_name,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": max_tokens, 
-        "temperature": temperature,
-        "top_p": top_p
-    }
-    api_endpoint = f"{base_url.rstrip('/')}/chat/completions"
+    request_args = _chat_request('comic_script', prompt, max_tokens,
+                                 current_app.config.get('MODEL_TEMPERATURE', 0.6), timeout=120)
+    current_app.logger.info(f"Preparing comic script request for {num_comic_panels} panels")
+    return request_args
 
+def _comic_script_result(response_data: Dict[str, Any], num_comic_panels: int) -> Dict[str, Any]:
+    current_app.logger.debug("Raw AI comic script response: %s", response_data)
+    ai_content_raw = _response_content(response_data)
+    if ai_content_raw is None:
+        current_app.logger.error(f"AI comic script response format unexpected: {response_data}")
+        return _comic_script_error("Unexpected AI script response format.")
+    current_app.logger.info(f"AI comic script generated ({len(ai_content_raw)} chars).")
+    
     try:
-        current_app.logger.info(f"Sending comic script request for {num_comic_panels} panels to AI model: {model_name}")
-        response = requests.post(api_endpoint, headers=headers, json=payload, timeout=120)
-        response.raise_for_status()
-        response_data = response.json()
-        current_app.logger.debug(f"Raw AI comic script response: {response_data}")
-
-        if response_data.get('choices') and len(response_data['choices']) > 0:
-            ai_content_raw = response_data['choices'][0].get('message', {}).get('content', '')
-            current_app.logger.info(f"AI comic script generated ({len(ai_content_raw)} chars).")
+        parsed_content = _parse_json_content(ai_content_raw)
+        
+        # Validate structure and panel content
+        if ('comic_script' in parsed_content and 
+            isinstance(parsed_content['comic_script'], list) and
+            len(parsed_content['comic_script']) > 0 and # Ensure list is not empty
+            all('panel' in p and 'description' in p and 'dialogue' in p for p in parsed_content['comic_script'])):
             
-            try:
-                ai_content_clean = re.sub(r'^```json\n?|```$', '', ai_content_raw.strip())
-                parsed_content = json.loads(ai_content_clean)
-                
-                # Validate structure and panel content
-                if ('comic_script' in parsed_content and 
-                    isinstance(parsed_content['comic_script'], list) and
-                    len(parsed_content['comic_script']) > 0 and # Ensure list is not empty
-                    all('panel' in p and 'description' in p and 'dialogue' in p for p in parsed_content['comic_script'])):
-                    
-                    # Limit the number of panels just in case AI gave more
-                    limited_script = parsed_content['comic_script'][:num_comic_panels]
-                    current_app.logger.info(f"Successfully parsed {len(limited_script)} structured comic script panels.")
-                    return {'comic_script': limited_script}
-                else:
-                    raise ValueError("Parsed JSON missing 'comic_script' key, is not a list, list is empty, or panels missing required keys (panel, description, dialogue).")
-
-            except (json.JSONDecodeError, ValueError) as json_err:
-                current_app.logger.error(f"Failed to parse JSON from AI comic script response: {json_err}\nRaw content: {ai_content_raw}")
-                return {'comic_script': [{"panel": 1, "description": f"Error: Could not parse AI script response: {ai_content_raw}", "dialogue": ""}]}
-        else:
-             current_app.logger.error(f"AI comic script response format unexpected: {response_data}")
-             return {'comic_script': [{"panel": 1, "description": "Error: Unexpected AI script response format.", "dialogue": ""}]}
-
-    except requests.exceptions.Timeout:
-        current_app.logger.error(f"AI comic script request timed out.")
-        return {'comic_script': [{"panel": 1, "description": "Error: AI script request timed out.", "dialogue": ""}]}
-    except requests.exceptions.RequestException as e:
-        current_app.logger.error(f"AI API comic script request failed: {e}")
-        return {'comic_script': [{"panel": 1, "description": f"Error: AI API script request failed: {e}", "dialogue": ""}]}
+            # Limit the number of panels just in case AI gave more
+            limited_script = parsed_content['comic_script'][:num_comic_panels]
+            current_app.logger.info(f"Successfully parsed {len(limited_script)} structured comic script panels.")
+            return {'comic_script': limited_script}
+        raise ValueError("Parsed JSON missing 'comic_script' key, is not a list, list is empty, or panels missing required keys (panel, description, dialogue).")
+
+    except (json.JSONDecodeError, ValueError) as json_err:
+        current_app.logger.error(f"Failed to parse JSON from AI comic script response: {json_err}\nRaw content: {ai_content_raw}")
+        return _comic_script_error(f"Could not parse AI script response: {ai_content_raw}")
+
+def _comic_script_panels(num_comic_panels: int) -> int:
+    if not 2 <= num_comic_panels <= 6: # Limit comic panels for brevity/cost
+        current_app.logger.warning(f"Invalid num_comic_panels requested, defaulting to 4.")
+        return 4
+    return num_comic_panels
+
+def generate_comic_script(text: str, num_comic_panels: int = 4) -> Dict[str, Any]:
+    """
+    Generate a comic script from text using the AI model (Groq).
+    
+    Args:
+        text: The input text/summary.
+        num_comic_panels: The desired number of comic panels (e.g., 4).
+        
+    Returns:
+        Dictionary containing the generated script, e.g., 
+        {'comic_script': [{'panel': 1, 'description': '...', 'dialogue': '...'}, ...]}
+        or an error structure.
+    """
+    num_comic_panels = _comic_script_panels(num_comic_panels)
+    request_args = _comic_script_request(text, num_comic_panels)
+    if request_args is None:
+        return _comic_script_error("Model configuration missing.")
+    try:
+        return _comic_script_result(_post_chat_completion(**request_args), num_comic_panels)
+    except Exception as e:
+        return _comic_script_error(_request_failure(e, 'AI comic script'))
+
+async def generate_comic_script_async(text: str, num_comic_panels: int = 4) -> Dict[str, Any]:
+    """Async variant of generate_comic_script"""
+    num_comic_panels = _comic_script_panels(num_comic_panels)
+    request_args = _comic_script_request(text, num_comic_panels)
+    if request_args is None:
+        return _comic_script_error("Model configuration missing.")
+    try:
+        return _comic_script_result(await _post_chat_completion_async(**request_args), num_comic_panels)
+    except Exception as e:
+        return _comic_script_error(_request_failure(e, 'AI comic script'))
+
+# --- Batches ---
+
+def _batch_error(message: str) -> Dict[str, Any]:
+    return {'topics': [f"Error: {message}"], 'linkedin_posts': [], 'instagram_posts': [], 'comic_scripts': []}
+
+def _clip_words(text: Any, max_words: Optional[int]) -> Any:
+    if not isinstance(text, str) or not max_words:
+        return text
+    words = text.split()
+    return text if len(words) <= max_words else ' '.join(words[:max_words]) + '...'
+
+def batch_prompt(documents: List[str], kind: str, quotas: Dict[str, int]) -> str:
+    """
+    Prompt for one request of a batch.
+    
+    Args:
+        documents: Extracted texts packed into this request.
+        kind: 'emails' or 'documents', how the texts are introduced.
+        quotas: Items to ask for: 'topics', 'linkedin_posts',
+            'instagram_posts', 'comic_scripts', plus the word limits
+            'linkedin_length' and 'instagram_length'.
+    """
+    keys = [
+        f"'topics': A list of up to {quotas['topics']} relevant string topics across all texts.",
+        f"'linkedin_posts': A list of {quotas['linkedin_posts']} JSON objects, each with 'title' (string), "
+        f"'content' (string, at most {quotas['linkedin_length']} words), and 'hashtags' (list of strings).",
+        f"'instagram_posts': A list of {quotas['instagram_posts']} JSON objects, each with 'caption' "
+        f"(string, at most {quotas['instagram_length']} words) and 'image_suggestion' (string)."
+    ]
+    if quotas.get('comic_scripts'):
+        keys.append(f"'comic_scripts': A list of {quotas['comic_scripts']} JSON objects, each with 'title' (string) "
+                    f"and 'panels' (a list of 4 objects with 'panel' (integer), 'description' (string, max 30 words) "
+                    f"and 'dialogue' (string, max 20 words)).")
+    numbered = '\n'.join(f"{i}. {key}" for i, key in enumerate(keys, 1))
+    texts = '\n\n---\n\n'.join(documents)
+    return f"""Analyze the following {len(documents)} {kind} from one batch and generate social media content suggestions that cover the batch as a whole.
+Format the output strictly as a JSON object with {len(keys)} keys:
+{numbered}
+
+{kind.capitalize()}:
+{texts}"""
+
+def _batch_result(response_data: Dict[str, Any], quotas: Dict[str, int]) -> Dict[str, Any]:
+    current_app.logger.debug("Raw AI batch response: %s", response_data)
+    ai_content_raw = _response_content(response_data)
+    if ai_content_raw is None:
+        current_app.logger.error(f"AI batch response format unexpected: {response_data}")
+        return _batch_error("Unexpected AI response format.")
+    try:
+        parsed_content = _parse_json_content(ai_content_raw)
+        if not all(k in parsed_content for k in ['topics', 'linkedin_posts', 'instagram_posts']):
+            raise ValueError("Parsed JSON missing required keys.")
+    except (json.JSONDecodeError, ValueError) as json_err:
+        current_app.logger.error(f"Failed to parse JSON from AI batch response: {json_err}\nRaw content: {ai_content_raw}")
+        return _batch_error("Could not parse AI response.")
+    
+    # Enforce the CONTENT_LIMITS quotas and lengths whatever the model returned
+    linkedin_posts = [dict(post, content=_clip_words(post.get('content'), quotas['linkedin_length']))
+                      for post in parsed_content.get('linkedin_posts', [])[:quotas['linkedin_posts']]]
+    instagram_posts = [dict(post, caption=_clip_words(post.get('caption'), quotas['instagram_length']))
+                       for post in parsed_content.get('instagram_posts', [])[:quotas['instagram_posts']]]
+    return {
+        'topics': parsed_content.get('topics', [])[:quotas['topics']],
+        'linkedin_posts': linkedin_posts,
+        'instagram_posts': instagram_posts,
+        'comic_scripts': (parsed_content.get('comic_scripts') or [])[:quotas.get('comic_scripts', 0)]
+    }
+
+def process_batch_content(documents: List[str], kind: str, quotas: Dict[str, int],
+                          budget_chars: int) -> Dict[str, Any]:
+    """
+    Generate content for a pack of batch documents in one model request.
+    
+    Sent at 'batch' priority, so interactive requests get rate limit
+    tokens first. A single document longer than budget_chars is reduced
+    by the summarizer like any other prompt input.
+    
+    Returns:
+        Dictionary with 'topics', 'linkedin_posts', 'instagram_posts' and
+        'comic_scripts', trimmed to the quotas, or an error structure.
+    """
+    if not _model_configured():
+        current_app.logger.error("AI Model configuration missing for batch generation.")
+        return _batch_error("Model configuration missing.")
+    if len(documents) == 1:
+        documents = [_prompt_text(documents[0], budget_chars)]
+    max_tokens = current_app.config.get('MODEL_MAX_TOKENS', 2000)
+    request_args = _chat_request('batch', batch_prompt(documents, kind, quotas), max_tokens,
+                                 current_app.config.get('MODEL_TEMPERATURE', 0.7), timeout=180)
+    try:
+        return _batch_result(_post_chat_completion(**request_args, priority='batch'), quotas)
     except Exception as e:
-        current_app.logger.error(f"Unexpected error in generate_comic_script: {e}", exc_info=True)
-        return {'comic_script': [{"panel": 1, "description": "Error: Unexpected script processing error.", "dialogue": ""}]}
+        return _batch_error(_request_failure(e, 'AI batch'))
 
 # Keep the old simple functions commented out or remove if no longer needed
 # def extract_topics(text: str) -> List[str]: ...
 # def generate_linkedin_posts(text: str, topics: List[str]) -> List[Dict[str, Any]]: ...
-# def generate_instagram_captions(text: str, topics: List[str]) -> List[Dict[str, Any]]: ... 
\ No newline at end of file
+# def generate_instagram_captions(text: str, topics: List[str]) -> List[Dict[str, Any]]: ...
\ No newline at end of file
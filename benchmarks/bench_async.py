@@ -0,0 +1,136 @@
+"""
+Side-by-side throughput of the sync and async generation routes.
+
+Starts gunicorn (gunicorn.conf.py) against the mock LLM and Ideogram APIs
+and drives each route pair with the same client concurrency:
+
+    combined  /content/process_combined/<file>  vs  /content/async/process_combined/<file>
+    comics    /comics/create                    vs  /comics/async/create
+    article   /content/generate-article         vs  /content/async/generate-article
+
+With few threads per worker the sync routes queue behind the threads
+that are blocked on API waits. The async routes overlap the independent
+calls of each request (carousel + script, every panel), so each request
+holds its thread for less time.
+
+Usage:
+    python -m benchmarks.bench_async [--routes combined,comics,article]
+        [--workers 1] [--threads 4] [--concurrency 16] [--requests 48]
+        [--llm-latency 0.5] [--image-latency 0.5] [--json async.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+from .bench_load import SAMPLE_TEXT
+from .bench_script_parser import generate_script
+from .bench_workers import REPO_ROOT, UPLOAD_DIR, drive, free_port, server_env, start_server, stop_server
+from .mock_servers import MockSettings, start_mock_servers
+
+ROUTES = ('combined', 'comics', 'article')
+# Route outputs written under app/static, removed after the run
+STATIC_OUTPUT_DIRS = [os.path.join(REPO_ROOT, 'app', 'static', sub) for sub in ('placeholders', 'results')]
+
+
+def route_senders(base_url, filename, comic_script):
+    """{route: (sync send, async send)}; each send takes a session and returns True on success"""
+    def combined(prefix):
+        url = f"{base_url}/content{prefix}/process_combined/{filename}"
+        return lambda session: session.get(url, timeout=300, allow_redirects=False).status_code == 200
+
+    def comics(prefix):
+        url = f"{base_url}/comics{prefix}/create"
+
+        def send(session):
+            response = session.post(url, data={'script': comic_script, 'title': 'Bench'},
+                                    timeout=300, allow_redirects=False)
+            return response.status_code == 302 and 'preview' in response.headers.get('Location', '')
+        return send
+
+    def article(prefix):
+        url = f"{base_url}/content{prefix}/generate-article"
+        return lambda session: session.post(url, json={'topic': 'quarterly review'}, timeout=300).status_code == 200
+
+    return {
+        'combined': (combined(''), combined('/async')),
+        'comics': (comics(''), comics('/async')),
+        'article': (article(''), article('/async'))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--routes', default=','.join(ROUTES))
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=48, help='requests per route')
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--image-latency', type=float, default=0.5)
+    parser.add_argument('--comic-panels', type=int, default=4)
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.routes.split(',') if name.strip()]
+    unknown = set(names) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    llm_server, ideogram_server = start_mock_servers(
+        MockSettings(args.llm_latency, args.llm_latency * 0.2),
+        MockSettings(args.image_latency, args.image_latency * 0.2, payload_kb=100)
+    )
+    work_dir = tempfile.mkdtemp(prefix='aisensum-async-')
+    env = server_env(llm_server, ideogram_server, work_dir)
+    # generate-article only makes the article call; its comic step is not
+    # part of this comparison
+    env['IDEOGRAM_API_KEY'] = ''
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    filename = f'bench_async_{os.getpid()}.txt'
+    upload_path = os.path.join(UPLOAD_DIR, filename)
+    with open(upload_path, 'w') as f:
+        f.write(SAMPLE_TEXT)
+    existing = {d: set(os.listdir(d)) if os.path.isdir(d) else set() for d in STATIC_OUTPUT_DIRS}
+
+    results = []
+    port = free_port()
+    process = start_server(args.workers, args.threads, env, port)
+    try:
+        senders = route_senders(f'http://127.0.0.1:{port}', filename, generate_script(args.comic_panels))
+        print(f"workers={args.workers} threads={args.threads} clients={args.concurrency}")
+        print(f"{'route':<10}{'mode':<7}{'reqs':>6}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>9}{'speedup':>9}")
+        for name in names:
+            baseline = None
+            for mode, send in zip(('sync', 'async'), senders[name]):
+                drive(send, min(args.concurrency, args.requests), args.concurrency)  # warm-up
+                result = drive(send, args.requests, args.concurrency)
+                result.update(route=name, mode=mode)
+                baseline = baseline or result
+                result['speedup'] = result['throughput_rps'] / baseline['throughput_rps'] \
+                    if baseline['throughput_rps'] else 0.0
+                results.append(result)
+                print(f"{name:<10}{mode:<7}{result['requests']:>6}{result['failures']:>6}"
+                      f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+                      f"{result['throughput_rps']:>9.2f}{result['speedup']:>8.2f}x")
+    finally:
+        stop_server(process)
+        llm_server.stop()
+        ideogram_server.stop()
+        os.remove(upload_path)
+        for directory, before in existing.items():
+            if os.path.isdir(directory):
+                for created in set(os.listdir(directory)) - before:
+                    os.remove(os.path.join(directory, created))
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"mock LLM: {llm_server.counters}  mock Ideogram: {ideogram_server.counters}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Throughput of multi-file batches (batch_processor.run_batches).
+
+Generates a directory of PDFs, text files and .eml messages, then runs the
+batch against the mock LLM with serial or parallel extraction and with a
+small or the configured prompt token budget. A bigger budget packs more
+texts into each model request, so the model_requests column should drop
+and files/s rise; parallel extraction shortens the extract column.
+
+Usage:
+    python -m benchmarks.bench_batch [--pdfs 8] [--pages 20] [--texts 8]
+        [--emails 8] [--llm-latency 0.5] [--workers 4] [--small-budget 1500]
+        [--json batch.json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+
+from app import create_app
+from app.config import Config
+from app.utils.batch_processor import RESULTS_DIR_NAME, run_batches
+
+from .bench_load import make_config
+from .fixtures import make_eml, make_pdf, paragraph
+from .mock_servers import MockSettings, start_mock_servers
+
+
+def make_batch_dir(directory, pdfs, pages, texts, emails):
+    rng = random.Random(0)
+    for i in range(pdfs):
+        make_pdf(os.path.join(directory, f"report_{i}.pdf"), pages=pages, seed=i)
+    for i in range(texts):
+        with open(os.path.join(directory, f"notes_{i}.txt"), 'w') as f:
+            f.write('\n\n'.join(paragraph(rng) for _ in range(rng.randint(2, 12))))
+    for i in range(emails):
+        make_eml(os.path.join(directory, f"mail_{i}.eml"), parts=8, attachment_kb=16, seed=i)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pdfs', type=int, default=8)
+    parser.add_argument('--pages', type=int, default=20, help='pages per PDF')
+    parser.add_argument('--texts', type=int, default=8)
+    parser.add_argument('--emails', type=int, default=8)
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--workers', type=int, default=4, help='extraction processes in the parallel variants')
+    parser.add_argument('--small-budget', type=int, default=1500, help='max_prompt_tokens of the small variants')
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    llm_server, ideogram_server = start_mock_servers(MockSettings(args.llm_latency, args.llm_latency * 0.2),
+                                                     MockSettings())
+    work_dir = tempfile.mkdtemp(prefix='aisensum-batch-')
+    batch_dir = os.path.join(work_dir, 'files')
+    os.makedirs(batch_dir)
+    make_batch_dir(batch_dir, args.pdfs, args.pages, args.texts, args.emails)
+
+    base = make_config(llm_server.url, ideogram_server.url, work_dir, rate_limited=False)
+    default_budget = Config.BATCH_PROCESSING['max_prompt_tokens']
+    variants = [('serial, small budget', 1, args.small_budget),
+                ('parallel, small budget', args.workers, args.small_budget),
+                ('parallel, default budget', args.workers, default_budget)]
+    rows = []
+    try:
+        print(f"{'variant':<26}{'batch':<13}{'files':>6}{'texts':>6}{'reqs':>6}"
+              f"{'extract s':>11}{'generate s':>12}{'files/s':>9}")
+        for name, workers, budget in variants:
+            class BatchConfig(base):
+                BATCH_PROCESSING = dict(Config.BATCH_PROCESSING, extract_workers=workers, max_prompt_tokens=budget)
+            app = create_app(BatchConfig)
+            app.logger.setLevel('WARNING')
+            with app.app_context():
+                results = run_batches([batch_dir], 'bench')
+                results_dir = os.path.join(app.static_folder, RESULTS_DIR_NAME)
+            for result in results:
+                # Results land in the app's history folder; keep it clean
+                os.remove(os.path.join(results_dir, result['result_file']))
+                throughput = result['throughput']
+                rows.append({'variant': name, 'batch_type': result['batch_type'], 'errors': result['errors'],
+                             **throughput})
+                print(f"{name:<26}{result['batch_type']:<13}{throughput['files']:>6}{throughput['documents']:>6}"
+                      f"{throughput['model_requests']:>6}{throughput['extract_seconds']:>11.2f}"
+                      f"{throughput['generate_seconds']:>12.2f}{throughput['files_per_second']:>9.2f}")
+    finally:
+        llm_server.stop()
+        ideogram_server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"mock llm: {llm_server.counters}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Tail latency of the text pipeline with and without a hedge endpoint.
+
+Runs process_text_content against a mock LLM whose responses are
+occasionally very slow (--tail-share of them take --tail-latency
+seconds), first with the primary endpoint only, then with a second mock
+configured as the 'fallback' hedge endpoint in MODEL_ROUTES. Hedged
+requests should cut p95/p99 to roughly the hedge delay plus one normal
+response, at the cost of a few extra model calls.
+
+Usage:
+    python -m benchmarks.bench_hedging [--requests 200] [--concurrency 8]
+        [--llm-latency 0.2] [--tail-share 0.05] [--tail-latency 3.0]
+        [--hedge-percentile 95] [--json hedging.json]
+"""
+import argparse
+import json
+import shutil
+import tempfile
+
+from app import create_app
+from app.config import Config
+from app.utils import model_router
+
+from .bench_load import bench, make_config
+from .mock_servers import LLMHandler, MockServer, MockSettings, start_mock_servers
+
+
+def hedged_config(base, fallback_url, percentile, min_samples):
+    class HedgedConfig(base):
+        MODEL_ENDPOINTS = dict(Config.MODEL_ENDPOINTS, fallback={
+            'base_url': f"{fallback_url}/v1", 'model': 'mock-fallback', 'api_key': None
+        })
+        MODEL_ROUTES = {task: {'endpoint': 'default', 'hedge': 'fallback'}
+                        for task in ('topics', 'carousel', 'comic_script')}
+        MODEL_HEDGING = dict(Config.MODEL_HEDGING, enabled=True, percentile=percentile,
+                             min_samples=min_samples, initial_delay=1.0, min_delay=0.05)
+    return HedgedConfig
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--tail-share', type=float, default=0.05, help='fraction of slow responses')
+    parser.add_argument('--tail-latency', type=float, default=3.0, help='seconds per slow response')
+    parser.add_argument('--hedge-percentile', type=float, default=95)
+    parser.add_argument('--min-samples', type=int, default=20, help='latency samples before the percentile is used')
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    slow = MockSettings(args.llm_latency, args.llm_latency * 0.2, tail_share=args.tail_share,
+                        tail_latency=args.tail_latency)
+    llm_server, ideogram_server = start_mock_servers(slow, MockSettings())
+    fallback_server = MockServer(LLMHandler, slow, seed=3).start()
+    work_dir = tempfile.mkdtemp(prefix='aisensum-hedging-')
+
+    base = make_config(llm_server.url, ideogram_server.url, work_dir, rate_limited=False)
+    variants = [('primary only', base),
+                ('hedged', hedged_config(base, fallback_server.url, args.hedge_percentile, args.min_samples))]
+    results = []
+    try:
+        print(f"{'variant':<14}{'reqs':>6}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'req/s':>9}{'calls':>7}")
+        for name, config in variants:
+            model_router._reset_after_fork()
+            app = create_app(config)
+            app.logger.setLevel('WARNING')
+            before = llm_server.counters.get('requests', 0) + fallback_server.counters.get('requests', 0)
+            result = bench(app, 'topics', args.requests, args.concurrency, '')
+            result['model_calls'] = (llm_server.counters.get('requests', 0)
+                                     + fallback_server.counters.get('requests', 0) - before)
+            result['variant'] = name
+            results.append(result)
+            print(f"{name:<14}{result['requests']:>6}{result['failures']:>6}"
+                  f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                  f"{result['throughput_rps']:>9.2f}{result['model_calls']:>7}")
+    finally:
+        llm_server.stop()
+        ideogram_server.stop()
+        fallback_server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"mock primary: {llm_server.counters}  mock fallback: {fallback_server.counters}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Concurrent load benchmark against local mock LLM and Ideogram APIs.
+
+Drives the text pipeline functions and the comics routes with a thread
+pool, with MODEL_BASE_URL and IDEOGRAM_BASE_URL pointed at the servers in
+benchmarks/mock_servers.py, and reports latency percentiles, throughput
+and peak RSS per scenario.
+
+Usage:
+    python -m benchmarks.bench_load [--scenarios topics,carousel,...]
+        [--concurrency 8] [--requests 40] [--llm-latency 0.2]
+        [--image-latency 0.3] [--error-rate 0.0] [--single-flight]
+        [--json results.json]
+
+Every request of a scenario sends the same payload, so single-flight
+coalescing is off unless --single-flight is given; with it on, compare
+the mock call counters against the number of requests.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+from app.config import Config
+from app.utils.comic_generator import generate_comic_panels
+from app.utils.text_processor import process_text_content, process_text_for_carousel, generate_comic_script
+
+from .bench_script_parser import generate_script
+from .mock_servers import MockSettings, start_mock_servers
+
+SCENARIOS = ('topics', 'carousel', 'comic_script', 'comic_panels', 'comic_routes')
+
+SAMPLE_TEXT = (
+    "Quarterly review: the analytics team shipped the new forecasting model, cut report "
+    "latency in half and onboarded three enterprise customers. Churn dropped two points "
+    "after the pricing change, while support tickets about exports doubled. Next quarter "
+    "the roadmap focuses on self-serve dashboards and a pilot with the retail partner. "
+) * 40
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def make_config(llm_url, ideogram_url, work_dir, rate_limited, single_flight=False):
+    class BenchConfig(Config):
+        TESTING = True
+        AISENSUM_API_KEY = 'bench-key'
+        MODEL_BASE_URL = f"{llm_url}/v1"
+        MODEL_NAME = 'mock-model'
+        IDEOGRAM_BASE_URL = ideogram_url
+        COMIC_SETTINGS = dict(Config.COMIC_SETTINGS, api_key='bench-ideogram-key')
+        COMIC_STORE_DIR = os.path.join(work_dir, 'comics')
+        RATE_LIMIT_DB = os.path.join(work_dir, 'rate_limits.db')
+        # The mocks have no quota; only keep the limiter when asked to
+        # measure its overhead or queueing behaviour
+        RATE_LIMITS = Config.RATE_LIMITS if rate_limited else {}
+        SINGLE_FLIGHT_ENABLED = single_flight
+        SINGLE_FLIGHT_DIR = os.path.join(work_dir, 'flights')
+    return BenchConfig
+
+
+def _text_ok(result, error_key):
+    values = result.get(error_key) or []
+    return not any(isinstance(v, str) and v.startswith('Error') for v in values)
+
+
+def run_scenario(app, name, panels_script):
+    """Run one unit of work for a scenario; returns True on success"""
+    if name == 'comic_routes':
+        client = app.test_client()
+        response = client.post('/comics/create', data={'script': panels_script, 'title': 'Bench'})
+        if response.status_code != 302 or 'preview' not in response.headers.get('Location', ''):
+            return False
+        if client.get('/comics/preview').status_code != 200:
+            return False
+        if client.post('/comics/generate_panel', json={'panel': 0}).status_code != 200:
+            return False
+        return client.get('/comics/download/pdf').status_code == 200
+
+    with app.test_request_context():
+        if name == 'topics':
+            return _text_ok(process_text_content(SAMPLE_TEXT), 'topics')
+        if name == 'carousel':
+            result = process_text_for_carousel(SAMPLE_TEXT, num_panels=8)
+            return bool(result.get('carousel_panels')) and not result.get('error')
+        if name == 'comic_script':
+            result = generate_comic_script(SAMPLE_TEXT, num_comic_panels=4)
+            return bool(result.get('comic_script')) and not result.get('error')
+        if name == 'comic_panels':
+            script = [{'panel': i + 1, 'description': f'Analysts at a whiteboard, scene {i + 1}',
+                       'dialogue': 'ALICE: Look at this'} for i in range(4)]
+            panels = generate_comic_panels(script, app.config['COMIC_SETTINGS']['api_key'])
+            return all(panel.get('image_url') for panel in panels)
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def bench(app, name, requests_count, concurrency, panels_script):
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            ok = run_scenario(app, name, panels_script)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                failures += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_count)))
+    wall = time.perf_counter() - started
+
+    return {
+        'scenario': name,
+        'requests': requests_count,
+        'concurrency': concurrency,
+        'failures': failures,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'throughput_rps': requests_count / wall if wall else 0.0,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=40, help='requests per scenario')
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--image-latency', type=float, default=0.3)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--llm-payload-kb', type=int, default=4)
+    parser.add_argument('--image-payload-kb', type=int, default=200)
+    parser.add_argument('--comic-panels', type=int, default=4, help='panels per comic in comic_routes')
+    parser.add_argument('--rate-limited', action='store_true', help='keep the configured RATE_LIMITS')
+    parser.add_argument('--single-flight', action='store_true', help='coalesce identical concurrent API calls')
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    llm_server, ideogram_server = start_mock_servers(
+        MockSettings(args.llm_latency, args.llm_latency * 0.2, args.error_rate, payload_kb=args.llm_payload_kb),
+        MockSettings(args.image_latency, args.image_latency * 0.2, args.error_rate, payload_kb=args.image_payload_kb)
+    )
+    work_dir = tempfile.mkdtemp(prefix='aisensum-bench-')
+    app = create_app(make_config(llm_server.url, ideogram_server.url, work_dir, args.rate_limited,
+                                 args.single_flight))
+    app.logger.setLevel('WARNING')
+
+    # The comics routes write panels and downloads under app/static;
+    # remember what was there so only files created by the run are removed
+    static_dirs = [os.path.join(app.root_path, 'static', sub) for sub in ('placeholders', 'temp')]
+    existing = {d: set(os.listdir(d)) if os.path.isdir(d) else set() for d in static_dirs}
+    panels_script = generate_script(args.comic_panels)
+
+    results = []
+    try:
+        print(f"{'scenario':<14}{'reqs':>6}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'rss MB':>9}")
+        for name in names:
+            result = bench(app, name, args.requests, args.concurrency, panels_script)
+            results.append(result)
+            print(f"{name:<14}{result['requests']:>6}{result['failures']:>6}"
+                  f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                  f"{result['throughput_rps']:>9.2f}{result['peak_rss_mb']:>9.1f}")
+    finally:
+        llm_server.stop()
+        ideogram_server.stop()
+        for directory, before in existing.items():
+            if os.path.isdir(directory):
+                for filename in set(os.listdir(directory)) - before:
+                    os.remove(os.path.join(directory, filename))
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"mock LLM: {llm_server.counters}  mock Ideogram: {ideogram_server.counters}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Micro-benchmarks for the CPU-bound hot paths: text extraction, input
+summarization, script parsing, panel image ingest and comic compositing.
+
+Each operation runs on generated fixtures (see benchmarks/fixtures.py),
+timed over several repeats and traced once with tracemalloc for peak
+allocations. Results can be saved as a JSON baseline and compared
+against later runs.
+
+Usage:
+    python -m benchmarks.bench_micro [--ops pdf_extract,eml_extract,...]
+        [--repeat 5] [--save baseline.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from app import create_app
+from app.config import Config
+from app.processors.email_processor import _process_eml_file, _process_msg_file
+from app.processors.summarizer import summarize
+from app.utils.comic_store import create_comic, update_comic
+from app.utils.file_processor import extract_text_from_eml, extract_text_from_msg, extract_text_from_pdf
+from app.utils.image_ingest import ingest
+from app.utils.script_parser import ScriptParser
+
+from . import fixtures
+from .bench_script_parser import generate_script
+
+OPS = ('pdf_extract', 'eml_extract', 'eml_process', 'msg_regex', 'msg_process', 'summarize',
+       'script_parse_cold', 'script_parse_warm', 'panel_ingest', 'panel_ingest_resize', 'compose_png', 'compose_pdf')
+
+
+def cached_fixture(directory, name, build):
+    """Build a fixture once per parameter set and reuse it across runs"""
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp"
+        build(tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+
+def measure(run, setup=None, repeat=5):
+    """
+    Time `run` over `repeat` calls, then trace one more call for allocations.
+
+    Args:
+        run: Zero-argument callable; its return value is ignored.
+        setup: Optional callable run (untimed) before every call.
+        repeat: Number of timed calls.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'min_ms': min(times) * 1000,
+        'median_ms': statistics.median(times) * 1000,
+        'peak_alloc_kb': peak / 1024,
+        'retained_kb': current / 1024
+    }
+
+
+def build_operations(args, fixtures_dir, app, work_dir):
+    """Map operation names to (run, setup, params) tuples"""
+    pdf_path = cached_fixture(fixtures_dir, f'doc_{args.pdf_pages}p.pdf',
+                              lambda p: fixtures.make_pdf(p, pages=args.pdf_pages))
+    eml_path = cached_fixture(fixtures_dir, f'thread_{args.eml_parts}parts.eml',
+                              lambda p: fixtures.make_eml(p, parts=args.eml_parts))
+    msg_path = cached_fixture(fixtures_dir, f'message_{args.msg_body_kb}kb.msg',
+                              lambda p: fixtures.make_msg(p, body_kb=args.msg_body_kb))
+    script = generate_script(args.script_panels)
+    pdf_text = extract_text_from_pdf(pdf_path)
+
+    # Panel fixtures go under app/static so the download routes can find them
+    panel_dir = os.path.join(app.root_path, 'static', 'placeholders')
+    panel_paths = fixtures.make_panel_images(panel_dir, count=args.panels)
+    large_panel = fixtures.make_panel_images(work_dir, count=1, size=2048, prefix='bench_large_panel')[0]
+    panel_urls = ['/static/placeholders/' + os.path.basename(p) for p in panel_paths]
+
+    client = app.test_client()
+    with app.test_request_context():
+        comic_id = create_comic('Benchmark comic', script, [], panel_images=panel_urls)
+    with client.session_transaction() as session:
+        session['comic_id'] = comic_id
+
+    def drop_cached_downloads():
+        with app.test_request_context():
+            update_comic(comic_id, downloads={})
+
+    def download(url):
+        response = client.get(url)
+        response.close()
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned {response.status_code}")
+
+    # ingest() consumes its download and skips content it already stored,
+    # so every run starts from a fresh copy and an empty output directory
+    ingest_dir = os.path.join(work_dir, 'ingest')
+    ingest_tmp = os.path.join(work_dir, 'download.tmp')
+
+    def stage_download(source):
+        def setup():
+            shutil.rmtree(ingest_dir, ignore_errors=True)
+            os.makedirs(ingest_dir)
+            shutil.copyfile(source, ingest_tmp)
+        return setup
+
+    # Warm: re-parse of a stored script passed as previous (its blocks are reused)
+    warm_parser = ScriptParser()
+    warm_parser.parse(script, previous='')
+
+    return {
+        'pdf_extract': (lambda: extract_text_from_pdf(pdf_path), None, {'pages': args.pdf_pages}),
+        'eml_extract': (lambda: extract_text_from_eml(eml_path), None, {'parts': args.eml_parts}),
+        'eml_process': (lambda: _process_eml_file(eml_path), None, {'parts': args.eml_parts}),
+        'msg_regex': (lambda: extract_text_from_msg(msg_path), None, {'body_kb': args.msg_body_kb}),
+        'msg_process': (lambda: _process_msg_file(msg_path), None, {'body_kb': args.msg_body_kb}),
+        # __wrapped__ bypasses the result cache, which would turn repeats into lookups
+        'summarize': (lambda: summarize.__wrapped__(pdf_text, args.summary_budget), None,
+                      {'pages': args.pdf_pages, 'budget': args.summary_budget}),
+        'script_parse_cold': (lambda: ScriptParser().parse(script), None, {'panels': args.script_panels}),
+        'script_parse_warm': (lambda: warm_parser.parse(script, previous=script), None, {'panels': args.script_panels}),
+        'panel_ingest': (lambda: ingest(ingest_tmp, 'bench', ingest_dir, (1024, 1024)),
+                         stage_download(panel_paths[0]), {'size': 1024}),
+        'panel_ingest_resize': (lambda: ingest(ingest_tmp, 'bench', ingest_dir, (1024, 1024)),
+                                stage_download(large_panel), {'source': 2048, 'size': 1024}),
+        'compose_png': (lambda: download('/comics/download/images'), drop_cached_downloads,
+                        {'panels': args.panels}),
+        'compose_pdf': (lambda: download('/comics/download/pdf'), drop_cached_downloads,
+                        {'panels': args.panels})
+    }, panel_paths
+
+
+def compare(results, baseline, threshold):
+    """Print ratios against a baseline; returns the names of regressed operations"""
+    regressions = []
+    print(f"\n{'operation':<20}{'time x':>9}{'alloc x':>9}")
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            print(f"{name:<20}{'new':>9}")
+            continue
+        if previous.get('params') != result['params']:
+            print(f"{name:<20}{'params changed, skipped':>32}")
+            continue
+        time_ratio = result['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+        alloc_ratio = result['peak_alloc_kb'] / previous['peak_alloc_kb'] if previous['peak_alloc_kb'] else 1.0
+        flag = ''
+        if time_ratio > threshold or alloc_ratio > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<20}{time_ratio:>9.2f}{alloc_ratio:>9.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--ops', default=','.join(OPS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--pdf-pages', type=int, default=300)
+    parser.add_argument('--eml-parts', type=int, default=200)
+    parser.add_argument('--msg-body-kb', type=int, default=512)
+    parser.add_argument('--summary-budget', type=int, default=4000, help='summary length in characters')
+    parser.add_argument('--script-panels', type=int, default=2000)
+    parser.add_argument('--panels', type=int, default=8, help='panel images to composite')
+    parser.add_argument('--fixtures-dir', help='reuse generated fixtures from this directory')
+    parser.add_argument('--save', help='write results as a JSON baseline')
+    parser.add_argument('--compare', help='compare against a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='ratio above which a compared operation counts as a regression')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.ops.split(',') if name.strip()]
+    unknown = set(names) - set(OPS)
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(sorted(unknown))}")
+
+    work_dir = tempfile.mkdtemp(prefix='aisensum-micro-')
+    fixtures_dir = args.fixtures_dir or os.path.join(work_dir, 'fixtures')
+    os.makedirs(fixtures_dir, exist_ok=True)
+
+    class BenchConfig(Config):
+        TESTING = True
+        COMIC_STORE_DIR = os.path.join(work_dir, 'comics')
+        RATE_LIMIT_DB = os.path.join(work_dir, 'rate_limits.db')
+
+    app = create_app(BenchConfig)
+    app.logger.setLevel('WARNING')
+    temp_dir = os.path.join(app.root_path, 'static', 'temp')
+    existing_temp = set(os.listdir(temp_dir)) if os.path.isdir(temp_dir) else set()
+
+    results = {}
+    panel_paths = []
+    try:
+        operations, panel_paths = build_operations(args, fixtures_dir, app, work_dir)
+        print(f"{'operation':<20}{'min ms':>10}{'median ms':>11}{'peak KB':>11}{'kept KB':>10}")
+        for name in names:
+            run, setup, params = operations[name]
+            result = measure(run, setup, args.repeat)
+            result['params'] = params
+            results[name] = result
+            print(f"{name:<20}{result['min_ms']:>10.2f}{result['median_ms']:>11.2f}"
+                  f"{result['peak_alloc_kb']:>11.1f}{result['retained_kb']:>10.1f}")
+    finally:
+        for path in panel_paths:
+            os.remove(path)
+        if os.path.isdir(temp_dir):
+            for filename in set(os.listdir(temp_dir)) - existing_temp:
+                os.remove(os.path.join(temp_dir, filename))
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'created': datetime.utcnow().isoformat(),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'repeat': args.repeat,
+                'results': results
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
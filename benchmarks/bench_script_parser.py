@@ -0,0 +1,101 @@
+"""
+Benchmark the comic script parser against the previous line-by-line parser.
+
+The cold run parses a new script (as /comics/create does); the edit run
+re-parses it after a one-panel edit, passing the stored script as previous
+(as /comics/generate_panel does).
+
+Usage:
+    python -m benchmarks.bench_script_parser [--panels 1000] [--repeat 5]
+"""
+import argparse
+import random
+import time
+
+from app.utils.script_parser import ScriptParser
+
+
+def legacy_parse_comic_script(script_text):
+    """The original parser from comics/routes.py, kept as the baseline"""
+    panels = []
+    lines = script_text.strip().split('\n')
+    current_panel = {"description": "", "dialogue": []}
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.lower().startswith(("panel", "scene", "frame")) and ":" in line:
+            if current_panel["description"]:
+                panels.append(current_panel)
+                current_panel = {"description": "", "dialogue": []}
+            parts = line.split(":", 1)
+            if len(parts) > 1:
+                current_panel["description"] = parts[1].strip()
+        elif ":" in line and not line.startswith(("#", "//")):
+            parts = line.split(":", 1)
+            if len(parts) > 1:
+                current_panel["dialogue"].append({"character": parts[0].strip(), "text": parts[1].strip()})
+        else:
+            if current_panel["description"]:
+                current_panel["description"] += " " + line
+            else:
+                current_panel["description"] = line
+
+    if current_panel["description"]:
+        panels.append(current_panel)
+    return panels
+
+
+def generate_script(num_panels, seed=42):
+    """Build a long script with multi-line descriptions and dialogue"""
+    rng = random.Random(seed)
+    words = ["robot", "analyst", "dashboard", "server", "glows", "quietly", "city", "data",
+             "team", "celebrates", "screen", "flickers", "coffee", "deadline", "model"]
+    speakers = ["ALICE", "BOB", "Dr. Chen", "NARRATOR"]
+    lines = []
+    for i in range(1, num_panels + 1):
+        lines.append(f"Panel {i}: " + " ".join(rng.choice(words) for _ in range(12)))
+        for _ in range(rng.randint(1, 3)):
+            lines.append(" ".join(rng.choice(words) for _ in range(10)))
+        for _ in range(rng.randint(0, 3)):
+            lines.append(f"{rng.choice(speakers)}: " + " ".join(rng.choice(words) for _ in range(8)))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--panels', type=int, default=1000, help='number of panels in the generated script')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement, best is reported')
+    args = parser.parse_args()
+
+    script = generate_script(args.panels)
+    edited = script.replace(f"Panel {args.panels // 2}:", f"Panel {args.panels // 2}: edited", 1)
+    print(f"Script: {args.panels} panels, {script.count(chr(10)) + 1} lines, {len(script)} chars")
+
+    legacy = best_of(args.repeat, legacy_parse_comic_script, script)
+    cold = best_of(args.repeat, lambda text: ScriptParser().parse(text), script)
+
+    # An edit of a stored script: the parse of the previous text is reused
+    warm_parser = ScriptParser()
+    warm_parser.parse(script, previous='')
+    incremental = best_of(args.repeat, lambda text: warm_parser.parse(text, previous=script), edited)
+
+    print(f"legacy parser:        {legacy * 1000:8.2f} ms")
+    print(f"single-pass (cold):   {cold * 1000:8.2f} ms  ({legacy / cold:.1f}x)")
+    print(f"single-pass (1 edit): {incremental * 1000:8.2f} ms  ({legacy / incremental:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Upload-to-results latency with and without speculative processing.
+
+Each round uploads a generated PDF to one of the upload routes, waits
+--redirect-delay seconds (the browser following the redirect and
+rendering) and then requests the results page. With speculative
+processing the pipeline starts when the upload is saved, so the results
+request should wait for roughly the pipeline time minus the redirect
+delay instead of the whole pipeline.
+
+Usage:
+    python -m benchmarks.bench_speculative [--rounds 5] [--pages 30]
+        [--llm-latency 1.0] [--redirect-delay 0.5]
+        [--routes upload,upload_carousel,upload_combined] [--json spec.json]
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from app import create_app
+from app.config import Config
+
+from .bench_load import make_config
+from .fixtures import make_pdf
+from .mock_servers import MockSettings, start_mock_servers
+
+FORMS = {
+    'upload': {},
+    'upload_carousel': {'num_panels': '8'},
+    'upload_combined': {'script_mode': 'llm'}
+}
+
+
+def run_round(app, route, pdf_path, name, delay):
+    """(results page wait, upload to results total) in seconds"""
+    client = app.test_client()
+    started = time.perf_counter()
+    with open(pdf_path, 'rb') as f:
+        response = client.post(f'/content/{route}', data={'file': (f, name), **FORMS[route]},
+                               content_type='multipart/form-data')
+    if response.status_code != 302:
+        raise RuntimeError(f"{route} answered {response.status_code}")
+    time.sleep(delay)
+    requested = time.perf_counter()
+    if client.get(response.headers['Location']).status_code != 200:
+        raise RuntimeError(f"results page for {route} failed")
+    finished = time.perf_counter()
+    return finished - requested, finished - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--pages', type=int, default=30, help='pages of the uploaded PDF')
+    parser.add_argument('--llm-latency', type=float, default=1.0)
+    parser.add_argument('--redirect-delay', type=float, default=0.5)
+    parser.add_argument('--routes', default=','.join(FORMS))
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    llm_server, ideogram_server = start_mock_servers(MockSettings(args.llm_latency, args.llm_latency * 0.2),
+                                                     MockSettings(0.3, 0.05))
+    work_dir = tempfile.mkdtemp(prefix='aisensum-speculative-')
+    base = make_config(llm_server.url, ideogram_server.url, work_dir, rate_limited=False)
+    # The carousel and combined routes save their results in the app's history folder
+    results_dir = os.path.join(create_app(base).static_folder, 'results')
+    rows = []
+    try:
+        print(f"{'route':<18}{'speculative':<13}{'wait p50 ms':>13}{'total p50 ms':>14}")
+        for route in args.routes.split(','):
+            for enabled in (False, True):
+                class SpeculativeConfig(base):
+                    SPECULATIVE_PROCESSING = dict(Config.SPECULATIVE_PROCESSING, enabled=enabled)
+                    # Every round is a new document, so nothing is served from the caches
+                    RESULT_CACHE_DIR = os.path.join(work_dir, f'cache_{route}_{enabled}')
+                app = create_app(SpeculativeConfig)
+                app.logger.setLevel('WARNING')
+                waits, totals = [], []
+                for i in range(args.rounds):
+                    name = f"bench_spec_{route}_{enabled}_{i}.pdf"
+                    pdf_path = make_pdf(os.path.join(work_dir, name), pages=args.pages, seed=i)
+                    wait, total = run_round(app, route, pdf_path, name, args.redirect_delay)
+                    waits.append(wait)
+                    totals.append(total)
+                    os.remove(os.path.join(app.static_folder, 'uploads', name))
+                row = {'route': route, 'speculative': enabled,
+                       'wait_p50_ms': statistics.median(waits) * 1000,
+                       'total_p50_ms': statistics.median(totals) * 1000}
+                rows.append(row)
+                print(f"{route:<18}{str(enabled):<13}{row['wait_p50_ms']:>13.1f}{row['total_p50_ms']:>14.1f}")
+    finally:
+        for path in glob.glob(os.path.join(results_dir, 'bench_spec_*.json')):
+            os.remove(path)
+        llm_server.stop()
+        ideogram_server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Worker start-up benchmark with an import-time breakdown.
+
+Each run starts a fresh interpreter that loads the app the way a worker
+does (`import run`), serves one request to `/`, and reports how long each
+step took. One extra run uses `-X importtime` to show which top-level
+packages account for the import cost.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5] [--top 15] [--preload]
+        [--json startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import run
+loaded = time.perf_counter()
+client = run.app.test_client()
+status = client.get('/').status_code
+served = time.perf_counter()
+print(json.dumps({'load_s': loaded - start, 'first_request_s': served - loaded, 'status': status}))
+"""
+
+
+def run_worker(preload, importtime=False):
+    env = dict(os.environ, PRELOAD_MODULES='True' if preload else 'False', LOG_LEVEL='WARNING')
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', WORKER_SNIPPET]
+    result = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, result.stderr
+
+
+def import_breakdown(stderr):
+    """
+    Import time (seconds) per top-level package, from -X importtime output.
+
+    Self times are summed per package, so the numbers add up to the total
+    import cost and a package is charged for its own modules only, not
+    for the dependencies it pulls in.
+    """
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line.split('|')
+        self_us = parts[0].split(':')[1].strip() if len(parts) == 3 else ''
+        if not self_us.isdigit():
+            continue
+        package = parts[2].strip().split('.')[0]
+        totals[package] = totals.get(package, 0.0) + int(self_us) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='packages to list in the breakdown')
+    parser.add_argument('--preload', action='store_true', help='start with PRELOAD_MODULES enabled')
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    runs = [run_worker(args.preload)[0] for _ in range(args.runs)]
+    summary = {
+        'preload': args.preload,
+        'runs': args.runs,
+        'load_ms': statistics.median(r['load_s'] for r in runs) * 1000,
+        'first_request_ms': statistics.median(r['first_request_s'] for r in runs) * 1000
+    }
+    summary['ready_ms'] = summary['load_ms'] + summary['first_request_ms']
+
+    _, stderr = run_worker(args.preload, importtime=True)
+    breakdown = import_breakdown(stderr)
+    summary['imports'] = [{'package': name, 'ms': seconds * 1000} for name, seconds in breakdown]
+
+    print(f"preload={args.preload}  median of {args.runs} runs")
+    print(f"  load app      {summary['load_ms']:8.1f} ms")
+    print(f"  first request {summary['first_request_ms']:8.1f} ms")
+    print(f"  ready         {summary['ready_ms']:8.1f} ms")
+    print("\nImport time by top-level package (self time, one run):")
+    for name, seconds in breakdown[:args.top]:
+        print(f"  {name:<28}{seconds * 1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+Throughput of the production server as workers and threads scale.
+
+Starts gunicorn with gunicorn.conf.py for each worker/thread combination,
+pointed at the mock LLM and Ideogram APIs from benchmarks/mock_servers.py,
+waits for /readyz and drives `/content/process/<file>` (text extraction
+plus one LLM call) over HTTP with a fixed number of concurrent clients.
+
+Usage:
+    python -m benchmarks.bench_workers [--workers 1,2,4] [--threads 1,8]
+        [--concurrency 32] [--requests 128] [--llm-latency 0.5]
+        [--json workers.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .bench_load import SAMPLE_TEXT, percentile
+from .mock_servers import MockSettings, start_mock_servers
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOAD_DIR = os.path.join(REPO_ROOT, 'app', 'static', 'uploads')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, threads, env, port, ready_timeout=60):
+    """Start gunicorn and wait until /readyz answers 200"""
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+               '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+               'wsgi:app']
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + ready_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited early:\n{process.stderr.read()}")
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/readyz', timeout=1).status_code == 200:
+                return process
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError(f"gunicorn not ready after {ready_timeout}s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def server_env(llm_server, ideogram_server, work_dir):
+    """Environment for a gunicorn run against the mock APIs"""
+    return dict(
+        os.environ,
+        AISENSUM_API_KEY='bench-key',
+        MODEL_BASE_URL=f"{llm_server.url}/v1",
+        MODEL_NAME='mock-model',
+        IDEOGRAM_BASE_URL=ideogram_server.url,
+        COMIC_STORE_DIR=os.path.join(work_dir, 'comics'),
+        RATE_LIMIT_DB=os.path.join(work_dir, 'rate_limits.db'),
+        # The mocks have no quota; keep the limiter out of the measurement
+        LLM_RATE_LIMIT='100000',
+        LLM_RATE_BURST='100000',
+        IDEOGRAM_RATE_LIMIT='100000',
+        IDEOGRAM_RATE_BURST='100000',
+        # Every benchmark request is identical; keep memoization and call
+        # coalescing from turning the run into cache lookups
+        RESULT_CACHE_ENABLED='False',
+        SINGLE_FLIGHT_ENABLED='False',
+        RESULT_CACHE_DIR=os.path.join(work_dir, 'result_cache'),
+        SINGLE_FLIGHT_DIR=os.path.join(work_dir, 'flights'),
+        LOG_LEVEL='WARNING',
+        GUNICORN_ACCESS_LOG='/dev/null'
+    )
+
+
+def drive(send, requests_count, concurrency):
+    """
+    Issue `requests_count` requests from `concurrency` clients.
+
+    Args:
+        send: Callable taking a requests.Session, returning True on success.
+    """
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(_):
+        nonlocal failures
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            ok = send(session)
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                failures += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_count)))
+    wall = time.perf_counter() - started
+
+    return {
+        'requests': requests_count,
+        'failures': failures,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'throughput_rps': requests_count / wall if wall else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--threads', default='1,8', help='comma-separated threads per worker')
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=128, help='requests per combination')
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    worker_counts = [int(n) for n in args.workers.split(',') if n.strip()]
+    thread_counts = [int(n) for n in args.threads.split(',') if n.strip()]
+
+    llm_server, ideogram_server = start_mock_servers(
+        MockSettings(args.llm_latency, args.llm_latency * 0.2),
+        MockSettings(0.0)
+    )
+    work_dir = tempfile.mkdtemp(prefix='aisensum-workers-')
+    env = server_env(llm_server, ideogram_server, work_dir)
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    filename = f'bench_workers_{os.getpid()}.txt'
+    upload_path = os.path.join(UPLOAD_DIR, filename)
+    with open(upload_path, 'w') as f:
+        f.write(SAMPLE_TEXT)
+
+    results = []
+    try:
+        print(f"{'workers':>8}{'threads':>8}{'reqs':>6}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}"
+              f"{'req/s':>9}{'scale':>7}")
+        for threads in thread_counts:
+            for workers in worker_counts:
+                port = free_port()
+                process = start_server(workers, threads, env, port)
+                try:
+                    url = f'http://127.0.0.1:{port}/content/process/{filename}'
+
+                    def send(session):
+                        return session.get(url, timeout=120, allow_redirects=False).status_code == 200
+
+                    drive(send, min(args.concurrency, args.requests), args.concurrency)  # warm-up
+                    result = drive(send, args.requests, args.concurrency)
+                finally:
+                    stop_server(process)
+                result.update(workers=workers, threads=threads)
+                baseline = next((r for r in results if r['threads'] == threads), result)
+                result['scale'] = result['throughput_rps'] / baseline['throughput_rps'] \
+                    if baseline['throughput_rps'] else 0.0
+                results.append(result)
+                print(f"{workers:>8}{threads:>8}{result['requests']:>6}{result['failures']:>6}"
+                      f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+                      f"{result['throughput_rps']:>9.2f}{result['scale']:>6.2f}x")
+    finally:
+        llm_server.stop()
+        ideogram_server.stop()
+        os.remove(upload_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"mock LLM: {llm_server.counters}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+"""
+Generated input files for the benchmarks.
+
+Everything is built from a fixed seed so runs are comparable: long PDFs
+(reportlab), deep MIME trees, Outlook .msg files (a minimal compound file
+writer, since nothing installed can write them) and panel image sets.
+"""
+import math
+import os
+import random
+import struct
+from email.message import EmailMessage
+
+from PIL import Image
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+WORDS = ["quarterly", "revenue", "customer", "pipeline", "forecast", "onboarding", "latency",
+         "dashboard", "renewal", "pricing", "roadmap", "support", "export", "retail", "pilot",
+         "model", "accuracy", "churn", "segment", "launch", "partner", "budget", "hiring"]
+
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def paragraph(rng, sentences=5):
+    return " ".join(sentence(rng, rng.randint(8, 16)) for _ in range(sentences))
+
+
+def make_pdf(path, pages=300, seed=0):
+    """A text PDF with `pages` pages of ~45 lines each"""
+    rng = random.Random(seed)
+    c = canvas.Canvas(path, pagesize=letter)
+    for page in range(pages):
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(72, 740, f"Section {page + 1}")
+        c.setFont("Helvetica", 10)
+        y = 715
+        while y > 72:
+            c.drawString(72, y, sentence(rng, 14))
+            y -= 14
+        c.showPage()
+    c.save()
+    return path
+
+
+def make_eml(path, parts=200, attachment_kb=64, seed=0):
+    """
+    A multipart/mixed message with nested alternative parts.
+
+    Every group holds a text/plain and text/html alternative, and every
+    fourth group also carries a base64 binary attachment, so the tree has
+    both text worth extracting and payloads that should be skipped.
+    """
+    rng = random.Random(seed)
+    msg = EmailMessage()
+    msg['Subject'] = 'Quarterly review thread'
+    msg['From'] = 'Alice Analyst <alice@example.com>'
+    msg['To'] = 'team@example.com'
+    msg['Message-ID'] = f'<bench-{seed}@example.com>'
+    msg.set_content(paragraph(rng, 8))
+
+    for i in range(parts):
+        text = paragraph(rng, 4)
+        group = EmailMessage()
+        group.set_content(text)
+        group.add_alternative(f"<html><body><p>{text}</p><p><b>{sentence(rng)}</b></p></body></html>",
+                              subtype='html')
+        msg.add_attachment(group)
+        if i % 4 == 0:
+            blob = bytes(rng.getrandbits(8) for _ in range(attachment_kb * 1024))
+            msg.add_attachment(blob, maintype='application', subtype='octet-stream',
+                               filename=f'export_{i}.bin')
+
+    with open(path, 'wb') as f:
+        f.write(msg.as_bytes())
+    return path
+
+
+# --- Minimal compound file (OLE2) writer for .msg fixtures ---
+
+SECTOR = 512
+MINI_SECTOR = 64
+MINI_CUTOFF = 4096
+FREESECT = 0xFFFFFFFF
+ENDOFCHAIN = 0xFFFFFFFE
+FATSECT = 0xFFFFFFFD
+NOSTREAM = 0xFFFFFFFF
+
+
+def _sort_key(name):
+    # Compound file sibling order: shorter names first, then upper-cased names
+    return (len(name), name.upper())
+
+
+def _dir_entry(name, kind, left, right, child, start, size):
+    encoded = (name + '\0').encode('utf-16-le')
+    return (encoded.ljust(64, b'\0')
+            + struct.pack('<HBB3I', len(encoded), kind, 1, left, right, child)
+            + b'\0' * 16 + struct.pack('<I', 0) + b'\0' * 16
+            + struct.pack('<IQ', start, size))
+
+
+def write_compound_file(path, tree):
+    """
+    Write a compound file from a nested dict.
+
+    Args:
+        path: Output path.
+        tree: {name: bytes} for streams, {name: dict} for storages.
+    """
+    entries = [{'name': 'Root Entry', 'kind': 5, 'children': [], 'data': b''}]
+
+    def add(items, parent):
+        for name, value in items.items():
+            entry = {'name': name, 'children': []}
+            entries.append(entry)
+            parent['children'].append(len(entries) - 1)
+            if isinstance(value, dict):
+                entry.update(kind=1, data=b'')
+                add(value, entry)
+            else:
+                entry.update(kind=2, data=value)
+
+    add(tree, entries[0])
+
+    # Small streams live in the mini stream, large ones get whole sectors
+    mini_stream = bytearray()
+    mini_fat = []
+    big_streams = []
+    for entry in entries[1:]:
+        data = entry['data']
+        if entry['kind'] != 2 or not data:
+            entry['start'] = ENDOFCHAIN if entry['kind'] == 2 else 0
+            continue
+        if len(data) < MINI_CUTOFF:
+            count = math.ceil(len(data) / MINI_SECTOR)
+            entry['start'] = len(mini_fat)
+            mini_fat.extend(range(len(mini_fat) + 1, len(mini_fat) + count))
+            mini_fat.append(ENDOFCHAIN)
+            mini_stream += data.ljust(count * MINI_SECTOR, b'\0')
+        else:
+            big_streams.append(entry)
+
+    dir_sectors = math.ceil(len(entries) * 128 / SECTOR)
+    minifat_sectors = math.ceil(len(mini_fat) * 4 / SECTOR)
+    ministream_sectors = math.ceil(len(mini_stream) / SECTOR)
+    big_sectors = sum(math.ceil(len(e['data']) / SECTOR) for e in big_streams)
+    other = dir_sectors + minifat_sectors + ministream_sectors + big_sectors
+    fat_sectors = 1
+    while fat_sectors * (SECTOR // 4) < fat_sectors + other:
+        fat_sectors += 1
+    if fat_sectors > 109:
+        raise ValueError("Fixture too large for a compound file without DIFAT sectors")
+
+    fat = [FATSECT] * fat_sectors
+    sectors = []
+
+    def allocate(data):
+        count = math.ceil(len(data) / SECTOR)
+        if not count:
+            return ENDOFCHAIN
+        start = len(fat)
+        fat.extend(range(start + 1, start + count))
+        fat.append(ENDOFCHAIN)
+        sectors.append(bytes(data).ljust(count * SECTOR, b'\0'))
+        return start
+
+    dir_start_index = len(fat)
+    fat.extend(range(dir_start_index + 1, dir_start_index + dir_sectors))
+    fat.append(ENDOFCHAIN)
+    dir_placeholder = len(sectors)
+    sectors.append(b'')
+    minifat_start = allocate(b''.join(struct.pack('<I', v) for v in mini_fat)) if mini_fat else ENDOFCHAIN
+    entries[0]['start'] = allocate(mini_stream) if mini_stream else ENDOFCHAIN
+    entries[0]['data'] = mini_stream
+    for entry in big_streams:
+        entry['start'] = allocate(entry['data'])
+
+    # Children of each storage form a right-leaning chain in sibling order
+    links = {i: [NOSTREAM, NOSTREAM, NOSTREAM] for i in range(len(entries))}
+    for index, entry in enumerate(entries):
+        children = sorted(entry['children'], key=lambda i: _sort_key(entries[i]['name']))
+        if children:
+            links[index][2] = children[0]
+            for current, following in zip(children, children[1:]):
+                links[current][1] = following
+
+    directory = b''.join(
+        _dir_entry(e['name'], e['kind'], *links[i], e['start'], len(e['data']) if e['kind'] != 1 else 0)
+        for i, e in enumerate(entries)
+    )
+    sectors[dir_placeholder] = directory.ljust(dir_sectors * SECTOR, b'\0')
+
+    fat.extend([FREESECT] * (fat_sectors * (SECTOR // 4) - len(fat)))
+    difat = list(range(fat_sectors)) + [FREESECT] * (109 - fat_sectors)
+    header = (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\0' * 16
+              + struct.pack('<HHHHH', 0x3E, 3, 0xFFFE, 9, 6) + b'\0' * 6
+              + struct.pack('<IIIIIIIII', 0, fat_sectors, dir_start_index, 0, MINI_CUTOFF,
+                            minifat_start, minifat_sectors, ENDOFCHAIN, 0)
+              + b''.join(struct.pack('<I', v) for v in difat))
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(b''.join(struct.pack('<I', v) for v in fat))
+        for sector in sectors:
+            f.write(sector)
+    return path
+
+
+def _unicode_prop(prop_id, value):
+    return f'__substg1.0_{prop_id:04X}001F', value.encode('utf-16-le')
+
+
+def _properties_stream(prop_ids, header_size):
+    """Property stream listing variable-length unicode properties"""
+    header = b'\0' * header_size
+    entries = b''.join(struct.pack('<IIII', (prop_id << 16) | 0x001F, 0x6, 0, 0) for prop_id in prop_ids)
+    return header + entries
+
+
+def make_msg(path, body_kb=256, attachments=4, attachment_kb=128, seed=0):
+    """
+    An Outlook message with subject, sender, transport headers, a large
+    plain-text body and binary attachments.
+    """
+    rng = random.Random(seed)
+    body = []
+    size = 0
+    while size < body_kb * 1024:
+        text = paragraph(rng, 6)
+        body.append(text)
+        size += len(text) + 2
+    props = {
+        0x001A: 'IPM.Note',
+        0x0037: 'Quarterly review thread',
+        0x0C1A: 'Alice Analyst',
+        0x007D: 'Message-ID: <bench@example.com>\r\nFrom: alice@example.com\r\n',
+        0x1000: '\r\n\r\n'.join(body)
+    }
+    tree = dict(_unicode_prop(prop_id, value) for prop_id, value in props.items())
+    tree['__properties_version1.0'] = _properties_stream(list(props), 32)
+    tree['__nameid_version1.0'] = {
+        '__substg1.0_00020102': b'',
+        '__substg1.0_00030102': b'',
+        '__substg1.0_00040102': b''
+    }
+    for i in range(attachments):
+        name = f'export_{i}.bin'
+        tree[f'__attach_version1.0_#{i:08X}'] = {
+            '__substg1.0_37010102': bytes(rng.getrandbits(8) for _ in range(attachment_kb * 1024)),
+            '__substg1.0_3707001F': name.encode('utf-16-le'),
+            '__substg1.0_3704001F': name.encode('utf-16-le'),
+            '__properties_version1.0': _properties_stream([0x3707, 0x3704], 8)
+        }
+    return write_compound_file(path, tree)
+
+
+def make_panel_images(directory, count=8, size=1024, seed=0, prefix='bench_panel'):
+    """
+    Panel-like PNGs: flat colour blocks plus noise, so they compress like
+    illustrations rather than like solid colours or pure noise.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        image = Image.new('RGB', (size, size), tuple(rng.randint(120, 255) for _ in range(3)))
+        for _ in range(12):
+            x0, y0 = rng.randint(0, size - 64), rng.randint(0, size - 64)
+            block = Image.new('RGB', (rng.randint(32, size // 3), rng.randint(32, size // 3)),
+                              tuple(rng.randint(0, 255) for _ in range(3)))
+            image.paste(block, (x0, y0))
+        noise_side = size // 4
+        noise = Image.frombytes('RGB', (noise_side, noise_side),
+                                bytes(rng.getrandbits(8) for _ in range(noise_side * noise_side * 3)))
+        image.paste(noise, (size - noise_side, size - noise_side))
+        path = os.path.join(directory, f'{prefix}_{i}.png')
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+def image_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
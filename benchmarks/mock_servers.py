@@ -0,0 +1,297 @@
+"""
+Local stand-ins for the model provider and Ideogram APIs.
+
+Both servers run in background threads so benchmarks can point
+MODEL_BASE_URL / IDEOGRAM_BASE_URL at them instead of spending API credit.
+Latency, error rate and payload size are configurable per server.
+
+Usage (standalone, e.g. to point a dev server at them):
+    python -m benchmarks.mock_servers [--llm-latency 0.5] [--image-latency 1.0]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+
+FILLER_WORDS = ["insight", "growth", "team", "data", "strategy", "customer", "launch",
+                "quarter", "product", "market", "signal", "roadmap", "pilot", "metric"]
+
+
+class MockSettings:
+    """
+    Behaviour of one mock server.
+
+    Args:
+        latency: Mean response delay in seconds.
+        jitter: Uniform +/- jitter added to the delay, in seconds.
+        error_rate: Fraction of requests answered with an error (0..1).
+        rate_limit_share: Fraction of those errors returned as 429 with a
+            Retry-After header instead of 500.
+        payload_kb: Approximate size of generated text (LLM) or image (host).
+        tail_share: Fraction of requests that are slow stragglers (0..1).
+        tail_latency: Delay of a straggler in seconds.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_share=0.5, payload_kb=2,
+                 tail_share=0.0, tail_latency=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_share = rate_limit_share
+        self.payload_kb = payload_kb
+        self.tail_share = tail_share
+        self.tail_latency = tail_latency
+
+    def delay(self, rng):
+        if self.tail_share and rng.random() < self.tail_share:
+            time.sleep(self.tail_latency)
+            return
+        time.sleep(max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter)))
+
+
+def _filler(rng, approx_bytes):
+    words = []
+    size = 0
+    while size < approx_bytes:
+        word = rng.choice(FILLER_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def _chat_content(prompt, rng, payload_kb):
+    """Build a reply in the JSON shape the calling task asks for"""
+    text = _filler(rng, max(64, payload_kb * 1024 // 4))
+
+    if "'carousel_panels'" in prompt or '"carousel_panels"' in prompt:
+        panels = [
+            {"title": f"Slide {i + 1}", "text": text[:400], "image_suggestion": "bold chart on a plain background"}
+            for i in range(8)
+        ]
+        return json.dumps({"carousel_panels": panels})
+
+    if "'comic_script'" in prompt or '"comic_script"' in prompt:
+        script = [
+            {"panel": i + 1, "description": f"Two analysts at a whiteboard, {text[:200]}",
+             "dialogue": f"ALICE: {text[:80]}"}
+            for i in range(6)
+        ]
+        return json.dumps({"comic_script": script})
+
+    reply = {
+        "topics": [rng.choice(FILLER_WORDS).title() for _ in range(5)],
+        "linkedin_posts": [
+            {"title": f"Post {i + 1}", "content": text, "hashtags": ["#data", "#growth"]} for i in range(3)
+        ],
+        "instagram_posts": [
+            {"caption": text[:300], "image_suggestion": "team photo"} for _ in range(2)
+        ]
+    }
+    if "'comic_scripts'" in prompt:
+        reply["comic_scripts"] = [
+            {"title": f"Comic {i + 1}", "panels": [
+                {"panel": n + 1, "description": text[:120], "dialogue": f"ALICE: {text[:60]}"} for n in range(4)
+            ]} for i in range(3)
+        ]
+    return json.dumps(reply)
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    settings = None
+    rng = None
+    counters = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, key):
+        with self.server.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        try:
+            return json.loads(body or b'{}')
+        except ValueError:
+            return {}
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _maybe_fail(self):
+        """Answer with an injected error; returns True if one was sent"""
+        if self.rng.random() >= self.settings.error_rate:
+            return False
+        if self.rng.random() < self.settings.rate_limit_share:
+            self._count('rate_limited')
+            self._send(429, {"error": {"message": "Rate limit exceeded"}}, headers={'Retry-After': '0.1'})
+        else:
+            self._count('errors')
+            self._send(500, {"error": {"message": "Injected server error"}})
+        return True
+
+
+class LLMHandler(_MockHandler):
+    """OpenAI-compatible POST /chat/completions plus the AiSensum POST /generate/article"""
+
+    def do_POST(self):
+        payload = self._read_json()
+        self._count('requests')
+        self.settings.delay(self.rng)
+        path = self.path.rstrip('/')
+        if path.endswith('/generate/article'):
+            if not self._maybe_fail():
+                self._send(200, {"title": f"On {payload.get('topic', 'data')}",
+                                 "content": _filler(self.rng, max(64, self.settings.payload_kb * 1024))})
+            return
+        if not path.endswith('/chat/completions'):
+            self._send(404, {"error": {"message": "Not found"}})
+            return
+        if self._maybe_fail():
+            return
+
+        messages = payload.get('messages') or [{}]
+        prompt = messages[-1].get('content', '')
+        content = _chat_content(prompt, self.rng, self.settings.payload_kb)
+        self._send(200, {
+            "id": f"mock-{self.counters['requests']}",
+            "object": "chat.completion",
+            "model": payload.get('model', 'mock'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4}
+        })
+
+
+class IdeogramHandler(_MockHandler):
+    """Ideogram POST /generate plus GET /images/<n>.png image host"""
+
+    image_bytes = b''
+
+    def do_POST(self):
+        payload = self._read_json()
+        self._count('requests')
+        self.settings.delay(self.rng)
+        if self.path.rstrip('/') != '/generate':
+            self._send(404, {"error": {"message": "Not found"}})
+            return
+        if self._maybe_fail():
+            return
+
+        host = self.headers.get('Host', f"127.0.0.1:{self.server.server_address[1]}")
+        prompt = payload.get('image_request', {}).get('prompt', '')
+        self._send(200, {
+            "created": time.time(),
+            "data": [{"url": f"http://{host}/images/{self.counters['requests']}.png",
+                      "prompt": prompt, "resolution": "1024x1024"}]
+        })
+
+    def do_GET(self):
+        if not self.path.startswith('/images/'):
+            self._send(404, {"error": {"message": "Not found"}})
+            return
+        self._count('downloads')
+        self._send(200, self.image_bytes, content_type='image/png')
+
+
+def make_png(payload_kb, size=1024, seed=0):
+    """
+    A PNG of roughly payload_kb kilobytes.
+
+    Noise does not compress, so a noisy square of the right side length
+    gives a predictable file size; it is pasted onto a flat canvas of the
+    requested dimensions.
+    """
+    rng = random.Random(seed)
+    side = max(1, min(size, int((payload_kb * 1024 / 3) ** 0.5)))
+    noise = Image.frombytes('RGB', (side, side), bytes(rng.getrandbits(8) for _ in range(side * side * 3)))
+    canvas = Image.new('RGB', (size, size), (240, 240, 235))
+    canvas.paste(noise, (0, 0))
+    buffer = BytesIO()
+    canvas.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class MockServer:
+    """A handler class served from a daemon thread on 127.0.0.1."""
+
+    def __init__(self, handler, settings, seed=0, **attrs):
+        handler_cls = type(handler.__name__, (handler,), dict(
+            settings=settings, rng=random.Random(seed), counters={}, **attrs))
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler_cls)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.counters = handler_cls.counters
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def start_mock_servers(llm=None, ideogram=None, image_size=1024):
+    """
+    Start both mock APIs.
+
+    Returns:
+        (llm_server, ideogram_server); use `.url` for the base URLs and
+        `.counters` for request/error counts, `.stop()` when done.
+    """
+    llm = llm or MockSettings()
+    ideogram = ideogram or MockSettings()
+    llm_server = MockServer(LLMHandler, llm, seed=1).start()
+    ideogram_server = MockServer(IdeogramHandler, ideogram, seed=2,
+                                 image_bytes=make_png(ideogram.payload_kb, size=image_size)).start()
+    return llm_server, ideogram_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--image-latency', type=float, default=1.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--llm-payload-kb', type=int, default=2)
+    parser.add_argument('--image-payload-kb', type=int, default=300)
+    args = parser.parse_args()
+
+    llm_server, ideogram_server = start_mock_servers(
+        MockSettings(args.llm_latency, args.llm_latency * 0.2, args.error_rate, payload_kb=args.llm_payload_kb),
+        MockSettings(args.image_latency, args.image_latency * 0.2, args.error_rate, payload_kb=args.image_payload_kb)
+    )
+    print(f"MODEL_BASE_URL={llm_server.url}")
+    print(f"IDEOGRAM_BASE_URL={ideogram_server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        llm_server.stop()
+        ideogram_server.stop()
+
+
+if __name__ == '__main__':
+    main()
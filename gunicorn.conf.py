@@ -0,0 +1,48 @@
+"""
+Gunicorn settings for serving wsgi:app.
+
+Requests spend nearly all their time waiting on the LLM and Ideogram
+APIs, so each worker runs a pool of threads (gthread) and the worker
+count follows the CPUs. Every setting can be overridden from the
+environment; see benchmarks/bench_workers.py for how throughput scales.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 8080)}")
+
+# Config.DEBUG defaults to on for `flask run` and run.py; a served app
+# runs without it unless DEBUG is set explicitly
+os.environ.setdefault('DEBUG', 'False')
+
+# Processes for the CPU-bound parts (PDF/email parsing, image compositing),
+# threads for requests blocked on outbound API calls
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+worker_class = 'gthread'
+
+# The longest single LLM call is the carousel (180 s) and a call may first
+# queue for up to RATE_LIMIT_TIMEOUT (300 s) behind the rate limiter, so
+# a worker is only considered hung well past that. graceful_timeout gives
+# in-flight generations the same window to finish on reload or shutdown.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 600))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', timeout))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Load the app (and the heavy PDF/imaging modules) once in the master so
+# workers share the pages and start serving immediately after fork
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() in ('true', '1', 't')
+if preload_app:
+    os.environ.setdefault('PRELOAD_MODULES', 'True')
+
+# Recycle workers now and then to bound memory growth from large uploads
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Heartbeat files on tmpfs so a slow disk cannot make workers look hung
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(M)sms rid=%({x-request-id}o)s'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
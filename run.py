@@ -1,14 +1,10 @@
 from app import create_app
-from datetime import datetime
 import os
 
 app = create_app()
 
-# Add template context processor to make 'now' available in templates
-@app.context_processor
-def inject_now():
-    return {'now': datetime.utcnow()}
-
+# Development server only; production runs wsgi:app under gunicorn
+# (see gunicorn.conf.py)
 if __name__ == '__main__':
     # Get port from environment variable or use 8080 as default
     port = int(os.environ.get('PORT', 8080))
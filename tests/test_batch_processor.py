@@ -0,0 +1,52 @@
+import pytest
+from flask import Flask
+
+from app.utils import batch_processor
+
+LIMITS = {'topics': 3, 'linkedin_posts': 2, 'linkedin_length': 1300, 'instagram_posts': 0,
+          'instagram_length': 2200, 'comic_scripts': 1}
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['BATCH_PROCESSING'] = {'chars_per_token': 1}
+    with app.app_context():
+        yield app
+
+
+def test_pack_documents_uses_few_packs_within_budget(app):
+    documents = ['a' * 60, 'b' * 50, 'c' * 40, 'd' * 30, 'e' * 20]
+    packs = batch_processor.pack_documents(documents, budget_tokens=100)
+    assert len(packs) == 2
+    assert all(sum(map(len, pack)) <= 100 for pack in packs)
+    assert sorted(doc for pack in packs for doc in pack) == sorted(documents)
+    # Documents keep their order inside a pack
+    for pack in packs:
+        assert pack == [doc for doc in documents if doc in pack]
+
+
+def test_oversized_document_gets_its_own_pack(app):
+    packs = batch_processor.pack_documents(['x' * 500, 'y' * 10, 'z' * 10], budget_tokens=100)
+    assert packs == [['x' * 500], ['y' * 10, 'z' * 10]]
+    assert batch_processor.pack_documents([], budget_tokens=100) == []
+
+
+def test_pack_quotas_split_counts_across_requests():
+    quotas = batch_processor._pack_quotas(LIMITS, packs=2)
+    assert quotas == {'topics': 2, 'linkedin_posts': 1, 'linkedin_length': 1300, 'instagram_posts': 0,
+                      'instagram_length': 2200, 'comic_scripts': 1}
+
+
+def test_merge_interleaves_packs_dedupes_and_trims():
+    first = {'topics': ['Grid storage', 'Wind auctions'], 'linkedin_posts': ['Post A', 'Post B'],
+             'instagram_posts': [], 'comic_scripts': [{'panel': 1}]}
+    second = {'topics': ['grid storage', 'Heat pumps', 'Hydrogen'], 'linkedin_posts': ['Post C'],
+              'instagram_posts': [], 'comic_scripts': [{'panel': 2}]}
+    failed = {'topics': ['Error: AI request timed out.']}
+    merged, errors = batch_processor._merge([first, failed, second], LIMITS)
+    assert merged['topics'] == ['Grid storage', 'Wind auctions', 'Heat pumps']
+    assert merged['linkedin_posts'] == ['Post A', 'Post C']
+    assert merged['instagram_posts'] == []
+    assert merged['comic_scripts'] == [{'panel': 1}]
+    assert errors == ['Error: AI request timed out.']
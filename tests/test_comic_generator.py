@@ -0,0 +1,85 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+from flask import Flask
+
+from app.config import Config
+from app.utils import comic_generator
+
+SCRIPT = [{'panel': i + 1, 'description': f'Scene {i + 1} in the lab', 'dialogue': 'ALICE: hi'} for i in range(3)]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__, root_path=str(tmp_path))
+    app.config.update(COMIC_SETTINGS=dict(Config.COMIC_SETTINGS),
+                      COMIC_FALLBACK=dict(Config.COMIC_FALLBACK, latency_budget=0.5),
+                      SINGLE_FLIGHT_ENABLED=False)
+    with app.test_request_context():
+        yield app
+
+
+def _image(url):
+    return {'data': [{'url': url}]}
+
+
+def test_slow_panels_return_within_budget_and_are_replaced(app):
+    release = threading.Event()
+    replaced = []
+    done = threading.Event()
+
+    def request_image(api_key, image_request, timeout=60):
+        if 'Scene 2' in image_request['prompt']:
+            # Stuck behind the rate limiter or a slow response
+            release.wait(10)
+            return _image('https://images/real-2.png')
+        return _image('https://images/fast.png')
+
+    def on_replaced(panels):
+        replaced.append(panels)
+        done.set()
+
+    with mock.patch.object(comic_generator, 'request_ideogram_image', request_image):
+        started = time.monotonic()
+        panels = comic_generator.generate_comic_panels(SCRIPT, 'key', on_replaced=on_replaced)
+        assert time.monotonic() - started < 5
+        assert [p['image_url'] for p in panels][::2] == ['https://images/fast.png'] * 2
+        assert panels[1]['fallback'] and panels[1]['image_url'].startswith('/static/placeholders/fallback_')
+        assert not replaced
+        release.set()
+        assert done.wait(10)
+
+    replacement, = replaced
+    assert [p['image_url'] for p in replacement] == ['https://images/fast.png', 'https://images/real-2.png',
+                                                    'https://images/fast.png']
+    assert not any(p.get('fallback') for p in replacement)
+    assert panels[1]['fallback']
+
+
+def test_failed_panels_are_rendered_again(app):
+    attempts = []
+    replaced = []
+    done = threading.Event()
+
+    def request_image(api_key, image_request, timeout=60):
+        attempts.append(image_request['prompt'])
+        if len(attempts) <= len(SCRIPT):
+            raise RuntimeError('Ideogram is down')
+        return _image('https://images/retry.png')
+
+    with mock.patch.object(comic_generator, 'request_ideogram_image', request_image):
+        panels = comic_generator.generate_comic_panels(SCRIPT, 'key',
+                                                       on_replaced=lambda p: (replaced.append(p), done.set()))
+        assert all(p['fallback'] for p in panels)
+        assert done.wait(10)
+
+    assert len(attempts) == 2 * len(SCRIPT)
+    assert [p['image_url'] for p in replaced[0]] == ['https://images/retry.png'] * len(SCRIPT)
+
+
+def test_render_pool_is_shared(app):
+    first = comic_generator._render_pool()
+    comic_generator.submit_render(lambda: None).result(5)
+    assert comic_generator._render_pool() is first
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+
+import pytest
+from flask import Flask
+
+from app.utils import comic_store
+
+PANELS = [{'description': f'Panel {i}', 'dialogue': [{'character': 'Sarah', 'text': f'Line {i}'}]}
+          for i in range(6)]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['COMIC_STORE_DIR'] = str(tmp_path / 'comics')
+    with app.app_context():
+        yield app
+
+
+def test_create_and_load_keep_dialogue_out_of_the_record(app):
+    prompts = [{'prompt': f'Panel {i}'} for i in range(2)]
+    comic_id = comic_store.create_comic('Demo', 'Panel 1: ...', PANELS[:2], ['/a', '/b'], prompts=prompts)
+    record = comic_store.load_comic(comic_id)
+    assert 'panels' not in record and 'script' not in record
+    assert record['characters'] == ['Sarah'] and record['panel_quality'] == ['final', 'final']
+    full = comic_store.load_comic(comic_id, panels=True, script=True, prompts=True)
+    assert full['panels'] == PANELS[:2] and full['script'] == 'Panel 1: ...' and full['prompts'] == prompts
+    assert comic_store.load_comic('../etc') is None
+    assert comic_store.load_comic('0' * 32) is None
+
+
+def test_update_invalidates_downloads_of_changed_parts(app, tmp_path):
+    comic_id = comic_store.create_comic('Demo', 'script', PANELS, [f'/img{i}' for i in range(6)])
+    pdf_path, script_path = tmp_path / 'comic.pdf', tmp_path / 'script.txt'
+    for kind, path in (('pdf', pdf_path), ('script', script_path)):
+        path.write_text(kind)
+        comic_store.cache_download(comic_id, kind, str(path))
+
+    record = comic_store.update_comic(comic_id, panel_images=[f'/new{i}' for i in range(6)])
+    assert record['downloads'] == {'script': str(script_path)}
+    assert not pdf_path.exists() and script_path.exists()
+    assert comic_store.cached_download(record, 'script') == str(script_path)
+
+    record = comic_store.update_comic(comic_id, panels=PANELS[:2] + [{'description': 'New', 'dialogue': [
+        {'character': 'Omar', 'text': 'Hi'}]}])
+    assert record['panel_count'] == 3
+    assert record['characters'] == ['Sarah', 'Omar']
+    assert comic_store.load_comic(comic_id, prompts=True)['prompts'] is None
+    assert comic_store.update_comic('not-a-comic-id', title='x') is None
+
+
+def test_swap_panel_image_only_over_queued_version(app):
+    comic_id = comic_store.create_comic('Demo', 'script', PANELS[:2], ['/d0', '/d1'],
+                                        panel_quality=['draft', 'draft'])
+    versions = comic_store.panel_versions(comic_store.load_comic(comic_id))
+    assert len(set(versions)) == 2
+    # A regeneration that draws the same URL still supersedes the queued render
+    comic_store.set_panel_images(comic_id, {0: '/d0'})
+    assert not comic_store.swap_panel_image(comic_id, 0, versions[0], '/final0', 'final')
+    assert comic_store.swap_panel_image(comic_id, 1, versions[1], '/final1', 'final')
+    assert not comic_store.swap_panel_image(comic_id, 1, versions[1], '/again', 'final')
+    record = comic_store.load_comic(comic_id)
+    assert record['panel_images'] == ['/d0', '/final1']
+    assert record['panel_quality'] == ['final', 'final']
+
+
+def _set_panel_repeatedly(store_dir, comic_id, index, rounds):
+    app = Flask(__name__)
+    app.config['COMIC_STORE_DIR'] = store_dir
+    with app.app_context():
+        for n in range(rounds):
+            comic_store.set_panel_images(comic_id, {index: f'/p{index}-{n}'})
+
+
+def _update_field_repeatedly(store_dir, comic_id, field, rounds):
+    app = Flask(__name__)
+    app.config['COMIC_STORE_DIR'] = store_dir
+    with app.app_context():
+        for n in range(rounds):
+            comic_store.update_comic(comic_id, **{field: n})
+
+
+@pytest.mark.skipif(comic_store.fcntl is None or 'fork' not in multiprocessing.get_all_start_methods(),
+                    reason='needs fcntl and fork')
+def test_update_comic_from_several_processes_keeps_every_field(app):
+    comic_id = comic_store.create_comic('Demo', 'script', PANELS, [''] * len(PANELS))
+    store_dir = app.config['COMIC_STORE_DIR']
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_update_field_repeatedly, args=(store_dir, comic_id, f'field_{i}', 30))
+               for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    record = comic_store.load_comic(comic_id)
+    assert [record.get(f'field_{i}') for i in range(4)] == [29] * 4
+
+
+@pytest.mark.skipif(comic_store.fcntl is None or 'fork' not in multiprocessing.get_all_start_methods(),
+                    reason='needs fcntl and fork')
+def test_updates_from_several_processes_are_not_lost(app):
+    comic_id = comic_store.create_comic('Demo', 'script', PANELS, [''] * len(PANELS))
+    store_dir = app.config['COMIC_STORE_DIR']
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_set_panel_repeatedly, args=(store_dir, comic_id, i, 30))
+               for i in range(len(PANELS))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    record = comic_store.load_comic(comic_id)
+    assert record['panel_images'] == [f'/p{i}-29' for i in range(len(PANELS))]
+    assert os.path.exists(os.path.join(store_dir, comic_id, comic_store.LOCK_FILE))
@@ -0,0 +1,62 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from app import create_app
+from app.comics import routes
+from app.config import Config
+from app.utils import comic_store
+
+SCRIPT = "Panel 1: A lab at night.\nSarah: Ready?\n\nPanel 2: The screen lights up.\nJohn: Go!\n"
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        COMIC_STORE_DIR = str(tmp_path / 'comics')
+        COMIC_FALLBACK = dict(Config.COMIC_FALLBACK, enabled=False)
+    return create_app(TestConfig)
+
+
+def test_late_final_render_does_not_overwrite_regeneration(app):
+    release = threading.Event()
+    swaps = []
+    regenerated = []
+    swapped = threading.Semaphore(0)
+
+    # Panel files are named by content, so a regeneration can come back
+    # with the draft's URL; only the panel version tells them apart
+    def generate(image_request, fresh=False):
+        if fresh:
+            regenerated.append(image_request)
+            return '/draft'
+        if threading.current_thread().name.startswith('comic-final'):
+            release.wait(10)
+            return '/late-final'
+        return '/draft'
+
+    def swap(*args):
+        swaps.append(comic_store.swap_panel_image(*args))
+        swapped.release()
+
+    client = app.test_client()
+    with mock.patch.object(routes, 'generate_panel_image', generate), \
+            mock.patch.object(routes, 'swap_panel_image', swap):
+        response = client.post('/comics/create', data={'script': SCRIPT, 'render_mode': 'progressive'})
+        assert response.status_code == 302
+        with client.session_transaction() as session:
+            comic_id = session['comic_id']
+
+        assert client.post('/comics/regenerate_panels').status_code == 302
+        release.set()
+        for _ in range(2):
+            assert swapped.acquire(timeout=10)
+
+    assert len(regenerated) == 2
+    assert swaps == [False, False]
+    with app.app_context():
+        record = comic_store.load_comic(comic_id)
+    assert record['panel_images'] == ['/draft', '/draft']
+    assert record['panel_quality'] == ['final', 'final']
@@ -0,0 +1,45 @@
+import io
+import threading
+from unittest import mock
+
+import pytest
+
+from app import create_app
+from app.config import Config
+from app.content import routes
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        RESULT_CACHE_DIR = str(tmp_path / 'result_cache')
+        SINGLE_FLIGHT_DIR = str(tmp_path / 'flights')
+    app = create_app(TestConfig)
+    app.static_folder = str(tmp_path / 'static')
+    return app
+
+
+def test_error_in_speculative_job_is_flashed_to_results_request(app):
+    uploaded = threading.Event()
+
+    def carousel(text, num_panels):
+        # The job fails only after the upload response has gone out
+        uploaded.wait(10)
+        return {}
+
+    def fail(final_results, carousel_results):
+        raise RuntimeError('carousel store broke')
+
+    client = app.test_client()
+    with mock.patch.object(routes, 'process_text_for_carousel', carousel), \
+            mock.patch.object(routes, '_record_carousel', fail):
+        response = client.post('/content/upload_combined', data={
+            'file': (io.BytesIO(b'Some article text about batteries.'), 'article.txt'), 'script_mode': 'fast'})
+        assert response.status_code == 302
+        uploaded.set()
+        response = client.get(response.headers['Location'])
+
+    assert response.status_code == 200
+    assert b'An unexpected error occurred during combined processing.' in response.data
+    assert b'carousel store broke' in response.data
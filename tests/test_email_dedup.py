@@ -0,0 +1,61 @@
+from app.processors.email_dedup import (dedupe_emails, group_threads, learn_boilerplate, minhash,
+                                        near_duplicates, strip_boilerplate)
+
+FOOTER = 'This message is confidential and intended only for the recipient.'
+UNSUBSCRIBE = 'To unsubscribe from this list, visit our preferences page.'
+
+BODIES = [
+    'The grid operator approved three new battery sites in the north region this quarter.',
+    'Hydrogen pilots in the port are delayed until spring because of permit reviews.',
+    'Offshore wind auctions drew record bids from five consortia last week.',
+    'Heat pump sales fell slightly as subsidies changed at the start of the year.',
+]
+
+
+def _email(name, body, message_id=None, in_reply_to=(), references=()):
+    return {'name': name, 'body': body, 'message_id': message_id,
+            'in_reply_to': list(in_reply_to), 'references': list(references)}
+
+
+def test_boilerplate_lines_are_learned_and_stripped():
+    bodies = [f"{body}\n\n{FOOTER}\n{UNSUBSCRIBE}" for body in BODIES]
+    boilerplate = learn_boilerplate(bodies)
+    assert boilerplate == {FOOTER.lower(), UNSUBSCRIBE.lower()}
+    assert strip_boilerplate(bodies[0], boilerplate) == BODIES[0]
+    # Too few emails to tell boilerplate from content
+    assert learn_boilerplate(bodies[:2]) == set()
+
+
+def test_near_duplicates_point_to_the_earlier_text():
+    forwarded = BODIES[0] + ' Forwarded by Dana.'
+    texts = [BODIES[0], BODIES[1], forwarded, BODIES[2]]
+    assert near_duplicates(texts, threshold=0.6) == {2: 0}
+    assert near_duplicates(BODIES) == {}
+    assert minhash(BODIES[0]) == minhash(BODIES[0])
+    assert minhash('') is None
+
+
+def test_threads_put_parents_before_replies():
+    records = [
+        _email('reply', 'Re: sites', '<b@x>', in_reply_to=['<a@x>']),
+        _email('other', 'Unrelated', '<c@x>'),
+        _email('root', 'Sites', '<a@x>'),
+        _email('reply-to-reply', 'Re: Re: sites', '<d@x>', in_reply_to=['<b@x>'], references=['<a@x>', '<b@x>']),
+    ]
+    assert group_threads(records) == [[2, 0, 3], [1]]
+
+
+def test_dedupe_emails_drops_repeats_and_counts_them():
+    records = [_email(f'mail{i}.eml', f"{body}\n{FOOTER}", f'<{i}@x>') for i, body in enumerate(BODIES)]
+    records.append(_email('copy.eml', records[1]['body'], '<1@x>'))
+    records.append(_email('forward.eml', f"{BODIES[2]}\n{FOOTER}", '<fw@x>'))
+    threads, stats = dedupe_emails(records)
+
+    kept = [record['name'] for thread in threads for record in thread]
+    assert kept == ['mail0.eml', 'mail1.eml', 'mail2.eml', 'mail3.eml']
+    assert all(FOOTER not in record['body'] for thread in threads for record in thread)
+    assert stats['duplicate_ids'] == 1 and stats['near_duplicates'] == 1
+    assert stats['boilerplate_lines'] == 1 and stats['threads'] == 4
+    assert stats['chars_after'] < stats['chars_before']
+    # The caller's records are not modified
+    assert FOOTER in records[0]['body']
@@ -0,0 +1,61 @@
+import struct
+from email.message import EmailMessage
+
+from app.processors.email_processor import read_eml, read_msg
+from benchmarks.fixtures import write_compound_file
+
+
+def _attachment_eml(path):
+    """A multipart message whose second text/plain part is an attachment"""
+    msg = EmailMessage()
+    msg['Subject'] = 'Chunk boundaries'
+    msg['Message-ID'] = '<chunks@example.com>'
+    msg.set_content('Body line one.')
+    msg.add_attachment('SECRET ATTACHMENT LOG\n' * 20, subtype='plain', filename='server.log')
+    data = msg.as_bytes(policy=msg.policy.clone(linesep='\r\n'))
+    assert b'\r\n' in data
+    path.write_bytes(data)
+    return path
+
+
+def test_read_eml_same_result_at_every_chunk_size(tmp_path):
+    path = _attachment_eml(tmp_path / 'attachment.eml')
+    expected = read_eml(path)
+    assert expected['body'] == 'Body line one.'
+    assert expected['subject'] == 'Chunk boundaries'
+    for chunk_size in range(5, 300):
+        assert read_eml(path, chunk_size=chunk_size) == expected, chunk_size
+
+
+def _ansi_msg(path, subject, body, codepage_props):
+    """A .msg with 8-bit (001E) subject and body streams"""
+    properties = bytes(32) + b''.join(struct.pack('<IIII', tag, 0x6, value, 0)
+                                      for tag, value in codepage_props)
+    write_compound_file(str(path), {
+        '__substg1.0_0037001E': subject + b'\x00',
+        '__substg1.0_1000001E': body + b'\x00',
+        '__properties_version1.0': properties
+    })
+    return path
+
+
+def test_read_msg_decodes_8bit_text_with_message_codepage(tmp_path):
+    subject, body = 'Отчёт за квартал', 'Привет, коллеги. Цифры во вложении.'
+    # PR_MESSAGE_CODEPAGE wins over PR_INTERNET_CPID
+    path = _ansi_msg(tmp_path / 'cyrillic.msg', subject.encode('cp1251'), body.encode('cp1251'),
+                     [(0x3FDE0003, 20127), (0x3FFD0003, 1251)])
+    record = read_msg(path)
+    assert (record['subject'], record['body']) == (subject, body)
+
+    path = _ansi_msg(tmp_path / 'internet.msg', subject.encode('koi8-r'), body.encode('koi8-r'),
+                     [(0x3FDE0003, 20866)])
+    record = read_msg(path)
+    assert (record['subject'], record['body']) == (subject, body)
+
+
+def test_read_msg_falls_back_to_cp1252(tmp_path):
+    subject, body = 'Café menu', 'Crème brûlée — 5 €'
+    for name, props in [('none.msg', []), ('unknown.msg', [(0x3FFD0003, 99999)])]:
+        path = _ansi_msg(tmp_path / name, subject.encode('cp1252'), body.encode('cp1252'), props)
+        record = read_msg(path)
+        assert (record['subject'], record['body']) == (subject, body)
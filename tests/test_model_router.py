@@ -0,0 +1,72 @@
+import time
+
+import pytest
+from flask import Flask
+
+from app.utils import model_router
+from app.utils.logging_setup import log_context, request_id_var
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(model_router, '_breakers', {})
+    monkeypatch.setattr(model_router, '_latencies', {})
+    app = Flask(__name__)
+    app.config.update(
+        MODEL_BASE_URL='https://models.test/v1', MODEL_NAME='default-model', AISENSUM_API_KEY='key',
+        MODEL_ENDPOINTS={'fast': {'model': 'fast-model'}, 'fallback': {'model': 'fallback-model'}},
+        MODEL_ROUTES={'carousel': {'endpoint': 'fast', 'hedge': 'fallback'}},
+        MODEL_HEDGING={'enabled': True, 'initial_delay': 0.05, 'min_delay': 0.05, 'max_delay': 1.0},
+        MODEL_CIRCUIT_BREAKER={'failure_threshold': 2, 'reset_timeout': 30})
+    with app.app_context():
+        yield app
+
+
+def test_slow_primary_is_hedged_with_the_callers_request_id(app):
+    seen = []
+
+    def send(endpoint):
+        seen.append((endpoint['name'], request_id_var.get()))
+        if endpoint['name'] == 'fast':
+            time.sleep(0.5)
+        return endpoint['name']
+
+    with log_context(request_id='req-1'):
+        assert model_router.complete('carousel', send) == 'fallback'
+    assert sorted(seen) == [('fallback', 'req-1'), ('fast', 'req-1')]
+
+
+def test_fast_primary_is_not_hedged(app):
+    calls = []
+    assert model_router.complete('carousel', lambda endpoint: calls.append(endpoint['name']) or 'ok') == 'ok'
+    assert calls == ['fast']
+
+
+def test_failing_endpoint_is_skipped_once_its_breaker_opens(app):
+    # Without hedging the fallback runs only after the primary's failure is recorded
+    app.config['MODEL_HEDGING'] = dict(app.config['MODEL_HEDGING'], enabled=False)
+    calls = []
+
+    def send(endpoint):
+        calls.append(endpoint['name'])
+        if endpoint['name'] == 'fast':
+            raise RuntimeError('connection refused')
+        return 'fallback'
+
+    for _ in range(3):
+        assert model_router.complete('carousel', send) == 'fallback'
+    assert calls == ['fast', 'fallback', 'fast', 'fallback', 'fallback']
+    assert [endpoint['name'] for endpoint in model_router._candidates('carousel')] == ['fallback']
+
+
+def test_breaker_lets_one_trial_through_after_reset_timeout():
+    breaker = model_router.CircuitBreaker(threshold=2, reset_timeout=0.05)
+    assert not breaker.record(False)
+    assert breaker.record(False)
+    assert not breaker.record(False)
+    assert breaker.blocked() and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True)
+    assert not breaker.blocked() and breaker.allow()
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.rate_limiter import RateLimitTimeout, RequestScheduler, _key_fingerprint, parse_retry_after
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'rate_limits.db')
+
+
+def test_burst_is_granted_then_requests_wait_for_refill(db_path):
+    scheduler = RequestScheduler(db_path, {'llm': {'rate': 10, 'burst': 3}})
+    assert all(scheduler.acquire('llm', 'key') < 0.05 for _ in range(3))
+    waited = scheduler.acquire('llm', 'key')
+    assert 0.05 < waited < 0.5
+    stats = scheduler.stats()[f"llm:{_key_fingerprint('key')}"]
+    assert stats['granted'] == 4 and stats['throttled'] >= 1
+
+
+def test_buckets_are_shared_by_schedulers_on_the_same_database(db_path):
+    # One scheduler per worker process, all drawing from the same quota
+    limits = {'ideogram': {'rate': 1, 'burst': 2}}
+    first, second = RequestScheduler(db_path, limits), RequestScheduler(db_path, limits)
+    first.acquire('ideogram', 'key')
+    second.acquire('ideogram', 'key')
+    with pytest.raises(RateLimitTimeout):
+        first.acquire('ideogram', 'key', timeout=0.1)
+    # Other keys and unlimited providers are not affected
+    assert second.acquire('ideogram', 'other-key') < 0.05
+    assert second.acquire('unlisted') == 0.0
+    assert first.stats()[f"ideogram:{_key_fingerprint('key')}"]['timeouts'] == 1
+
+
+def test_penalize_drains_the_bucket_for_retry_after(db_path):
+    scheduler = RequestScheduler(db_path, {'llm': {'rate': 10, 'burst': 5}})
+    scheduler.penalize('llm', 'key', retry_after=0.2)
+    assert scheduler.acquire('llm', 'key') >= 0.2
+
+
+def test_interactive_requests_are_served_before_batch(db_path):
+    scheduler = RequestScheduler(db_path, {'llm': {'rate': 5, 'burst': 1}})
+    scheduler.acquire('llm', 'key')
+    order = []
+
+    def request(priority):
+        scheduler.acquire('llm', 'key', priority=priority)
+        order.append(priority)
+
+    batch = threading.Thread(target=request, args=('batch',))
+    batch.start()
+    # The batch request is already waiting for the refill when the interactive one arrives
+    time.sleep(0.05)
+    interactive = threading.Thread(target=request, args=('interactive',))
+    interactive.start()
+    batch.join(5)
+    interactive.join(5)
+    assert order == ['interactive', 'batch']
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('2.5') == 2.5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('Wed, 21 Oct 2026 07:28:00 GMT') is None
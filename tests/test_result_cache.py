@@ -0,0 +1,81 @@
+import io
+import os
+import time
+
+import pytest
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+
+from app.utils import result_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(RESULT_CACHE_DIR=str(tmp_path / 'cache'), RESULT_CACHE_TTL=60,
+                      MODEL_NAME='model-a', MODEL_TEMPERATURE=0.7)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / 'article.txt'
+    path.write_text('Battery storage doubled this year.')
+    return str(path)
+
+
+def test_key_depends_on_content_params_and_settings(app, upload, tmp_path):
+    key = result_cache.pipeline_key('combined', upload, script_mode='llm')
+    copy = tmp_path / 'renamed.txt'
+    copy.write_bytes(open(upload, 'rb').read())
+    # Same content under another name is the same job
+    assert result_cache.pipeline_key('combined', str(copy), script_mode='llm') == key
+
+    assert result_cache.pipeline_key('carousel', upload, script_mode='llm') != key
+    assert result_cache.pipeline_key('combined', upload, script_mode='fast') != key
+    app.config['MODEL_TEMPERATURE'] = 0.2
+    assert result_cache.pipeline_key('combined', upload, script_mode='llm') != key
+    app.config['MODEL_TEMPERATURE'] = 0.7
+    # Settings that do not change the output do not change the key
+    app.config['LOG_LEVEL'] = 'DEBUG'
+    assert result_cache.pipeline_key('combined', upload, script_mode='llm') == key
+
+    with open(upload, 'a') as f:
+        f.write(' And again.')
+    os.utime(upload, (time.time() + 5, time.time() + 5))
+    assert result_cache.pipeline_key('combined', upload, script_mode='llm') != key
+
+
+def test_save_upload_digest_matches_file_digest(tmp_path):
+    content = b'x' * (result_cache.CHUNK_SIZE + 10)
+    path = str(tmp_path / 'big.txt')
+    digest = result_cache.save_upload(FileStorage(io.BytesIO(content), 'big.txt'), path)
+    result_cache._digests.clear()
+    assert result_cache.file_digest(path) == digest
+    assert open(path, 'rb').read() == content
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+
+def test_run_once_caches_only_accepted_results(app, upload):
+    key = result_cache.pipeline_key('standard', upload)
+    runs = []
+
+    def run():
+        runs.append(1)
+        return {'topics': len(runs)}
+    complete = lambda result: result['topics'] > 1
+
+    assert result_cache.run_once(key, 'standard', run, complete) == {'topics': 1}
+    assert result_cache.run_once(key, 'standard', run, complete) == {'topics': 2}
+    assert result_cache.run_once(key, 'standard', run, complete) == {'topics': 2}
+    assert len(runs) == 2
+
+
+def test_cached_result_expires_after_ttl(app, upload):
+    key = result_cache.pipeline_key('standard', upload)
+    assert result_cache.run_once(key, 'standard', lambda: {'run': 1}) == {'run': 1}
+    path = os.path.join(app.config['RESULT_CACHE_DIR'], f'{key}.json')
+    old = time.time() - 61
+    os.utime(path, (old, old))
+    assert result_cache.run_once(key, 'standard', lambda: {'run': 2}) == {'run': 2}
@@ -0,0 +1,88 @@
+import os
+import random
+
+import pytest
+
+from app import create_app
+from app.config import Config
+from app.utils import comic_store
+from app.utils.script_parser import ScriptParser, parse_comic_script
+
+PANELS = [
+    {'description': 'An office at night. A clock reads 11:58.',
+     'dialogue': [{'character': 'Sarah', 'text': 'Did you see the latest AI breakthrough?'},
+                  {'character': 'John', 'text': 'No, what happened?'}]},
+    {'description': 'Sarah points at her screen.', 'dialogue': []},
+    {'description': 'Both cheer as the first panel renders.',
+     'dialogue': [{'character': 'Dr. Chen (V.O.)', 'text': 'Told you: it works.'}]}
+]
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        COMIC_STORE_DIR = str(tmp_path / 'comics')
+    return create_app(TestConfig)
+
+
+def test_download_script_parses_back(app):
+    with app.test_request_context():
+        comic_id = comic_store.create_comic('Demo', 'script', PANELS)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['comic_id'] = comic_id
+    response = client.get('/comics/download/script')
+    assert response.status_code == 200
+    script = response.get_data(as_text=True)
+    response.close()
+    # The download is written under app/static/temp
+    with app.test_request_context():
+        os.remove(comic_store.load_comic(comic_id)['downloads']['script'])
+
+    assert script.startswith('### **Comic Script Title: "Demo"**')
+    assert parse_comic_script(script) == PANELS
+
+
+def test_speakers_are_capitalised_names_not_stage_words():
+    script = ("Panel 1: A quiet lab.\n"
+              "Meanwhile: the clock ticks.\n"
+              "ALICE: Is it done?\n"
+              "Tessa: Almost.\n"
+              "Dr. Chen (V.O.): Keep going.\n"
+              "the old robot: beeps twice.\n"
+              "Caption: Later that night.\n")
+    panel, = parse_comic_script(script)
+    assert panel['description'] == 'A quiet lab. Meanwhile: the clock ticks. the old robot: beeps twice.'
+    assert [d['character'] for d in panel['dialogue']] == ['ALICE', 'Tessa', 'Dr. Chen (V.O.)', 'Caption']
+
+    panel, = parse_comic_script(script, characters=['the old robot'])
+    assert [d['character'] for d in panel['dialogue']] == ['ALICE', 'Tessa', 'Dr. Chen (V.O.)',
+                                                           'the old robot', 'Caption']
+
+
+def test_create_page_example_keeps_its_dialogue():
+    script = ("Panel 1: A scientist in a lab coat stands in front of a futuristic AI display.\n\n"
+              "Dr. Smith: Today we're unveiling our latest AI model!\n\n"
+              "Panel 2: The audience looks amazed.\n\n"
+              "Woman: Can it really understand emotions?\n")
+    panels = parse_comic_script(script)
+    assert [panel['dialogue'] for panel in panels] == [
+        [{'character': 'Dr. Smith', 'text': "Today we're unveiling our latest AI model!"}],
+        [{'character': 'Woman', 'text': 'Can it really understand emotions?'}]
+    ]
+
+
+def test_edit_reparse_matches_cold_parse():
+    rng = random.Random(0)
+    snippets = ['\nPanel 9: a new panel\n', 'Panel', '\n', 'BOB: hi\n', '**End**\n', '# Title\n',
+                '---\n', '*Scene: a street*\n', ':', '*', '**Eve:** hello\n']
+    script = '\n'.join(f"Panel {i}: Scene {i} description.\nALICE: line {i}\n" for i in range(1, 30))
+    parser = ScriptParser()
+    parser.parse(script, previous='')
+    for _ in range(300):
+        start = rng.randrange(len(script) + 1)
+        end = min(len(script), start + rng.choice([0, 1, 10]))
+        edited = script[:start] + rng.choice(snippets) + script[end:]
+        assert parser.parse(edited, previous=script) == ScriptParser().parse(edited)
+        script = edited
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from app.utils import single_flight
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(SINGLE_FLIGHT_DIR=str(tmp_path), SINGLE_FLIGHT_WAIT=5, SINGLE_FLIGHT_SHARE_SECONDS=30)
+    with app.app_context():
+        yield app
+
+
+def _counting_call(results):
+    calls = []
+
+    def call():
+        calls.append(1)
+        return results[len(calls) - 1]
+    return call, calls
+
+
+def test_finished_result_is_shared_within_window(app):
+    key = single_flight.flight_key('llm', 'prompt')
+    call, calls = _counting_call(['first', 'second'])
+    assert single_flight.do('llm', key, call) == 'first'
+    # Another process (or a later request) within the share window
+    assert single_flight.do('llm', key, call) == 'first'
+    assert len(calls) == 1
+
+
+def test_concurrent_only_does_not_reuse_finished_result(app):
+    key = single_flight.flight_key('ideogram', 'prompt')
+    call, calls = _counting_call(['first', 'second'])
+    assert single_flight.do('ideogram', key, call, concurrent_only=True) == 'first'
+    assert single_flight.do('ideogram', key, call, concurrent_only=True) == 'second'
+    assert len(calls) == 2
+
+
+def test_concurrent_only_shares_call_in_flight(app):
+    key = single_flight.flight_key('ideogram', 'prompt')
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'image'
+
+    results = []
+
+    def leader():
+        with app.app_context():
+            results.append(single_flight.do('ideogram', key, slow_call, concurrent_only=True))
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait(5)
+    waiter = threading.Thread(target=leader)
+    waiter.start()
+    # Give the waiter time to join the flight before the call finishes
+    time.sleep(0.2)
+    release.set()
+    thread.join(5)
+    waiter.join(5)
+    assert results == ['image', 'image']
+    assert len(calls) == 1
+
+
+def test_result_expires_after_share_window(app, tmp_path):
+    key = single_flight.flight_key('llm', 'prompt')
+    call, calls = _counting_call(['first', 'second'])
+    assert single_flight.do('llm', key, call) == 'first'
+    published = tmp_path / f'{key}.json'
+    old = time.time() - 31
+    os.utime(published, (old, old))
+    assert single_flight.do('llm', key, call) == 'second'
+    assert len(calls) == 2
+
+
+def test_unshareable_results_and_failures_are_not_published(app):
+    key = single_flight.flight_key('article', 'topic')
+    call, calls = _counting_call([(429, 'slow down'), (200, 'article')])
+    ok = lambda result: result[0] == 200
+    assert single_flight.do('article', key, call, shareable=ok) == (429, 'slow down')
+    assert single_flight.do('article', key, call, shareable=ok) == (200, 'article')
+
+    def fail():
+        raise RuntimeError('boom')
+    failing_key = single_flight.flight_key('article', 'other topic')
+    with pytest.raises(RuntimeError):
+        single_flight.do('article', failing_key, fail)
+    assert single_flight.do('article', failing_key, lambda: 'retried') == 'retried'
+    assert len(calls) == 2
+
+
+def test_waits_for_result_published_by_another_process(app, tmp_path):
+    key = single_flight.flight_key('llm', 'prompt')
+    directory = str(tmp_path)
+    # Another worker holds the lock and publishes its result a little later
+    assert single_flight.try_lock(directory, key, 300)
+
+    def other_worker():
+        time.sleep(0.3)
+        with app.app_context():
+            single_flight._publish(directory, key, {'text': 'from other worker'})
+        single_flight.unlock(directory, key)
+
+    thread = threading.Thread(target=other_worker)
+    thread.start()
+    call, calls = _counting_call(['own'])
+    assert single_flight.do('llm', key, call) == {'text': 'from other worker'}
+    thread.join(5)
+    assert not calls
+    assert not os.path.exists(tmp_path / f'{key}.lock')
+
+
+def test_abandoned_lock_is_taken_over(tmp_path):
+    directory = str(tmp_path)
+    assert single_flight.try_lock(directory, 'key', 300)
+    assert not single_flight.try_lock(directory, 'key', 300)
+    old = time.time() - 301
+    os.utime(tmp_path / 'key.lock', (old, old))
+    assert single_flight.try_lock(directory, 'key', 300)
+
+
+def test_flight_key_ignores_dict_order():
+    assert single_flight.flight_key('llm', {'a': 1, 'b': 2}) == single_flight.flight_key('llm', {'b': 2, 'a': 1})
+    assert single_flight.flight_key('llm', 'x') != single_flight.flight_key('ideogram', 'x')
+
+
+def test_do_async_shares_published_result(app):
+    key = single_flight.flight_key('llm', 'prompt')
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return 'answer'
+
+    async def twice():
+        return [await single_flight.do_async('llm', key, call), await single_flight.do_async('llm', key, call)]
+    assert asyncio.run(twice()) == ['answer', 'answer']
+    assert len(calls) == 1
@@ -0,0 +1,11 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+run.py starts the Werkzeug development server; this module only builds
+the app, so any WSGI server can import it.
+"""
+from app import create_app
+
+app = create_app()